@@ -1,9 +1,12 @@
-from dlt.common import logger
+import os
+from typing import List, Optional
+
+from dlt.common import logger, signals
 
 from dlt.pipeline import Schema, Pipeline, CannotRestorePipelineException
 
-from ethereum import get_blocks, get_known_contracts
-from helpers import config, secrets, get_credentials
+from ethereum.loaded_blocks import LoadedBlocks
+from helpers import OverlappedNormalize, config, secrets, get_credentials
 
 # get the configuration from config and secret files or environment variables 
 # here you can also change the destination (ie. to Redshift) and dataset/schema name we load data into
@@ -20,8 +23,18 @@ rpc_url = "https://api.roninchain.com/rpc"
 
 # number of past blocks to get when pipeline is run for a first time
 max_initial_blocks = config["ethereum"]["max_initial_blocks"]
-# max blocks to get on subsequent runs
+# max blocks to get on subsequent runs, with adaptive number of blocks older blocks are skipped only past that number
 max_blocks = config["ethereum"]["max_blocks"]
+# adapt the number of blocks in a run to the measured throughput so the run takes about that many seconds
+target_run_seconds = config["ethereum"].get("target_run_seconds")
+# write extract loop profiles into the working dir, profiling is also enabled by setting ETHEREUM_PROFILE_DIR env variable
+profile_dir = os.path.join(config["working_dir"], "profiles") if config["ethereum"].get("profile", False) else None
+# extract only transactions and logs of the decoded contracts, receipts of other transactions are not requested
+only_decoded_contracts = config["ethereum"].get("only_decoded_contracts", False)
+# keep raw blocks and receipts on disk so they can be extracted and decoded again without the node
+block_cache_dir = os.path.join(config["working_dir"], "block_cache") if config["ethereum"].get("block_cache", False) else None
+# record extracted blocks and skip them when the same blocks are extracted again (ie. with fill_missing_blocks.py)
+loaded_blocks = LoadedBlocks(os.path.join(config["working_dir"], "loaded_blocks")) if config["ethereum"].get("skip_loaded_blocks", False) else None
 
 pipeline = Pipeline("axies")
 # create or restore pipeline. this pipeline requires persistent state that is kept in working dir.
@@ -43,21 +56,84 @@ except CannotRestorePipelineException:
     )
     logger.info("Pipeline created")
 
+# normalize extracted block range in the background while the next one is extracted
+overlapped_normalize = OverlappedNormalize(pipeline) if config["ethereum"].get("overlap_normalize", False) else None
+
+
+def normalize() -> None:
+    if overlapped_normalize:
+        overlapped_normalize.normalize()
+    else:
+        pipeline.normalize()
+
+
+def get_address_filter() -> Optional[List[str]]:
+    from ethereum import get_decoded_addresses
+
+    return get_decoded_addresses(abi_dir) if only_decoded_contracts else None
+
 
 def extract() -> None:
+    # the Ethereum stack (web3) is imported when blocks are extracted, not when the script starts
+    from ethereum import get_blocks, get_known_contracts
+
     # get iterator with blocks, transactions and decoded transactions and logs
-    i = get_blocks(rpc_url, max_blocks=max_blocks, max_initial_blocks=max_initial_blocks, abi_dir=abi_dir, is_poa=True, supports_batching=False, state=pipeline.state)
+    i = get_blocks(
+        rpc_url, max_blocks=max_blocks, max_initial_blocks=max_initial_blocks, abi_dir=abi_dir, is_poa=True, supports_batching=False, state=pipeline.state,
+        profile_dir=profile_dir, address_filter=get_address_filter(), target_run_seconds=target_run_seconds, block_cache_dir=block_cache_dir,
+        loaded_blocks=loaded_blocks
+    )
     # i = get_blocks(rpc_url, max_blocks=1, last_block=16553617, abi_dir=abi_dir, is_poa=True, supports_batching=False, state=None)
 
     # read the data from iterator
     pipeline.extract(i, table_name="blocks")
-    # read the known contracts
-    pipeline.extract(get_known_contracts(abi_dir), table_name="known_contracts")
+    # record the extracted blocks only when extract stored them
+    if loaded_blocks:
+        loaded_blocks.commit()
+    # read the known contracts if any of them changed
+    pipeline.extract(get_known_contracts(abi_dir, state=pipeline.state), table_name="known_contracts")
     # normalize the JSON data into tables and prepare load packages
-    pipeline.normalize()
+    normalize()
 
     # if you want to run the whole pipeline in single script just uncomment this line
     # pipeline.load()
 
-# this will run the "extract" function once or in a loop if so configured
-exit(pipeline.run_in_pool(extract))
+
+def follow() -> None:
+    from ethereum import get_known_contracts, follow_head, follow_head_with_backfill
+
+    address_filter = get_address_filter()
+    # keep web3 and abis warm and send micro batches of new blocks through extract and normalize as they arrive
+    pipeline.extract(get_known_contracts(abi_dir, state=pipeline.state), table_name="known_contracts")
+    max_batch_blocks = config["ethereum"].get("max_batch_blocks", 10)
+    if config["ethereum"].get("backfill", False):
+        # blocks more than max_blocks behind the head are backfilled with the capacity left by the head instead of being skipped
+        micro_batches = follow_head_with_backfill(
+            rpc_url, max_batch_blocks=max_batch_blocks, max_initial_blocks=max_initial_blocks, abi_dir=abi_dir, is_poa=True, supports_batching=False,
+            state=pipeline.state, address_filter=address_filter, max_head_lag=max_blocks, max_blocks_per_second=config["ethereum"].get("max_blocks_per_second"),
+            block_cache_dir=block_cache_dir
+        )
+    else:
+        micro_batches = follow_head(
+            rpc_url, max_batch_blocks=max_batch_blocks, max_initial_blocks=max_initial_blocks, abi_dir=abi_dir, is_poa=True, supports_batching=False,
+            state=pipeline.state, address_filter=address_filter, block_cache_dir=block_cache_dir
+        )
+    for i in micro_batches:
+        pipeline.extract(i, table_name="blocks")
+        normalize()
+
+
+try:
+    if config["ethereum"].get("follow_head", False):
+        # follow the chain head until the process is signalled
+        signals.register_signals()
+        follow()
+        exit_code = 0
+    else:
+        # this will run the "extract" function once or in a loop if so configured
+        exit_code = pipeline.run_in_pool(extract)
+finally:
+    # finish normalizing the last extracted range
+    if overlapped_normalize:
+        overlapped_normalize.close()
+exit(exit_code)
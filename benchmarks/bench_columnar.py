@@ -0,0 +1,96 @@
+"""Benchmark of the columnar output against the extract and normalize steps of the pipeline
+
+Run from the project root with `python -m benchmarks.bench_columnar` (requires the `columnar` extra). Blocks are fetched once from a local JSON RPC replay server.
+The same items are then extracted and normalized by a pipeline in a temporary working dir, and normalized into Arrow record batches and written as Parquet files.
+No destination is used: the pipeline gets placeholder Redshift credentials and never loads.
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Sequence
+
+from dlt.common import json
+from dlt.common.typing import DictStrAny, TSecretValue
+from dlt.pipeline import Pipeline, PostgresPipelineCredentials
+
+from tests.rpc_replay import RPCReplayServer, DEFAULT_FIXTURE_PATH
+
+
+def _run_pipeline(items: Sequence[DictStrAny], work_dir: str) -> DictStrAny:
+    from ethereum import get_schema
+
+    pipeline = Pipeline("bench_columnar")
+    pipeline.create_pipeline(PostgresPipelineCredentials("redshift", "db", "bench", "user", "localhost", TSecretValue("password")), working_dir=work_dir, schema=get_schema())
+    started = time.perf_counter()
+    pipeline.extract(iter(items), table_name="blocks")
+    extracted = time.perf_counter()
+    pipeline.normalize()
+    return {"mode": "extract_normalize", "first_s": extracted - started, "second_s": time.perf_counter() - extracted}
+
+
+def _run_columnar(items: Sequence[DictStrAny], output_dir: str) -> DictStrAny:
+    from ethereum import get_schema
+    from ethereum.columnar import ArrowBatchBuilder, write_parquet
+
+    started = time.perf_counter()
+    builder = ArrowBatchBuilder(get_schema())
+    for item in items:
+        builder.add_item(item)
+    batches = list(builder.flush())
+    built = time.perf_counter()
+    write_parquet(batches, output_dir)
+    return {"mode": "columnar_parquet", "first_s": built - started, "second_s": time.perf_counter() - built}
+
+
+def run_benchmark(blocks: int = 200, fixture_path: str = DEFAULT_FIXTURE_PATH, abi_dir: str = "abi/abis") -> List[DictStrAny]:
+    from ethereum import get_blocks
+
+    # the extractor writes abi changes back so work on a copy
+    work_dir = tempfile.mkdtemp()
+    try:
+        bench_abi_dir = shutil.copytree(abi_dir, os.path.join(work_dir, "abis"))
+        with RPCReplayServer(fixture_path) as replay:
+            items = list(get_blocks(replay.url, last_block=replay.head, max_blocks=blocks, abi_dir=bench_abi_dir, is_poa=True))
+        # the pipeline steps log each run, keep the output readable
+        logging.disable(logging.CRITICAL)
+        try:
+            results = [_run_pipeline(items, os.path.join(work_dir, "pipeline")), _run_columnar(items, os.path.join(work_dir, "parquet"))]
+        finally:
+            logging.disable(logging.NOTSET)
+        for r in results:
+            r["blocks"] = blocks
+            r["items"] = len(items)
+            r["total_s"] = r["first_s"] + r["second_s"]
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def format_results(results: Sequence[DictStrAny]) -> str:
+    # first step is extract or building batches, second is normalize or writing parquet
+    lines = [f"{'mode':<20}{'items':>8}{'first s':>10}{'second s':>10}{'total s':>10}"]
+    for r in results:
+        lines.append(f"{r['mode']:<20}{r['items']:>8}{r['first_s']:>10.3f}{r['second_s']:>10.3f}{r['total_s']:>10.3f}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks columnar output against extract and normalize steps of the pipeline")
+    parser.add_argument("--blocks", type=int, default=200, help="number of blocks to process")
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE_PATH, help="recorded blocks and receipts")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.blocks, args.fixture)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
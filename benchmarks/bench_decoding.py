@@ -0,0 +1,201 @@
+"""Micro benchmarks of the decoding primitives in `ethereum.eth_source_utils`
+
+Run from the project root with `python -m benchmarks.bench_decoding`. Calldata and logs of the decoded contracts are taken from the recorded blocks and receipts,
+ABIs from `abi/abis`. Functions that modify their input get a fresh copy for each call, copies are made before the timer starts. Each case is timed `repeats` times
+and the median time per call is reported. Results are compared with the baseline in `benchmarks/baselines/bench_decoding.json`, use `--save-baseline` to replace it.
+"""
+
+import argparse
+import gc
+import os
+import statistics
+import time
+from copy import deepcopy
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from hexbytes import HexBytes
+
+from dlt.common import json
+from dlt.common.typing import DictStrAny
+
+from tests.rpc_replay import DEFAULT_FIXTURE_PATH, load_fixture
+
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "bench_decoding.json")
+
+BENCH_CASES = [
+    "abi_to_selector", "maybe_load_abis", "signature_to_abi", "decode_tx", "decode_log", "decode_log_recover_index", "prettify_decoded", "uint_to_wei", "flatten_batches"
+]
+
+# prepares a list of argument tuples, one per timed call
+TPrepare = Callable[[], List[Tuple[Any, ...]]]
+
+
+class TBenchCase(NamedTuple):
+    name: str
+    f: Callable[..., Any]
+    prepare: TPrepare
+
+
+def get_bench_cases(fixture_path: str = DEFAULT_FIXTURE_PATH, abi_dir: str = "abi/abis") -> List[TBenchCase]:
+    """Builds benchmark cases from the recorded blocks in `fixture_path` and ABIs in `abi_dir`"""
+    from web3 import Web3
+    from web3._utils.abi import abi_to_signature
+    from web3._utils.method_formatters import get_result_formatters
+    from web3._utils.rpc_abi import RPC
+    from ethereum.eth_source_utils import (
+        abi_to_selector, maybe_load_abis, signature_to_abi, decode_tx, decode_log, prettify_decoded, recode_tuples, uint_to_wei, flatten_batches
+    )
+
+    w3 = Web3()
+    codec = w3.codec
+    contracts = maybe_load_abis(abi_dir)
+    fixture = load_fixture(fixture_path)
+    block_formatter = get_result_formatters(RPC.eth_getBlockByNumber, w3.eth)
+    receipt_formatter = get_result_formatters(RPC.eth_getTransactionReceipt, w3.eth)
+
+    abis = [abi for info in contracts.values() for abi in info["abi"] if abi["type"] in ("function", "event")]
+    # signatures without arguments are not handled by signature_to_abi
+    signatures = [(abi["type"], abi_to_signature(abi)) for abi in abis if abi["inputs"]]
+
+    # (contract, abi, selector, params) of recorded calls to decoded contracts
+    calls: List[Tuple[Any, Any, HexBytes, bytes]] = []
+    for block in fixture["blocks"].values():
+        for tx in block_formatter(block)["transactions"]:  # type: ignore
+            tx_input = HexBytes(tx["input"])
+            selector = tx_input[:4]
+            if tx["to"] in contracts and selector in contracts[tx["to"]]["selectors"]:
+                calls.append((contracts[tx["to"]], contracts[tx["to"]]["selectors"][selector], selector, bytes(tx_input[4:])))
+    # (contract, abi, selector, log) of recorded logs of decoded contracts
+    logs: List[Tuple[Any, Any, HexBytes, Any]] = []
+    for receipt in fixture["receipts"].values():
+        for log in receipt_formatter(receipt)["logs"]:  # type: ignore
+            if log["address"] in contracts and log["topics"][0] in contracts[log["address"]]["selectors"]:
+                logs.append((contracts[log["address"]], contracts[log["address"]]["selectors"][log["topics"][0]], log["topics"][0], log))
+    # logs with indexed arguments for the index recovery path, each decoded with its own abi without index information
+    indexed_logs = [(abi, log) for _, abi, _, log in logs if len(log["topics"]) > 1]
+
+    decoded = [(contract, decode_tx(codec, abi, params), abi, selector) for contract, abi, selector, params in calls]
+    decoded += [(contract, dict(decode_log(codec, abi, log)["args"]), abi, selector) for contract, abi, selector, log in logs]
+    # uint_to_wei and flatten_batches take decoded values with tuples already recoded into dicts
+    recoded = deepcopy(decoded)
+    for _, values, abi, _ in recoded:
+        recode_tuples(values, abi)
+
+    def _unindexed_log(abi: Any, log: Any) -> Tuple[Any, ...]:
+        abi = deepcopy(abi)
+        for input_ in abi["inputs"]:
+            input_["indexed"] = False
+        return (codec, abi, log)
+
+    return [
+        TBenchCase("abi_to_selector", abi_to_selector, lambda: [(abi,) for abi in abis]),
+        TBenchCase("maybe_load_abis", maybe_load_abis, lambda: [(abi_dir,)]),
+        TBenchCase("signature_to_abi", signature_to_abi, lambda: list(signatures)),
+        TBenchCase("decode_tx", decode_tx, lambda: [(codec, abi, params) for _, abi, _, params in calls]),
+        TBenchCase("decode_log", decode_log, lambda: [(codec, abi, log) for _, abi, _, log in logs]),
+        TBenchCase("decode_log_recover_index", decode_log, lambda: [_unindexed_log(abi, log) for abi, log in indexed_logs]),
+        TBenchCase("prettify_decoded", prettify_decoded, lambda: [(contract, deepcopy(values), abi, selector) for contract, values, abi, selector in decoded]),
+        TBenchCase("uint_to_wei", uint_to_wei, lambda: [(contract, deepcopy(values), abi["inputs"], selector) for contract, values, abi, selector in recoded]),
+        TBenchCase("flatten_batches", flatten_batches, lambda: [(deepcopy(values), abi) for _, values, abi, _ in recoded])
+    ]
+
+
+def _time_case(case: TBenchCase, min_seconds: float) -> float:
+    # repeat the prepared calls until they took at least min_seconds, returns seconds per call
+    elapsed = 0.0
+    calls = 0
+    while calls == 0 or elapsed < min_seconds:
+        args_list = case.prepare()
+        # like timeit, garbage collection of the prepared copies is not timed
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            for args in args_list:
+                case.f(*args)
+            elapsed += time.perf_counter() - started
+        finally:
+            gc.enable()
+        calls += len(args_list)
+    return elapsed / calls
+
+
+def run_benchmark(
+    cases: Sequence[str] = None, repeats: int = 5, min_seconds: float = 0.2, fixture_path: str = DEFAULT_FIXTURE_PATH, abi_dir: str = "abi/abis"
+) -> List[DictStrAny]:
+    from dlt.common import logger
+
+    results: List[DictStrAny] = []
+    # index recovery warns on each call, keep the output readable
+    logger_level = logger.LOGGER.level if logger.LOGGER else None
+    if logger.LOGGER:
+        logger.LOGGER.setLevel("CRITICAL")
+    try:
+        for case in get_bench_cases(fixture_path, abi_dir):
+            if cases and case.name not in cases:
+                continue
+            # warm up caches ie. of the codec and web3 utils
+            _time_case(case, 0.0)
+            times = [_time_case(case, min_seconds) for _ in range(repeats)]
+            per_call = statistics.median(times)
+            results.append({
+                "case": case.name,
+                "inputs": len(case.prepare()),
+                "repeats": repeats,
+                "us_per_call": per_call * 1e6,
+                "calls_s": 1 / per_call
+            })
+    finally:
+        if logger.LOGGER:
+            logger.LOGGER.setLevel(logger_level)
+    return results
+
+
+def load_baseline(baseline_path: str = DEFAULT_BASELINE_PATH) -> Optional[List[DictStrAny]]:
+    if not os.path.isfile(baseline_path):
+        return None
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline: List[DictStrAny] = json.load(f)
+    return baseline
+
+
+def save_baseline(results: Sequence[DictStrAny], baseline_path: str = DEFAULT_BASELINE_PATH) -> None:
+    os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+    with open(baseline_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+
+def format_results(results: Sequence[DictStrAny], baseline: Sequence[DictStrAny] = None) -> str:
+    baseline_us = {r["case"]: r["us_per_call"] for r in baseline or []}
+    lines = [f"{'case':<26}{'inputs':>8}{'us/call':>11}{'calls/s':>12}{'baseline us':>13}{'change':>9}"]
+    for r in results:
+        line = f"{r['case']:<26}{r['inputs']:>8}{r['us_per_call']:>11.2f}{r['calls_s']:>12.0f}"
+        if r["case"] in baseline_us:
+            # negative change is faster than the baseline
+            line += f"{baseline_us[r['case']]:>13.2f}{(r['us_per_call'] / baseline_us[r['case']] - 1) * 100:>8.1f}%"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks decoding primitives of the Ethereum source against recorded calldata and logs")
+    parser.add_argument("--cases", nargs="*", default=BENCH_CASES, choices=BENCH_CASES)
+    parser.add_argument("--repeats", type=int, default=5, help="number of timings of each case, median is reported")
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="min duration of each timing")
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE_PATH, help="recorded blocks and receipts")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="replace the baseline with the results")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.cases, args.repeats, args.min_seconds, args.fixture)
+    print(format_results(results, load_baseline(args.baseline)))
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
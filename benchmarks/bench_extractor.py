@@ -0,0 +1,129 @@
+"""Throughput benchmark of `get_blocks` against a local JSON RPC replay server
+
+Run from the project root with `python -m benchmarks.bench_extractor`. Each mode is run in a fresh process so peak RSS is measured per mode.
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import resource
+import shutil
+import tempfile
+import time
+from typing import List, NamedTuple, Sequence
+
+from dlt.common import json
+from dlt.common.sources import get_table_name
+from dlt.common.typing import DictStrAny
+
+from tests.rpc_replay import RPCReplayServer, DEFAULT_FIXTURE_PATH
+
+
+class TBenchMode(NamedTuple):
+    name: str
+    is_deferred: bool
+    supports_batching: bool
+
+
+BENCH_MODES = [
+    TBenchMode("batched", False, True),
+    TBenchMode("not_batched", False, False),
+    TBenchMode("deferred_batched", True, True),
+    TBenchMode("deferred_not_batched", True, False)
+]
+
+
+def _run_mode(node_url: str, abi_dir: str, mode: TBenchMode, blocks: int, result_q: "multiprocessing.Queue[DictStrAny]") -> None:
+    from ethereum import get_blocks, get_blocks_deferred
+
+    get_f = get_blocks_deferred if mode.is_deferred else get_blocks
+    block_count = tx_count = decoded_count = 0
+    started = time.perf_counter()
+    for item in get_f(node_url, max_blocks=blocks, abi_dir=abi_dir, is_poa=True, supports_batching=mode.supports_batching):
+        # deferred items are evaluated here, like in `Pipeline.extract`
+        items: Sequence[DictStrAny] = item() if callable(item) else [item]  # type: ignore
+        for i in items:
+            if get_table_name(i) is None:
+                block_count += 1
+                tx_count += len(i["transactions"])
+            else:
+                decoded_count += 1
+    elapsed = time.perf_counter() - started
+    result_q.put({
+        "mode": mode.name,
+        "elapsed": elapsed,
+        "blocks": block_count,
+        "txs": tx_count,
+        "decoded": decoded_count,
+        "blocks_s": block_count / elapsed,
+        "txs_s": tx_count / elapsed,
+        "decoded_s": decoded_count / elapsed,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    })
+
+
+def run_benchmark(
+    modes: Sequence[TBenchMode] = BENCH_MODES,
+    blocks: int = 100,
+    fixture_path: str = DEFAULT_FIXTURE_PATH,
+    abi_dir: str = "abi/abis",
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0
+) -> List[DictStrAny]:
+    # blocks are decoded using a copy of abis because the extractor writes abi changes back
+    work_dir = tempfile.mkdtemp()
+    try:
+        bench_abi_dir = shutil.copytree(abi_dir, os.path.join(work_dir, "abis"))
+        ctx = multiprocessing.get_context("spawn")
+        results: List[DictStrAny] = []
+        with RPCReplayServer(fixture_path, latency=latency, jitter=jitter, error_rate=error_rate) as replay:
+            for mode in modes:
+                result_q: "multiprocessing.Queue[DictStrAny]" = ctx.Queue()
+                p = ctx.Process(target=_run_mode, args=(replay.url, bench_abi_dir, mode, blocks, result_q))
+                p.start()
+                while True:
+                    try:
+                        result = result_q.get(timeout=1.0)
+                        break
+                    except queue.Empty:
+                        # do not wait forever for a result of a crashed process
+                        if not p.is_alive():
+                            raise RuntimeError(f"Benchmark mode {mode.name} failed with exit code {p.exitcode}")
+                p.join()
+                results.append(result)
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def format_results(results: Sequence[DictStrAny]) -> str:
+    lines = [f"{'mode':<22}{'blocks/s':>10}{'txs/s':>10}{'decoded/s':>11}{'peak RSS MB':>13}"]
+    for r in results:
+        lines.append(f"{r['mode']:<22}{r['blocks_s']:>10.1f}{r['txs_s']:>10.1f}{r['decoded_s']:>11.1f}{r['peak_rss_mb']:>13.1f}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks Ethereum source throughput against recorded JSON RPC responses")
+    parser.add_argument("--blocks", type=int, default=100, help="number of blocks to extract in each mode")
+    parser.add_argument("--modes", nargs="*", default=[m.name for m in BENCH_MODES], choices=[m.name for m in BENCH_MODES])
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE_PATH, help="recorded blocks and receipts")
+    parser.add_argument("--latency", type=float, default=0.0, help="latency of each RPC response in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="max random deviation from latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of RPC responses failing with HTTP 503")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    modes = [m for m in BENCH_MODES if m.name in args.modes]
+    results = run_benchmark(modes, args.blocks, args.fixture, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
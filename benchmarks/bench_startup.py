@@ -0,0 +1,114 @@
+"""Cold start benchmark of the extractor and loader entry points
+
+Run from the project root with `python -m benchmarks.bench_startup`. Each run starts a fresh interpreter that executes the module level imports of the entry point script.
+The extractor additionally gets its first block from a local JSON RPC replay server. Reports wall time of the process and tells if web3 was imported by the module level imports.
+"""
+
+import argparse
+import ast
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, NamedTuple, Sequence
+
+from dlt.common import json
+from dlt.common.typing import DictStrAny
+
+from tests.rpc_replay import RPCReplayServer, DEFAULT_FIXTURE_PATH
+
+
+class TStartupTarget(NamedTuple):
+    name: str
+    entry_point: str
+    get_first_block: bool
+
+
+STARTUP_TARGETS = [
+    TStartupTarget("extractor", "axies.py", True),
+    TStartupTarget("loader", "axies_load.py", False)
+]
+
+_CHILD_CODE = """
+import sys, time
+started = time.perf_counter()
+{imports}
+imported = time.perf_counter()
+web3_on_import = "web3" in sys.modules
+if {get_first_block}:
+    from ethereum import get_blocks
+    next(iter(get_blocks(sys.argv[1], max_blocks=1, abi_dir=sys.argv[2], is_poa=True)))
+done = time.perf_counter()
+import json
+print(json.dumps({{"import_s": imported - started, "first_block_s": done - imported, "web3_on_import": web3_on_import}}))
+"""
+
+
+def get_entry_point_imports(entry_point: str) -> str:
+    """Returns the module level import statements of `entry_point` script"""
+    with open(entry_point, "r", encoding="utf-8") as f:
+        source = f.read()
+    module = ast.parse(source)
+    return "\n".join(ast.get_source_segment(source, node) for node in module.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def _run_target(target: TStartupTarget, node_url: str, abi_dir: str) -> DictStrAny:
+    code = _CHILD_CODE.format(imports=get_entry_point_imports(target.entry_point), get_first_block=target.get_first_block)
+    started = time.perf_counter()
+    p = subprocess.run([sys.executable, "-c", code, node_url, abi_dir], capture_output=True, text=True, check=True)
+    result: DictStrAny = json.loads(p.stdout.splitlines()[-1])
+    result["total_s"] = time.perf_counter() - started
+    return result
+
+
+def run_benchmark(targets: Sequence[TStartupTarget] = STARTUP_TARGETS, runs: int = 5, fixture_path: str = DEFAULT_FIXTURE_PATH, abi_dir: str = "abi/abis") -> List[DictStrAny]:
+    # the extractor writes abi changes back so work on a copy
+    work_dir = tempfile.mkdtemp()
+    try:
+        bench_abi_dir = shutil.copytree(abi_dir, os.path.join(work_dir, "abis"))
+        results: List[DictStrAny] = []
+        with RPCReplayServer(fixture_path) as replay:
+            for target in targets:
+                target_runs = [_run_target(target, replay.url, bench_abi_dir) for _ in range(runs)]
+                results.append({
+                    "target": target.name,
+                    "runs": runs,
+                    # median is not sensitive to the first run filling the OS file cache
+                    "total_s": statistics.median(r["total_s"] for r in target_runs),
+                    "import_s": statistics.median(r["import_s"] for r in target_runs),
+                    "first_block_s": statistics.median(r["first_block_s"] for r in target_runs),
+                    "web3_on_import": any(r["web3_on_import"] for r in target_runs)
+                })
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def format_results(results: Sequence[DictStrAny]) -> str:
+    lines = [f"{'target':<12}{'total s':>10}{'import s':>10}{'first block s':>15}{'web3 on import':>16}"]
+    for r in results:
+        lines.append(f"{r['target']:<12}{r['total_s']:>10.3f}{r['import_s']:>10.3f}{r['first_block_s']:>15.3f}{str(r['web3_on_import']):>16}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks cold start time of the extractor and loader entry points")
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh processes started for each target")
+    parser.add_argument("--targets", nargs="*", default=[t.name for t in STARTUP_TARGETS], choices=[t.name for t in STARTUP_TARGETS])
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE_PATH, help="recorded blocks and receipts")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    targets = [t for t in STARTUP_TARGETS if t.name in args.targets]
+    results = run_benchmark(targets, args.runs, args.fixture)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
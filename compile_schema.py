@@ -0,0 +1,32 @@
+import sys
+
+import yaml
+
+from dlt.common import logger
+from dlt.common.schema import Schema
+
+from ethereum.ethereum import add_decoded_tables
+
+# compiles tables of all calls and events of the decoded contracts into axies schema so they are not inferred and migrated at runtime
+# usage: python compile_schema.py [schema file] [abi dir]
+schema_path = sys.argv[1] if len(sys.argv) > 1 else "axies_schema.yaml"
+abi_dir = sys.argv[2] if len(sys.argv) > 2 else "abi/abis"
+
+# generated tables are kept between markers so they are replaced on each run and the rest of the file keeps its formatting and comments
+GENERATED_BEGIN = "  # tables of decoded calls and events generated with compile_schema.py, do not edit\n"
+GENERATED_END = "  # end of generated tables\n"
+
+with open(schema_path, "r", encoding="utf-8") as f:
+    lines = f.readlines()
+if GENERATED_BEGIN in lines:
+    del lines[lines.index(GENERATED_BEGIN):lines.index(GENERATED_END) + 1]
+schema = Schema.from_dict(yaml.safe_load("".join(lines)))
+
+added = sorted(add_decoded_tables(schema, abi_dir))
+tables = schema.to_dict(remove_defaults=True)["tables"]
+generated = yaml.dump({name: tables[name] for name in added}, sort_keys=False, allow_unicode=True)
+settings_idx = lines.index("settings:\n")
+lines[settings_idx:settings_idx] = [GENERATED_BEGIN] + ["  " + line for line in generated.splitlines(keepends=True)] + [GENERATED_END]
+with open(schema_path, "w", encoding="utf-8") as f:
+    f.writelines(lines)
+logger.info(f"Compiled {len(added)} tables of decoded calls and events from {abi_dir} into {schema_path}")
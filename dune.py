@@ -1,41 +1,32 @@
-from dune_client.client import DuneClient
-from dune_client.query import Query
-
-from dlt.pipeline import Pipeline
+from dlt.pipeline import Pipeline, CannotRestorePipelineException
 
+from dune_source import DuneQuery, chunk_rows, get_schema, query_dune
 from helpers import config, secrets, get_credentials
 
 credentials = get_credentials(config.get("client_type"), config.get("default_dataset"), secrets.get("credentials", {}))
 
 
-def query_dune_api(api_key, queries):
-    """Yields results of dune queries
-
-    Args:
-        api_key (str): Dune API Key
-        queries (Query): A Dune Query object
-
-    Yields:
-        Tuple(str, str, List[DuneRecord]): For each executed query yields a tuple with query id, query name and a list of rows as dictionaries
-    """
-    dune = DuneClient(api_key)
-    for q in queries:
-        yield q.query_id, q.name, dune.refresh(q)
-    
-
-# two example queries
-q1 = Query("rudolfix_axie_evolved", 1283375)
-q2 = Query("unionepro_Bridge_Across_Transfers", 522870)
+# two example queries, both replace their tables on each run
+q1 = DuneQuery("rudolfix_axie_evolved", 1283375)
+q2 = DuneQuery("unionepro_Bridge_Across_Transfers", 522870)
+# incremental query gets only the rows past the highest `block_number` loaded so far. the Dune query must declare `min_block` parameter and filter on it:
+# DuneQuery("axie_evolved_incremental", <query id>, write_disposition="append", watermark_column="block_number", watermark_param="min_block")
+queries = [q1, q2]
 
 pipeline = Pipeline("dune")
-pipeline.create_pipeline(
+# state with the watermarks of incremental queries is kept in working dir
+try:
+    pipeline.restore_pipeline(credentials, config["working_dir"])
+except CannotRestorePipelineException:
+    pipeline.create_pipeline(
         credentials,
-        working_dir=config["working_dir"]
+        working_dir=config["working_dir"],
+        schema=get_schema(queries)
     )
 
-for r in query_dune_api(str(secrets.get("dune_api_key")), [q1, q2]):
-    pipeline.extract(r[2], table_name = r[1])
+# queries are executed concurrently and each result is extracted as soon as its query completes, in chunks to bound the memory used by extract
+for query, rows in query_dune(str(secrets.get("dune_api_key")), queries, state=pipeline.state):
+    for chunk in chunk_rows(query, rows, pipeline.state):
+        pipeline.extract(chunk, table_name=query.name)
 
 pipeline.flush()
-    
-
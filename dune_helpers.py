@@ -1,3 +1,10 @@
+import time
+
+from dune_client.client import DuneClient
+from dune_client.models import ExecutionState
+from dune_client.query import Query
+
+
 def refresh(c: DuneClient, query: Query, ping_frequency: int = 5):
         """
         Executes a Dune `query`, waits until execution completes,
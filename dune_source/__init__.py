@@ -0,0 +1,3 @@
+from .dune_source import DuneAPI, DuneExecutionError, DuneQuery, chunk_rows, get_schema, query_dune
+
+__all__ = ["DuneAPI", "DuneExecutionError", "DuneQuery", "chunk_rows", "get_schema", "query_dune"]
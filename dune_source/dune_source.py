@@ -0,0 +1,282 @@
+"""Dune Analytics source
+
+Talks to the Dune REST API directly. All queries are submitted at once and their executions are polled concurrently, each with its own backoff: the status
+is checked every `min_poll_interval` at first and the interval grows up to `max_poll_interval` while the query is still running. Results are yielded as soon as
+a query completes, so a run takes as long as the slowest query and not as long as all of them together.
+
+Result rows are streamed page by page. Pages of each completed query are fetched in the background into a buffer of at most `max_buffered_pages`, so pages
+of different queries are fetched at the same time while the memory used does not depend on the size of the results. `chunk_rows` splits the rows of a query into
+chunks of `chunk_size` to be extracted one by one, as `pipeline.extract` holds all extracted items in memory.
+
+Incremental queries keep the highest value of their `watermark_column` in the pipeline state and pass it as a query parameter on the next run, so the query
+computes and returns only new rows which are appended to the table. The watermark is advanced when a chunk is extracted, so incremental queries should return
+rows ordered by the watermark column. Other queries are executed over full history and replace their tables.
+"""
+
+import threading
+import time
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from queue import Full, Queue
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import requests
+
+from dlt.common import logger
+from dlt.common.schema import Schema
+from dlt.common.schema.typing import TWriteDisposition
+from dlt.common.schema.utils import new_table
+from dlt.common.typing import DictStrAny, StrAny
+
+
+BASE_URL = "https://api.dune.com/api/v1"
+REQUESTS_TIMEOUT = (20, 60)
+# rows requested with a single results call
+PAGE_SIZE = 10000
+# rows extracted at once
+CHUNK_SIZE = 50000
+# poll interval is multiplied by this factor after each status check of a running query
+POLL_BACKOFF = 1.5
+
+STATE_COMPLETED = "QUERY_STATE_COMPLETED"
+STATES_FAILED = {"QUERY_STATE_FAILED", "QUERY_STATE_CANCELLED", "QUERY_STATE_EXPIRED"}
+
+
+class DuneQuery(NamedTuple):
+    name: str
+    query_id: int
+    params: StrAny = None
+    # `append` for incremental queries, `replace` reloads the whole table. merge is not supported by the loaders
+    write_disposition: TWriteDisposition = "replace"
+    # the highest value in this column is kept in state and passed to the query as `watermark_param`, defaults to the column name
+    watermark_column: str = None
+    watermark_param: str = None
+
+
+class DuneExecutionError(Exception):
+    def __init__(self, query: DuneQuery, execution_id: str, state: str) -> None:
+        self.query = query
+        self.execution_id = execution_id
+        self.state = state
+        super().__init__(f"Execution {execution_id} of Dune query {query.name} ({query.query_id}) ended with {state}")
+
+
+class DuneAPI:
+    """Minimal client of Dune query execution endpoints, safe to use from many threads"""
+
+    def __init__(self, api_key: str, base_url: str = BASE_URL) -> None:
+        self.base_url = base_url.rstrip("/")
+        self._headers = {"x-dune-api-key": api_key}
+        self._local = threading.local()
+
+    def execute(self, query: DuneQuery) -> str:
+        """Submits `query` for execution and returns the execution id"""
+        response = self._request("POST", f"query/{query.query_id}/execute", json={"query_parameters": dict(query.params or {})})
+        execution_id: str = response["execution_id"]
+        return execution_id
+
+    def get_state(self, execution_id: str) -> str:
+        state: str = self._request("GET", f"execution/{execution_id}/status")["state"]
+        return state
+
+    def get_rows_page(self, execution_id: str, offset: int, limit: int) -> Tuple[List[DictStrAny], Optional[int]]:
+        """Returns `limit` result rows starting at `offset` and the offset of the next page or None if this is the last page"""
+        response = self._request("GET", f"execution/{execution_id}/results", params={"limit": limit, "offset": offset})
+        rows: List[DictStrAny] = response["result"]["rows"]
+        return rows, response.get("next_offset")
+
+    def _request(self, method: str, path: str, **kwargs: Any) -> Any:
+        # requests sessions are not thread safe so each thread keeps its own connection pool
+        session: requests.Session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        r = session.request(method, f"{self.base_url}/{path}", headers=self._headers, timeout=REQUESTS_TIMEOUT, **kwargs)
+        r.raise_for_status()
+        return r.json()
+
+
+def get_schema(queries: Sequence[DuneQuery], schema_name: str = "dune") -> Schema:
+    """Returns schema with a table for each of the `queries` with its write disposition"""
+    schema = Schema(schema_name)
+    for query in queries:
+        schema.update_schema(new_table(schema.normalize_table_name(query.name), write_disposition=query.write_disposition))
+    return schema
+
+
+def query_dune(
+    api_key: str, queries: Sequence[DuneQuery], min_poll_interval: float = 1.0, max_poll_interval: float = 30.0, max_workers: int = 8, base_url: str = BASE_URL,
+    page_size: int = PAGE_SIZE, max_buffered_pages: int = 2, state: DictStrAny = None
+    ) -> Iterator[Tuple[DuneQuery, Iterator[DictStrAny]]]:
+    """Executes all `queries` concurrently and yields each query with an iterator over its result rows in order of completion. Rows of each query should be
+    consumed (ie. by `pipeline.extract`) before the next query is taken, pages of the queries completed in the meantime are fetched ahead up to `max_buffered_pages`.
+
+    Args:
+        api_key (str): Dune API key
+        queries (Sequence[DuneQuery]): Queries to execute, `params` are passed as query parameters
+        min_poll_interval (float, optional): Seconds to wait before the first status check of an execution. Defaults to 1.0.
+        max_poll_interval (float, optional): Max seconds between status checks of an execution. Defaults to 30.0.
+        max_workers (int, optional): Max number of concurrent page fetches and, separately, of concurrent status checks. Defaults to 8.
+        base_url (str, optional): Dune API url. Defaults to `BASE_URL`.
+        page_size (int, optional): Number of rows requested at once. Defaults to `PAGE_SIZE`.
+        max_buffered_pages (int, optional): Max number of pages of each query fetched ahead of the consumer. Defaults to 2.
+        state (DictStrAny, optional): Pipeline state that keeps the watermarks of incremental queries, updated by `chunk_rows`. Required by incremental queries.
+
+    Yields:
+        Iterator[Tuple[DuneQuery, Iterator[DictStrAny]]]: Each query with an iterator over its result rows, as soon as the query completes
+    """
+    queries = [_with_watermark(query, state) for query in queries]
+    api = DuneAPI(api_key, base_url)
+    stop = threading.Event()
+    # completed queries with their page readers, an exception or None when all queries were yielded
+    completed: "Queue[Any]" = Queue()
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dune")
+    # page readers block while their buffers are full so polling gets its own pool
+    poll_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dune_poll")
+
+    def _on_completed(query: DuneQuery, execution_id: str) -> None:
+        reader = _PageReader(api, execution_id, page_size, max_buffered_pages, stop)
+        executor.submit(reader.fetch)
+        completed.put((query, reader))
+
+    poller = threading.Thread(
+        target=_poll_executions, args=(api, poll_executor, queries, min_poll_interval, max_poll_interval, _on_completed, completed, stop), name="dune_poll", daemon=True
+    )
+    poller.start()
+    try:
+        for item in iter(completed.get, None):
+            if isinstance(item, Exception):
+                raise item
+            query, reader = item
+            yield query, reader.rows()
+    except BaseException:
+        # stop polling and fetching if query failed or consumer exits early
+        stop.set()
+        raise
+    finally:
+        poller.join()
+        poll_executor.shutdown()
+        # pages of the last queries may still be fetched
+        executor.shutdown(wait=False)
+
+
+def chunk_rows(query: DuneQuery, rows: Iterator[DictStrAny], state: DictStrAny = None, chunk_size: int = CHUNK_SIZE) -> Iterator[Iterator[DictStrAny]]:
+    """Splits `rows` of `query` into chunks of at most `chunk_size` rows, each to be passed to a separate `pipeline.extract` call. The watermark of incremental
+    `query` is advanced in `state` when all rows of a chunk are consumed, so it is stored with the extract of that chunk and restored if the extract fails.
+    """
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield _track_watermark(query, iter(chunk), state) if query.watermark_column else iter(chunk)
+
+
+def _with_watermark(query: DuneQuery, state: DictStrAny) -> DuneQuery:
+    # passes the watermark of incremental query from the previous run as a parameter
+    if not query.watermark_column:
+        return query
+    if query.write_disposition != "append":
+        raise ValueError(f"Incremental Dune query {query.name} must use append write disposition, not {query.write_disposition}")
+    if state is None:
+        raise ValueError(f"Incremental Dune query {query.name} requires state to keep the watermark")
+    watermark = state.get("dune_watermarks", {}).get(query.name)
+    if watermark is None:
+        # first run gets the full history
+        return query
+    params = dict(query.params or {})
+    params[query.watermark_param or query.watermark_column] = watermark
+    return query._replace(params=params)
+
+
+def _track_watermark(query: DuneQuery, rows: Iterator[DictStrAny], state: DictStrAny) -> Iterator[DictStrAny]:
+    watermark = state.get("dune_watermarks", {}).get(query.name)
+    for row in rows:
+        value = row.get(query.watermark_column)
+        if value is not None and (watermark is None or value > watermark):
+            watermark = value
+        yield row
+    # stored only when all rows were consumed
+    if watermark is not None:
+        state.setdefault("dune_watermarks", {})[query.name] = watermark
+
+
+def _poll_executions(
+    api: DuneAPI, executor: ThreadPoolExecutor, queries: Sequence[DuneQuery], min_poll_interval: float, max_poll_interval: float,
+    on_completed: Callable[[DuneQuery, str], None], completed: "Queue[Any]", stop: threading.Event
+    ) -> None:
+    try:
+        # submit all queries at once
+        execution_ids = list(executor.map(api.execute, queries))
+        running: Dict[str, Tuple[DuneQuery, float]] = {}
+        next_poll: Dict[str, float] = {}
+        now = time.monotonic()
+        for query, execution_id in zip(queries, execution_ids):
+            logger.info("Dune query %s (%s) submitted as %s", query.name, query.query_id, execution_id)
+            running[execution_id] = (query, min_poll_interval)
+            next_poll[execution_id] = now + min_poll_interval
+
+        while running and not stop.is_set():
+            # check status of all executions due to be polled
+            now = time.monotonic()
+            due = [execution_id for execution_id in running if next_poll[execution_id] <= now]
+            for execution_id, state in zip(due, executor.map(api.get_state, due)):
+                query, interval = running[execution_id]
+                if state == STATE_COMPLETED:
+                    logger.info("Dune query %s completed", query.name)
+                    del running[execution_id]
+                    on_completed(query, execution_id)
+                elif state in STATES_FAILED:
+                    raise DuneExecutionError(query, execution_id, state)
+                else:
+                    interval = min(interval * POLL_BACKOFF, max_poll_interval)
+                    running[execution_id] = (query, interval)
+                    next_poll[execution_id] = time.monotonic() + interval
+            if running:
+                # wakes up when stopped
+                stop.wait(max(0.0, min(next_poll.get(e) for e in running) - time.monotonic()))
+        completed.put(None)
+    except Exception as ex:
+        completed.put(ex)
+
+
+class _PageReader:
+    """Fetches result pages of an execution into a bounded buffer and iterates over their rows"""
+
+    def __init__(self, api: DuneAPI, execution_id: str, page_size: int, max_buffered_pages: int, stop: threading.Event) -> None:
+        self.api = api
+        self.execution_id = execution_id
+        self.page_size = page_size
+        self._stop = stop
+        self._closed = threading.Event()
+        # pages of rows, an exception or None after the last page
+        self._pages: "Queue[Any]" = Queue(maxsize=max_buffered_pages)
+
+    def fetch(self) -> None:
+        try:
+            offset: Optional[int] = 0
+            while offset is not None:
+                rows, offset = self.api.get_rows_page(self.execution_id, offset, self.page_size)
+                if not self._put(rows):
+                    return
+            self._put(None)
+        except Exception as ex:
+            self._put(ex)
+
+    def rows(self) -> Iterator[DictStrAny]:
+        try:
+            for page in iter(self._pages.get, None):
+                if isinstance(page, Exception):
+                    raise page
+                yield from page
+        finally:
+            # stop fetching if the rows are not consumed to the end
+            self._closed.set()
+
+    def _put(self, item: Any) -> bool:
+        # blocks while the buffer is full, gives up if reader or query_dune is closed
+        while not (self._closed.is_set() or self._stop.is_set()):
+            try:
+                self._pages.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
@@ -1 +1,24 @@
-from .ethereum import get_schema, get_blocks, get_blocks_deferred, get_known_contracts
+"""Ethereum source
+
+Public functions are imported from `ethereum.ethereum` and `ethereum.scheduler` on first use so importing the package or its light modules (ie. `metrics` or `block_filter`) does not load web3.
+"""
+
+from typing import TYPE_CHECKING, Any
+
+
+if TYPE_CHECKING:
+    from .ethereum import get_schema, get_blocks, get_blocks_deferred, get_known_contracts, get_decoded_addresses, follow_head, redecode
+    from .scheduler import ChainSource, add_backfill, follow_chains, follow_head_with_backfill
+
+__all__ = ["get_schema", "get_blocks", "get_blocks_deferred", "get_known_contracts", "get_decoded_addresses", "follow_head", "redecode", "ChainSource", "follow_chains", "add_backfill", "follow_head_with_backfill"]
+_SCHEDULER_NAMES = ["ChainSource", "follow_chains", "add_backfill", "follow_head_with_backfill"]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _SCHEDULER_NAMES:
+        from . import scheduler
+        return getattr(scheduler, name)
+    if name in __all__:
+        from . import ethereum
+        return getattr(ethereum, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,161 @@
+"""ABIs of known contracts shared by all extractors working on the same ABI dir
+
+ABI files are loaded once per process and `abi_dir` is polled for modified files which are reloaded one by one. Selectors resolved with the signature
+database (or found unknown) are recorded in a sqlite store in `abi_dir` so extractors running in other processes see them without another lookup or reloading
+the ABI files. Only ABI files with new selectors are written after a block is decoded.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Sequence, Set, cast
+from hexbytes import HexBytes
+
+from eth_typing.evm import ChecksumAddress
+from web3.types import ABIElement
+
+from dlt.common import json, logger
+
+from .eth_source_utils import TABIInfo, is_abi_file, load_abi, maybe_update_abi, save_abis
+
+
+STORE_FILE_NAME = ".selectors.sqlite"
+# how often abi_dir is checked for modified files
+POLL_INTERVAL = 5.0
+
+_REGISTRIES: Dict[str, "ABIRegistry"] = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+class ABIRegistry:
+    def __init__(self, abi_dir: str, poll_interval: float = POLL_INTERVAL) -> None:
+        self.abi_dir = abi_dir
+        self.poll_interval = poll_interval
+        # all known contracts and the ones to be decoded, both are updated in place
+        self.contracts: Dict[ChecksumAddress, TABIInfo] = {}
+        self.decoded: Dict[ChecksumAddress, TABIInfo] = {}
+        self._mtimes: Dict[str, int] = {}
+        self._dirty: Set[ChecksumAddress] = set()
+        self._last_poll = 0.0
+        self._last_rowid = 0
+        self._lock = threading.RLock()
+        self._store: sqlite3.Connection = None
+        if abi_dir:
+            self._store = _open_store(os.path.join(abi_dir, STORE_FILE_NAME))
+            self.refresh(force=True)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reloads modified ABI files and gets selectors resolved by other processes if `poll_interval` elapsed. Returns True if any contract changed"""
+        with self._lock:
+            if not self.abi_dir or (not force and time.monotonic() - self._last_poll < self.poll_interval):
+                return False
+            self._last_poll = time.monotonic()
+            files_changed = self._reload_files()
+            return self._pull_selectors() or files_changed
+
+    def get_abi(self, abi_info: TABIInfo, selector: HexBytes) -> Optional[ABIElement]:
+        """Returns ABI of `selector`, if not known checks if other processes resolved it"""
+        abi = abi_info["selectors"].get(selector)
+        if abi is None and self._store and abi_info["unknown_selectors"].get(selector.hex()) is None:
+            with self._lock:
+                self._pull_selectors()
+                abi = abi_info["selectors"].get(selector)
+        return abi
+
+    def update_abi(self, abi_info: TABIInfo, selector: HexBytes, new_abi: ABIElement, in_block: int) -> None:
+        """Adds resolved or unknown `selector` to the contract and shares it with other processes"""
+        with self._lock:
+            maybe_update_abi(abi_info, selector, new_abi, in_block)
+            self._dirty.add(cast(ChecksumAddress, abi_info["address"]))
+            if self._store:
+                self._store.execute(
+                    "INSERT OR IGNORE INTO selectors (address, selector, abi, block) VALUES (?, ?, ?, ?)",
+                    (abi_info["address"], selector.hex(), json.dumps(new_abi) if new_abi else None, in_block)
+                )
+                self._store.commit()
+
+    def save(self) -> None:
+        """Writes ABI files of contracts with new selectors"""
+        with self._lock:
+            if not self.abi_dir or not self._dirty:
+                return
+            changed = [self.contracts[address] for address in self._dirty if address in self.contracts]
+            save_abis(self.abi_dir, changed)
+            # do not reload own changes
+            for contract in changed:
+                self._mtimes[contract["abi_file"]] = os.stat(os.path.join(self.abi_dir, contract["abi_file"])).st_mtime_ns
+            self._dirty.clear()
+
+    def _reload_files(self) -> bool:
+        changed = False
+        present: Set[str] = set()
+        for abi_file in os.scandir(self.abi_dir):
+            if not is_abi_file(abi_file):
+                continue
+            present.add(abi_file.name)
+            mtime = abi_file.stat().st_mtime_ns
+            if self._mtimes.get(abi_file.name) == mtime:
+                continue
+            self._mtimes[abi_file.name] = mtime
+            info = load_abi(abi_file.path)
+            address = cast(ChecksumAddress, info["address"])
+            if address in self.contracts:
+                logger.info("Reloading modified ABI file %s of %s", abi_file.name, info["name"])
+            self.contracts[address] = info
+            if info["should_decode"]:
+                self.decoded[address] = info
+            else:
+                self.decoded.pop(address, None)
+            # selectors resolved by all processes are kept in the store
+            self._apply_rows(self._store.execute("SELECT address, selector, abi, block FROM selectors WHERE address = ?", (address,)))
+            changed = True
+        for abi_file_name in set(self._mtimes) - present:
+            del self._mtimes[abi_file_name]
+            for address in [a for a, c in self.contracts.items() if c["abi_file"] == abi_file_name]:
+                logger.info("ABI file %s was removed", abi_file_name)
+                del self.contracts[address]
+                self.decoded.pop(address, None)
+                changed = True
+        return changed
+
+    def _pull_selectors(self) -> bool:
+        rows = self._store.execute("SELECT rowid, address, selector, abi, block FROM selectors WHERE rowid > ? ORDER BY rowid", (self._last_rowid,)).fetchall()
+        if rows:
+            self._last_rowid = rows[-1][0]
+        return self._apply_rows(row[1:] for row in rows)
+
+    def _apply_rows(self, rows: Iterable[Sequence[Any]]) -> bool:
+        changed = False
+        for address, selector, abi, block in rows:
+            abi_info = self.contracts.get(address)
+            selector_bytes = HexBytes(selector)
+            if abi_info is None or selector_bytes in abi_info["selectors"] or selector in abi_info["unknown_selectors"]:
+                continue
+            if abi:
+                new_abi: ABIElement = json.loads(abi)
+                abi_info["abi"].append(new_abi)  # type: ignore
+                abi_info["selectors"][selector_bytes] = new_abi
+            else:
+                abi_info["unknown_selectors"][selector] = {"selector": selector, "block": block}
+            changed = True
+        return changed
+
+
+def get_registry(abi_dir: str) -> ABIRegistry:
+    """Returns ABI registry of `abi_dir` shared by all extractors in the process"""
+    key = os.path.abspath(abi_dir) if abi_dir else ""
+    with _REGISTRIES_LOCK:
+        registry = _REGISTRIES.get(key)
+        if registry is None:
+            registry = _REGISTRIES[key] = ABIRegistry(abi_dir)
+    return registry
+
+
+def _open_store(store_path: str) -> sqlite3.Connection:
+    # connection is used from many threads under registry lock
+    store = sqlite3.connect(store_path, timeout=30, check_same_thread=False)
+    store.execute("PRAGMA journal_mode=WAL")
+    store.execute("CREATE TABLE IF NOT EXISTS selectors (address TEXT NOT NULL, selector TEXT NOT NULL, abi TEXT, block INTEGER, PRIMARY KEY (address, selector))")
+    store.commit()
+    return store
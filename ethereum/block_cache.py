@@ -0,0 +1,81 @@
+"""Local disk cache of raw blocks and transaction receipts
+
+Each block is stored as compressed JSON with the block and receipts as returned by the node, so blocks may be extracted and decoded again without the node.
+Files are named by block number and hash and grouped in directories of `BUCKET_SIZE` blocks. If a block number was cached with different hashes (ie. after a reorg),
+the most recently written one is returned. Files are written atomically and read through memory maps.
+
+zlib is used instead of zstd to not add a dependency. JSON of a block with receipts compresses about 5x with the default level.
+"""
+
+import mmap
+import os
+import threading
+import zlib
+from collections.abc import Mapping
+from typing import Any, Dict, Optional
+
+from dlt.common import json
+from dlt.common.typing import DictStrAny, StrAny
+from dlt.common.utils import uniq_id
+
+
+BUCKET_SIZE = 1000
+FILE_EXTENSION = ".json.z"
+
+
+class BlockCache:
+    def __init__(self, cache_dir: str, compression_level: int = 6) -> None:
+        self.cache_dir = cache_dir
+        self.compression_level = compression_level
+        # block number -> file name, per bucket, loaded on first access
+        self._index: Dict[int, Dict[int, str]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, block_number: int) -> Optional[DictStrAny]:
+        """Returns cached entry with `chain_id`, raw `block` and raw `receipts` by transaction hash or None if block is not cached"""
+        file_name = self._bucket_index(block_number).get(block_number)
+        if file_name is None:
+            return None
+        with open(os.path.join(self._bucket_dir(block_number), file_name), "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                entry: DictStrAny = json.loads(zlib.decompress(m))
+        return entry
+
+    def put(self, block_number: int, block_hash: bytes, chain_id: int, block: StrAny, receipts: StrAny) -> None:
+        """Stores raw `block` and `receipts` by transaction hash, replacing the entry of the same block number and hash"""
+        bucket_dir = self._bucket_dir(block_number)
+        os.makedirs(bucket_dir, exist_ok=True)
+        file_name = f"{block_number}_{block_hash.hex()}{FILE_EXTENSION}"
+        data = zlib.compress(json.dumps({"chain_id": chain_id, "block": to_plain(block), "receipts": receipts}).encode("utf-8"), self.compression_level)
+        temp_path = os.path.join(bucket_dir, f".{file_name}.{uniq_id()}")
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, os.path.join(bucket_dir, file_name))
+        self._bucket_index(block_number)[block_number] = file_name
+
+    def _bucket_dir(self, block_number: int) -> str:
+        return os.path.join(self.cache_dir, str(block_number // BUCKET_SIZE))
+
+    def _bucket_index(self, block_number: int) -> Dict[int, str]:
+        bucket = block_number // BUCKET_SIZE
+        with self._lock:
+            index = self._index.get(bucket)
+            if index is None:
+                index = self._index[bucket] = {}
+                bucket_dir = self._bucket_dir(block_number)
+                if os.path.isdir(bucket_dir):
+                    entries = [e for e in os.scandir(bucket_dir) if e.name.endswith(FILE_EXTENSION) and not e.name.startswith(".")]
+                    # newest file wins if block was cached with many hashes
+                    for entry in sorted(entries, key=lambda e: e.stat().st_mtime_ns):
+                        index[int(entry.name.split("_", 1)[0])] = entry.name
+        return index
+
+
+def to_plain(value: Any) -> Any:
+    """Converts AttributeDicts returned by web3 middlewares into dicts so they serialize to JSON"""
+    if isinstance(value, Mapping):
+        return {k: to_plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(v) for v in value]
+    return value
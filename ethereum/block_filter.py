@@ -0,0 +1,77 @@
+"""Allowlist of contracts and selectors applied when blocks are fetched
+
+Transactions are kept if they are sent from or to an allowed address, call an allowed function selector or emit a log of an allowed address or event selector.
+Transactions are matched on the block body first so receipts are requested only for the matching ones. Transactions that only emit matching logs are found with
+`eth_getLogs` for the block, which is called only if the block logs bloom may contain an allowed address or event selector. Only the matching logs are kept.
+"""
+
+from typing import Any, Iterable, List, Optional, Set
+from hexbytes import HexBytes
+
+from eth_typing.evm import ChecksumAddress
+from eth_utils.address import to_checksum_address
+from eth_utils.crypto import keccak
+
+from dlt.common.typing import DictStrAny
+
+from .records import LogRecord, TransactionRecord
+
+
+class BlockFilter:
+    def __init__(self, addresses: Iterable[str] = None, selectors: Iterable[str] = None) -> None:
+        """Creates allowlist of `addresses` and `selectors`. Selectors of 4 bytes are matched with transaction input and selectors of 32 bytes with the first log topic"""
+        self.addresses: Set[ChecksumAddress] = {to_checksum_address(a) for a in addresses or []}
+        self.function_selectors: Set[HexBytes] = set()
+        self.event_selectors: Set[HexBytes] = set()
+        for selector in selectors or []:
+            selector_bytes = HexBytes(selector)
+            if len(selector_bytes) == 4:
+                self.function_selectors.add(selector_bytes)
+            elif len(selector_bytes) == 32:
+                self.event_selectors.add(selector_bytes)
+            else:
+                raise ValueError(f"Selector {selector} must have 4 (function) or 32 (event) bytes")
+        # bloom bits of all addresses and event selectors
+        self._bloom_masks = [_bloom_mask(bytes(HexBytes(a))) for a in self.addresses] + [_bloom_mask(s) for s in self.event_selectors]
+
+    def matches_tx(self, tx: TransactionRecord) -> bool:
+        if getattr(tx, "to", None) in self.addresses or getattr(tx, "from", None) in self.addresses:
+            return True
+        tx_input: Optional[bytes] = getattr(tx, "input", None)
+        return bool(tx_input) and tx_input[:4] in self.function_selectors
+
+    def matches_log(self, log: LogRecord) -> bool:
+        return log.address in self.addresses or log.topic in self.event_selectors
+
+    def bloom_may_match(self, logs_bloom: bytes) -> bool:
+        """Tells if any of the allowed addresses or event selectors may be present in the logs of the block"""
+        bloom = int.from_bytes(logs_bloom, "big")
+        return any(bloom & mask == mask for mask in self._bloom_masks)
+
+    def get_logs_filters(self, block_hash: HexBytes) -> List[DictStrAny]:
+        """Returns `eth_getLogs` filters that find logs of allowed addresses and event selectors in the block"""
+        filters: List[DictStrAny] = []
+        if self.addresses:
+            filters.append({"blockHash": block_hash.hex(), "address": sorted(self.addresses)})
+        if self.event_selectors:
+            filters.append({"blockHash": block_hash.hex(), "topics": [sorted(s.hex() for s in self.event_selectors)]})
+        return filters
+
+
+def _bloom_mask(value: bytes) -> int:
+    # 3 bits of 2048 bits bloom, each taken from a pair of bytes of the value hash
+    h = keccak(value)
+    mask = 0
+    for i in range(0, 6, 2):
+        mask |= 1 << (((h[i] << 8) | h[i + 1]) & 2047)
+    return mask
+
+
+def logs_bloom(logs: Iterable[Any]) -> HexBytes:
+    """Computes logs bloom of `logs` with hex `address` and `topics`, as present in the JSON RPC receipts"""
+    bloom = 0
+    for log in logs:
+        bloom |= _bloom_mask(bytes(HexBytes(log["address"])))
+        for topic in log["topics"]:
+            bloom |= _bloom_mask(bytes(HexBytes(topic)))
+    return HexBytes(bloom.to_bytes(256, "big"))
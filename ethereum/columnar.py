@@ -0,0 +1,172 @@
+"""Columnar output of the Ethereum source (experimental)
+
+Blocks and decoded items are normalized with the relational normalizer of the schema, like in the normalize step, and the rows are collected into columns of Arrow
+record batches, one per table (`blocks`, `blocks__transactions`, `blocks__transactions__logs`, their child tables and one table per decoded call or event). The
+extracted JSON files and load package files are skipped, the rows are the same as the normalize step produces.
+
+This is a tool for bulk backfills into Parquet: the batches are not part of any load package, the dlt loader does not load Parquet files and the pipeline state
+is not used or modified. Compare its cost with the extract and normalize steps with `python -m benchmarks.bench_columnar`.
+"""
+
+import os
+import time
+from copy import deepcopy
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from dlt.common import Wei, json
+from dlt.common.arithmetics import decimal
+from dlt.common.json import custom_pua_decode
+from dlt.common.schema import Schema
+from dlt.common.schema.typing import TDataType
+from dlt.common.sources import get_table_name, with_table_name
+from dlt.common.typing import DictStrAny, StrAny
+from dlt.common.utils import uniq_id
+from dlt.pipeline.exceptions import MissingDependencyException
+
+from .ethereum import get_blocks, get_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    raise MissingDependencyException("Ethereum Source columnar mode", ["pyarrow"], "Arrow is needed to build record batches and write Parquet files.")
+
+
+# BigQuery BIGNUMERIC fits 38 integer digits, wei values are scaled by at most 18 decimals
+WEI_ARROW_TYPE = pa.decimal256(76, 18)
+WEI_QUANTUM = Decimal(1).scaleb(-18)
+DECIMAL_QUANTUM = Decimal(1).scaleb(-9)
+
+SC_TO_ARROW_TYPES: Dict[TDataType, pa.DataType] = {
+    "bigint": pa.int64(),
+    "double": pa.float64(),
+    "bool": pa.bool_(),
+    "text": pa.string(),
+    "binary": pa.binary(),
+    "timestamp": pa.timestamp("s", tz="UTC"),
+    "decimal": pa.decimal128(38, 9),
+    "complex": pa.string(),
+    "wei": WEI_ARROW_TYPE
+}
+
+
+class _TableColumns:
+    def __init__(self) -> None:
+        self.rows = 0
+        self.columns: Dict[str, List[Any]] = {}
+
+    def append(self, row: StrAny) -> None:
+        for k, v in row.items():
+            column = self.columns.get(k)
+            if column is None:
+                # new column: fill previous rows with nulls
+                column = self.columns[k] = [None] * self.rows
+            column.append(v)
+        self.rows += 1
+        # columns not present in the row
+        for column in self.columns.values():
+            if len(column) < self.rows:
+                column.append(None)
+
+
+class ArrowBatchBuilder:
+    def __init__(self, schema: Schema, load_id: str = None) -> None:
+        """Normalizes data items with the relational normalizer of `schema` and collects the rows into columns of Arrow record batches. Rows are filtered,
+        coerced and new columns and variant columns are inferred like in the pipeline normalize step, on a copy of the schema. The passed schema is not modified.
+
+        Args:
+            schema (Schema): Schema with tables, naming convention and propagation settings. Typically Ethereum or Axies schema
+            load_id (str, optional): Load id set on the root tables. Defaults to current timestamp.
+        """
+        self.schema = Schema.from_dict(deepcopy(schema.to_dict()))  # type: ignore
+        self.load_id = load_id or str(time.time())
+        self._tables: Dict[str, _TableColumns] = {}
+
+    @property
+    def row_count(self) -> int:
+        return sum(t.rows for t in self._tables.values())
+
+    def add_item(self, item: StrAny, default_table_name: str = "blocks") -> None:
+        """Normalizes a data item into rows of its table and child tables. The table name is taken from item metadata or `default_table_name`"""
+        # serialize like when extracted so the normalizer gets the same values as from the extracted files
+        event: DictStrAny = json.loads(json.dumps(item))
+        with_table_name(event, get_table_name(item) or default_table_name)
+        # same steps as in the normalize worker
+        for (table_name, parent_table), row in self.schema.normalize_data_item(self.schema, event, self.load_id):
+            row = self.schema.filter_row(table_name, row)
+            if not row:
+                continue
+            row = {k: custom_pua_decode(v) for k, v in row.items()}
+            row, partial_table = self.schema.coerce_row(table_name, parent_table, row)
+            if partial_table:
+                self.schema.update_schema(partial_table)
+            table = self._tables.get(table_name)
+            if table is None:
+                table = self._tables[table_name] = _TableColumns()
+            table.append(row)
+
+    def flush(self) -> Iterator[Tuple[str, pa.RecordBatch]]:
+        """Yields a record batch per table with all rows added since the last flush"""
+        tables, self._tables = self._tables, {}
+        for table_name, table in tables.items():
+            yield table_name, self._to_record_batch(table_name, table)
+
+    def _to_record_batch(self, table_name: str, table: _TableColumns) -> pa.RecordBatch:
+        arrays: List[pa.Array] = []
+        fields: List[pa.Field] = []
+        schema_columns = self.schema.get_table_columns(table_name)
+        for column_name, values in table.columns.items():
+            data_type = schema_columns[column_name]["data_type"]
+            arrays.append(pa.array(_convert_values(data_type, values), type=SC_TO_ARROW_TYPES[data_type]))
+            fields.append(pa.field(column_name, SC_TO_ARROW_TYPES[data_type]))
+        return pa.RecordBatch.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def _convert_values(data_type: TDataType, values: List[Any]) -> List[Any]:
+    # converts coerced values into values accepted by Arrow array of the data type
+    if data_type == "wei":
+        with decimal.localcontext(Wei.ctx):
+            return [v if v is None else Decimal(v).quantize(WEI_QUANTUM) for v in values]
+    if data_type == "decimal":
+        return [v if v is None else Decimal(v).quantize(DECIMAL_QUANTUM) for v in values]
+    return values
+
+
+def get_blocks_columnar(
+    node_url: str, last_block: int = None, max_blocks: int = None, max_initial_blocks: int = None, abi_dir: str = None, lag: int = 2, is_poa: bool = False, supports_batching: bool = True,
+    profile_dir: str = None, schema: Schema = None, batch_blocks: int = 100, load_id: str = None
+    ) -> Iterator[Tuple[str, pa.RecordBatch]]:
+    """Returns an iterator with Arrow record batches of blocks, transactions, logs and decoded data. Blocks are requested like in `get_blocks` and all the arguments
+    that are common have the same meaning. Pipeline state is not supported: the batches are not loaded by the pipeline so the last block must not be remembered.
+
+    Args:
+        schema (Schema, optional): Schema that defines table columns and normalization. If None, basic Ethereum schema is used.
+        batch_blocks (int, optional): Number of blocks in each batch. A batch for each table present in the blocks is yielded. Defaults to 100.
+        load_id (str, optional): Load id set on root tables. Defaults to current timestamp.
+
+    Yields:
+        Iterator[Tuple[str, pa.RecordBatch]]: Table name and record batch with the table rows
+    """
+    builder = ArrowBatchBuilder(schema or get_schema(), load_id)
+    blocks = 0
+    for item in get_blocks(node_url, last_block, max_blocks, max_initial_blocks, abi_dir, lag, is_poa, supports_batching, None, profile_dir):
+        if get_table_name(item) is None:
+            if blocks == batch_blocks:
+                yield from builder.flush()
+                blocks = 0
+            blocks += 1
+        builder.add_item(item)
+    yield from builder.flush()
+
+
+def write_parquet(batches: Iterable[Tuple[str, pa.RecordBatch]], output_dir: str, compression: str = "snappy") -> List[str]:
+    """Writes each record batch into a Parquet file in the `output_dir/<table name>` folder and returns the paths of written files"""
+    paths: List[str] = []
+    for table_name, batch in batches:
+        table_dir = os.path.join(output_dir, table_name)
+        os.makedirs(table_dir, exist_ok=True)
+        path = os.path.join(table_dir, f"{uniq_id()}.parquet")
+        pq.write_table(pa.Table.from_batches([batch]), path, compression=compression)
+        paths.append(path)
+    return paths
@@ -1,24 +1,33 @@
 import os
 import itertools
+from decimal import Context, Decimal
+from functools import lru_cache
 from hexbytes import HexBytes
+import numpy as np
+from numpy.typing import NDArray
 import requests
-from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union, TypedDict, Tuple, cast
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union, TypedDict, Tuple, cast
 
 from web3.types import ABI, ABIElement, ABIFunction, ABIEvent, ABIFunctionParams, ABIEventParams,  ABIFunctionComponents, LogReceipt, EventData
-from web3._utils.abi import get_abi_input_names, get_abi_input_types, map_abi_data, get_indexed_event_inputs, normalize_event_input_types
+from web3._utils.abi import get_abi_input_names, get_abi_input_types, map_abi_data, get_indexed_event_inputs, exclude_indexed_event_inputs, normalize_event_input_types
+from web3.datastructures import AttributeDict
 from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
-from web3._utils.events import get_event_data, get_event_abi_types_for_decoding
+from web3._utils.events import get_event_abi_types_for_decoding
+from web3.exceptions import InvalidEventABI, LogTopicError, MismatchedABI
 from eth_typing import HexStr
 from eth_typing.evm import ChecksumAddress
 from eth_abi.codec import ABIDecoder, TupleDecoder
 from eth_abi.exceptions import DecodingError
-from eth_abi.grammar import parse as parse_abi_type
+from eth_abi.grammar import ABIType, BasicType, TupleType, parse as parse_abi_type
 from eth_utils.address import to_checksum_address
+from eth_utils.conversions import to_bytes
 from eth_utils.abi import function_abi_to_4byte_selector, event_abi_to_log_topic
 
 from dlt.common import json, Wei, logger
 from dlt.common.typing import DictStrAny
 
+from .records import LogRecord
+
 
 class TABIInfo(TypedDict):
     address: str
@@ -35,6 +44,21 @@ class TABIInfo(TypedDict):
     selectors: Dict[HexBytes, ABIElement]
 
 
+# raw bytes or a view on them ie. a topic in compact log record
+TBuffer = Union[bytes, memoryview]
+
+
+class LazyHex:
+    """Formats bytes as hex string only when the log message is rendered"""
+    __slots__ = ("value",)
+
+    def __init__(self, value: TBuffer) -> None:
+        self.value = value
+
+    def __str__(self) -> str:
+        return "0x" + memoryview(self.value).hex()
+
+
 class EthSigItem(TypedDict):
     name: str
     filtered: bool
@@ -55,30 +79,40 @@ def maybe_load_abis(abi_dir: str, only_for_decode: bool = True) -> Dict[Checksum
     contracts: Dict[ChecksumAddress, TABIInfo] = {}
     if abi_dir:
         for abi_file in os.scandir(abi_dir):
-            if not abi_file.is_file():
+            if not is_abi_file(abi_file):
                 continue
-            address = to_checksum_address(os.path.basename(abi_file).split(".")[0])
-            with open(abi_file, mode="r", encoding="utf-8") as f:
-                abi: DictStrAny = json.load(f)
-                info: TABIInfo = {
-                    "address": address,
-                    "name": abi['name'],
-                    "should_decode": abi.get("should_decode", True),
-                    "type": abi.get("type"),
-                    "decimals": abi.get("decimals"),
-                    "token_name": abi.get("token_name"),
-                    "token_symbol": abi.get("token_symbol"),
-                    "abi": abi.setdefault("abi", []),
-                    "abi_file": abi_file.name,
-                    "unknown_selectors": abi.setdefault("unknown_selectors", {}),
-                    "file_content": abi,
-                    "selectors": {abi_to_selector(a):a for a in abi["abi"] if a["type"] in ["function", "event"]}
-                }
-                if info["should_decode"] or not only_for_decode:
-                    contracts[address] = info
+            info = load_abi(abi_file.path)
+            if info["should_decode"] or not only_for_decode:
+                contracts[cast(ChecksumAddress, info["address"])] = info
     return contracts
 
 
+def is_abi_file(entry: "os.DirEntry[str]") -> bool:
+    # hidden files ie. the selector store are not ABIs
+    return entry.is_file() and not entry.name.startswith(".")
+
+
+def load_abi(abi_path: str) -> TABIInfo:
+    abi_file = os.path.basename(abi_path)
+    address = to_checksum_address(abi_file.split(".")[0])
+    with open(abi_path, mode="r", encoding="utf-8") as f:
+        abi: DictStrAny = json.load(f)
+    return {
+        "address": address,
+        "name": abi['name'],
+        "should_decode": abi.get("should_decode", True),
+        "type": abi.get("type"),
+        "decimals": abi.get("decimals"),
+        "token_name": abi.get("token_name"),
+        "token_symbol": abi.get("token_symbol"),
+        "abi": abi.setdefault("abi", []),
+        "abi_file": abi_file,
+        "unknown_selectors": abi.setdefault("unknown_selectors", {}),
+        "file_content": abi,
+        "selectors": {abi_to_selector(a):a for a in abi["abi"] if a["type"] in ["function", "event"]}
+    }
+
+
 def save_abis(abi_dir: str, abis: Iterable[TABIInfo]) -> None:
     for abi in abis:
         save_path = os.path.join(abi_dir, abi["abi_file"])
@@ -172,32 +206,74 @@ def signature_to_abi(sig_type: str, sig: str) -> ABIElement:
     return abi
 
 
-def decode_tx(codec: ABIDecoder, abi: ABIFunction, params: HexBytes, raise_on_outstanding_data: bool = False) -> DictStrAny:
+def sample_abi_value(type_str: str, array_len: int = 1) -> Any:
+    """Returns a value of ABI type `type_str` that can be encoded, ie. to get a sample of decoded data. Dynamic arrays get `array_len` elements"""
+    return _sample_abi_value(parse_abi_type(type_str), array_len)
+
+
+def _sample_abi_value(abi_type: ABIType, array_len: int) -> Any:
+    if abi_type.arrlist:
+        dim = abi_type.arrlist[-1]
+        return [_sample_abi_value(abi_type.item_type, array_len) for _ in range(dim[0] if dim else array_len)]
+    if isinstance(abi_type, TupleType):
+        return tuple(_sample_abi_value(c, array_len) for c in abi_type.components)
+    basic_type = cast(BasicType, abi_type)
+    if basic_type.base == "address":
+        return to_checksum_address("0x" + "01" * 20)
+    if basic_type.base == "bool":
+        return True
+    if basic_type.base in ["uint", "int"]:
+        return 1
+    if basic_type.base in ["ufixed", "fixed"]:
+        return Decimal(1)
+    if basic_type.base == "bytes":
+        # dynamic bytes are empty: those are inferred as text, which also fits non empty bytes, otherwise empty bytes would create a variant column
+        return b"\x01" * int(basic_type.sub) if basic_type.sub else b""
+    if basic_type.base == "string":
+        return "a"
+    raise ValueError(f"Cannot make a sample of ABI type {basic_type.to_type_str()}")
+
+
+def decode_tx(codec: ABIDecoder, abi: ABIFunction, params: TBuffer, raise_on_outstanding_data: bool = False, offset: int = 0) -> DictStrAny:
+    """Decodes transaction input params using provided ABI. Pass full transaction input and `offset=4` to skip the selector without copying the params"""
     names = get_abi_input_names(abi)
     types = get_abi_input_types(abi)
 
-    def _decode(data: HexBytes) -> Any:
-        # this copies decode_abi method but checks if full stream was consumed
-        decoders = [
-            codec._registry.get_decoder(type_str)
-            for type_str in types
-        ]
-
-        decoder = TupleDecoder(decoders=decoders)
-        stream = codec.stream_class(data)
-
-        decoded = decoder(stream)
-        outstanding_bytes = len(params) - stream.tell()
-        if outstanding_bytes != 0 and raise_on_outstanding_data:
-            raise DecodingError(f"Input stream contains {outstanding_bytes} outstanding bytes that were not decoded")
-        return decoded
-
-    decoded = _decode(params)
+    decoded, consumed = _decode_abi(codec, types, params, offset)
+    outstanding_bytes = len(params) - offset - consumed
+    if outstanding_bytes != 0 and raise_on_outstanding_data:
+        raise DecodingError(f"Input stream contains {outstanding_bytes} outstanding bytes that were not decoded")
     normalized = map_abi_data(BASE_RETURN_NORMALIZERS, types, decoded)
 
     return dict(zip(names, normalized))
 
 
+def _decode_abi(codec: ABIDecoder, types: Sequence[str], data: TBuffer, offset: int = 0) -> Tuple[Tuple[Any, ...], int]:
+    # this copies decode_abi method but returns the number of consumed bytes and starts at `offset`
+    decoders = [
+        codec._registry.get_decoder(type_str)
+        for type_str in types
+    ]
+    decoder = TupleDecoder(decoders=decoders)
+    # stream shares the buffer of exact `bytes` so tx input and log data are not copied, views (ie. 32 bytes topics) are copied
+    stream = codec.stream_class(data)
+    if offset:
+        # offsets of dynamic types are relative to the frame
+        stream.push_frame(offset)
+    decoded = decoder(stream)
+    return decoded, stream.tell() - offset
+
+
+def _get_log_buffers(log: LogReceipt, skip_topics: int = 1) -> Tuple[Sequence[TBuffer], bytes]:
+    # topics (by default without the selector) and data as raw bytes, compact records provide views on their buffers without conversion to hex and back
+    record: Any = log
+    if isinstance(record, LogRecord) and isinstance(record.topics, bytes):
+        view = memoryview(record.topics)
+        return [view[i:i + 32] for i in range(32 * skip_topics, len(view), 32)], record.data
+    data = log["data"]
+    return log["topics"][skip_topics:], to_bytes(hexstr=data) if isinstance(data, str) else data
+
+
 def decode_log(codec: ABIDecoder, abi: ABIEvent, log: LogReceipt) -> EventData:
     """Decodes raw log data using provided ABI. In case of missing indexes it will figure out the right combination by trying out all possibilities
 
@@ -232,14 +308,189 @@ def decode_log(codec: ABIDecoder, abi: ABIEvent, log: LogReceipt) -> EventData:
 
             try:
                 # codec detects the incorrect padding, for example it does not allow any other byte to be set for uint8, just the LSB
-                rv: EventData = get_event_data(codec, abi, log)
-                return rv
+                return _get_event_data(codec, abi, log)
             except DecodingError:
                 pass
         logger.error(f"Correct index information could not be recovered for {abi['name']}. No combination of indexes allows decoding against provided log data.")
         raise DecodingError("None of the indexed topic combinations decoded correctly")
 
-    return cast(EventData, get_event_data(codec, abi, log))
+    return _get_event_data(codec, abi, log)
+
+
+def _get_event_data(codec: ABIDecoder, abi: ABIEvent, log: LogReceipt) -> EventData:
+    # this copies web3 get_event_data but decodes raw buffers of the log
+    log_topics, log_data = _get_log_buffers(log, skip_topics=0)
+    if not abi["anonymous"]:
+        if not log_topics:
+            raise MismatchedABI("Expected non-anonymous event to have 1 or more topics")
+        if abi_to_selector(abi) != log_topics[0]:
+            raise MismatchedABI("The event signature did not match the provided ABI")
+        log_topics = log_topics[1:]
+
+    log_topics_abi = get_indexed_event_inputs(abi)
+    log_topic_types = get_event_abi_types_for_decoding(normalize_event_input_types(log_topics_abi))
+    log_topic_names = get_abi_input_names(ABIEvent({"inputs": log_topics_abi}))
+    if len(log_topics) != len(log_topic_types):
+        raise LogTopicError(f"Expected {len(log_topic_types)} log topics.  Got {len(log_topics)}")
+
+    log_data_abi = exclude_indexed_event_inputs(abi)
+    log_data_types = get_event_abi_types_for_decoding(normalize_event_input_types(log_data_abi))
+    log_data_names = get_abi_input_names(ABIEvent({"inputs": log_data_abi}))
+    duplicate_names = set(log_topic_names).intersection(log_data_names)
+    if duplicate_names:
+        raise InvalidEventABI(f"The following argument names are duplicated between event inputs: '{', '.join(duplicate_names)}'")
+
+    decoded_log_data, _ = _decode_abi(codec, log_data_types, log_data)
+    normalized_log_data = map_abi_data(BASE_RETURN_NORMALIZERS, log_data_types, decoded_log_data)
+    decoded_topic_data = [_decode_abi(codec, [topic_type], topic_data)[0][0] for topic_type, topic_data in zip(log_topic_types, log_topics)]
+    normalized_topic_data = map_abi_data(BASE_RETURN_NORMALIZERS, log_topic_types, decoded_topic_data)
+
+    event_data = {
+        "args": dict(itertools.chain(zip(log_topic_names, normalized_topic_data), zip(log_data_names, normalized_log_data))),
+        "event": abi["name"],
+        "logIndex": log["logIndex"],
+        "transactionIndex": log["transactionIndex"],
+        "transactionHash": log["transactionHash"],
+        "address": log["address"],
+        "blockHash": log["blockHash"],
+        "blockNumber": log["blockNumber"],
+    }
+    return cast(EventData, AttributeDict.recursive(event_data))
+
+
+def decode_logs_batch(abi: ABIEvent, logs: Sequence[LogReceipt]) -> List[Optional[EventData]]:
+    """Decodes logs of a single event at once. Works for events with static elementary arguments (addresses, integers, bools and fixed size bytes): topics and data
+    of all logs are stacked into a single array of 32 bytes words and each argument is decoded for all logs with numpy. Produces the same output as `decode_log`.
+
+    Args:
+        abi (ABIEvent): ABI of the event
+        logs (Sequence[LogReceipt]): raw logs of the event
+
+    Returns:
+        List[Optional[EventData]]: Decoded data for each log or None if log must be decoded with `decode_log`. That happens for events with dynamic arguments,
+        when index information in abi does not match the logs and for logs that do not decode.
+    """
+    decoded: List[Optional[EventData]] = [None] * len(logs)
+    if abi.get("anonymous"):
+        return decoded
+    log_topics_abi = get_indexed_event_inputs(abi)
+    log_topic_types = get_event_abi_types_for_decoding(normalize_event_input_types(log_topics_abi))
+    log_data_abi = exclude_indexed_event_inputs(abi)
+    log_data_types = get_event_abi_types_for_decoding(normalize_event_input_types(log_data_abi))
+    names = get_abi_input_names(ABIEvent({"inputs": log_topics_abi})) + get_abi_input_names(ABIEvent({"inputs": log_data_abi}))
+    # duplicated names raise in `decode_log`
+    if len(set(names)) != len(names):
+        return decoded
+    # incorrect index information is recovered log by log in `decode_log` which modifies abi
+    if any(len(log["topics"]) != len(log_topic_types) + 1 for log in logs):
+        return decoded
+    word_decoders = [_get_word_decoder(t) for t in itertools.chain(log_topic_types, log_data_types)]
+    if not all(word_decoders):
+        return decoded
+
+    # stack topics and data of all logs that have expected size
+    words_count, data_size = len(word_decoders), len(log_data_types) * 32
+    rows: List[TBuffer] = []
+    rows_idx: List[int] = []
+    for idx, log in enumerate(logs):
+        topics, data = _get_log_buffers(log)
+        if len(data) == data_size and all(len(topic) == 32 for topic in topics):
+            rows.extend(topics)
+            rows.append(data)
+            rows_idx.append(idx)
+    if not rows_idx:
+        return decoded
+    # single copy of all the buffers
+    words: NDArray[np.uint8] = np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(len(rows_idx), words_count, 32)
+
+    valid: NDArray[np.bool_] = np.ones(len(rows_idx), dtype=bool)
+    columns: List[List[Any]] = []
+    for word_idx, word_decoder in enumerate(word_decoders):
+        values, is_valid = word_decoder(np.ascontiguousarray(words[:, word_idx, :]))
+        columns.append(values)
+        valid &= is_valid
+
+    for row_idx, (idx, *values) in enumerate(zip(rows_idx, *columns)):
+        if not valid[row_idx]:
+            # `decode_log` will raise on incorrect padding
+            continue
+        log = logs[idx]
+        decoded[idx] = cast(EventData, AttributeDict({
+            "args": AttributeDict(dict(zip(names, values))),
+            "event": abi["name"],
+            "logIndex": log["logIndex"],
+            "transactionIndex": log["transactionIndex"],
+            "transactionHash": log["transactionHash"],
+            "address": log["address"],
+            "blockHash": log["blockHash"],
+            "blockNumber": log["blockNumber"],
+        }))
+    return decoded
+
+
+TWordDecoder = Callable[[NDArray[np.uint8]], Tuple[List[Any], NDArray[np.bool_]]]
+
+
+def _get_word_decoder(type_str: str) -> Optional[TWordDecoder]:
+    # returns function that decodes array of 32 bytes words of given static elementary type, None for other types
+    parsed_type = parse_abi_type(type_str)
+    if not isinstance(parsed_type, BasicType) or parsed_type.is_array:
+        return None
+    base, sub = parsed_type.base, parsed_type.sub
+    if base == "address":
+        return _decode_address_words
+    if base == "bool":
+        return _decode_bool_words
+    if base in ["uint", "int"] and isinstance(sub, int):
+        return lambda words: _decode_int_words(words, sub, base == "int")
+    if base == "bytes" and isinstance(sub, int):
+        return lambda words: _decode_bytes_words(words, sub)
+    return None
+
+
+@lru_cache(maxsize=16384)
+def _checksum_address(raw_address: bytes) -> ChecksumAddress:
+    return to_checksum_address(raw_address)
+
+
+def _decode_address_words(words: NDArray[np.uint8]) -> Tuple[List[Any], NDArray[np.bool_]]:
+    blob = words.tobytes()
+    values = [_checksum_address(blob[i + 12:i + 32]) for i in range(0, len(blob), 32)]
+    return values, ~words[:, :12].any(axis=1)
+
+
+def _decode_bool_words(words: NDArray[np.uint8]) -> Tuple[List[Any], NDArray[np.bool_]]:
+    return (words[:, 31] == 1).tolist(), ~words[:, :31].any(axis=1) & (words[:, 31] <= 1)
+
+
+def _decode_bytes_words(words: NDArray[np.uint8], size: int) -> Tuple[List[Any], NDArray[np.bool_]]:
+    blob = words.tobytes()
+    return [blob[i:i + size] for i in range(0, len(blob), 32)], ~words[:, size:].any(axis=1)
+
+
+def _decode_int_words(words: NDArray[np.uint8], bit_size: int, signed: bool) -> Tuple[List[Any], NDArray[np.bool_]]:
+    if bit_size <= 64:
+        # value fits in the last 8 bytes
+        low_words = np.ascontiguousarray(words[:, 24:])
+        if signed:
+            ints = low_words.view(">i8").ravel()
+            # padding are sign extension bytes
+            valid = np.all(words[:, :24] == np.where(ints < 0, 0xff, 0).astype(np.uint8)[:, None], axis=1)
+            if bit_size < 64:
+                valid &= (ints >= -(1 << (bit_size - 1))) & (ints < (1 << (bit_size - 1)))
+        else:
+            ints = low_words.view(">u8").ravel()
+            valid = ~words[:, :24].any(axis=1)
+            if bit_size < 64:
+                valid &= ints < (1 << bit_size)
+        return ints.tolist(), valid
+    blob = words.tobytes()
+    values = [int.from_bytes(blob[i:i + 32], "big", signed=signed) for i in range(0, len(blob), 32)]
+    if signed:
+        min_value, max_value = -(1 << (bit_size - 1)), (1 << (bit_size - 1)) - 1
+    else:
+        min_value, max_value = 0, (1 << bit_size) - 1
+    return values, np.array([min_value <= v <= max_value for v in values], dtype=bool)
 
 
 def fetch_sig(sig_type: str, selector: HexStr) -> Sequence[EthSigItem]:
@@ -273,15 +524,15 @@ def fetch_sig_and_decode_log(codec: ABIDecoder, log: LogReceipt) -> Tuple[str, E
     return None, None, None
 
 
-def fetch_sig_and_decode_tx(codec: ABIDecoder, tx_input: HexBytes) -> Tuple[str, str, DictStrAny, ABIFunction]:
-    selector, params = tx_input[:4], tx_input[4:]
+def fetch_sig_and_decode_tx(codec: ABIDecoder, tx_input: TBuffer) -> Tuple[str, str, DictStrAny, ABIFunction]:
+    selector = HexBytes(tx_input[:4])
 
     for sig in fetch_sig("function", HexStr(selector.hex())):
         sig_name: str = sig["name"]
         abi = cast(ABIFunction, signature_to_abi("function", sig_name))
         assert abi_to_selector(abi) == selector
         try:
-            return sig_name, abi["name"], decode_tx(codec, abi, params), abi
+            return sig_name, abi["name"], decode_tx(codec, abi, tx_input, offset=4), abi
         except DecodingError:
             continue
 
@@ -289,22 +540,71 @@ def fetch_sig_and_decode_tx(codec: ABIDecoder, tx_input: HexBytes) -> Tuple[str,
     return None, None, None, None
 
 
-def prettify_decoded(contract: TABIInfo, decoded: DictStrAny, abi: ABIElement, selector: HexBytes) -> DictStrAny:
+def prettify_decoded(contract: TABIInfo, decoded: DictStrAny, abi: ABIElement, selector: HexBytes, binary: bool = False) -> DictStrAny:
     # this gets rid of tuples from decoded and must always go first
     recode_tuples(decoded, abi)
-    uint_to_wei(contract, decoded, abi["inputs"], selector)
+    if binary:
+        values_to_bytes(decoded, abi["inputs"])
+    else:
+        uint_to_wei(contract, decoded, abi["inputs"], selector)
     flatten_batches(decoded, abi)
     return decoded
 
 
+# precision of 256 bit fixed point values
+_FIXED_CONTEXT = Context(prec=80)
+
+
+def uint_to_bytes(value: int) -> bytes:
+    """Encodes (u)int256 as 32 bytes big endian, two's complement for negative values. Byte order sorts like unsigned numbers"""
+    return value.to_bytes(32, "big", signed=value < 0)
+
+
+def fixed_to_bytes(value: Decimal, decimals: int) -> bytes:
+    """Encodes (u)fixed<M>x<N> value as its integer representation (value * 10**N) like `uint_to_bytes`"""
+    # exact for 256 bit values, the default context rounds to 28 digits
+    return uint_to_bytes(int(value.scaleb(decimals, _FIXED_CONTEXT)))
+
+
+def values_to_bytes(decoded: DictStrAny, inputs: Union[Sequence[ABIFunctionParams], Sequence[ABIEventParams]]) -> None:
+    # converts addresses into 20 bytes and integer and fixed point types > 2**64 into 32 bytes, used instead of `uint_to_wei` when storing binary values
+    # amounts are not scaled by token decimals
+    for input_ in inputs:
+        val = decoded[input_["name"]]
+        if isinstance(val, dict):
+            values_to_bytes(val, input_["components"])  # type: ignore
+            continue
+        parsed_type = parse_abi_type(input_["type"])
+        convert: Callable[[Any], Any] = None
+        if parsed_type.base == "address":
+            convert = lambda v: bytes.fromhex(v[2:])  # noqa: E731
+        elif parsed_type.base in ["uint", "int"]:
+            bit_size = int(parsed_type.sub)
+            if bit_size > 63 and parsed_type.base[0] == "u" or bit_size > 64 and parsed_type.base[0] != "u":
+                convert = uint_to_bytes
+        elif parsed_type.base in ["ufixed", "fixed"]:
+            bit_size, fixed_decimals = parsed_type.sub
+            if bit_size > 63 and parsed_type.base[0] == "u" or bit_size > 64 and parsed_type.base[0] != "u":
+                convert = lambda v: fixed_to_bytes(v, fixed_decimals)  # noqa: E731
+        if convert:
+            decoded[input_["name"]] = _map_list(convert, val) if parsed_type.is_array else convert(val)
+
+
+def _map_list(f: Callable[[Any], Any], value: Any) -> Any:
+    if isinstance(value, list):
+        return [_map_list(f, v) for v in value]
+    return f(value)
+
+
 def uint_to_wei(contract: TABIInfo, decoded: DictStrAny, inputs: Union[Sequence[ABIFunctionParams], Sequence[ABIEventParams]], selector: HexBytes) -> None:
     # converts all integer types > 2**64 into Wei type
     for input_idx, input_ in enumerate(inputs):
 
         def uint_list_to_wei(list_v: List[Any], decimals: int = 0) -> None:
             for jdx, l_v in enumerate(list_v):
-                if isinstance(l_v, int):
-                    list_v[jdx] = Wei.from_int256(l_v, decimals=decimals)
+                # fixed point types are decoded as Decimal
+                if isinstance(l_v, (int, Decimal)):
+                    list_v[jdx] = Wei.from_int256(l_v, decimals=decimals)  # type: ignore
                 if isinstance(l_v, List):
                     uint_list_to_wei(l_v, decimals)
 
@@ -322,7 +622,7 @@ def uint_to_wei(contract: TABIInfo, decoded: DictStrAny, inputs: Union[Sequence[
             if parsed_type.base in ["uint", "int"]:
                 bit_size = int(parsed_type.sub)
             elif parsed_type.base in ["ufixed", "fixed"]:
-                bit_size = int(parsed_type[0])
+                bit_size = int(parsed_type.sub[0])
             # bigint is signed so we must have 63 bit integer to fit (one bit is sign). in case of signed integers they fit in bigint 1:1
             if bit_size > 63 and parsed_type.base[0] == "u" or bit_size > 64 and parsed_type.base[0] != "u":
                 # not fitting in int -> convert to wei
@@ -355,6 +655,9 @@ def flatten_batches(decoded: DictStrAny, abi: ABIElement) -> None:
             else:
                 # not all elements are lists so this is not a batch
                 return
+    if prev_len is None:
+        # no arguments
+        return
 
     decoded["batch"] = [{n:decoded[n][i] for n in batch} for i in range(prev_len)]
     for n in batch:
@@ -403,5 +706,5 @@ def _infer_decimals(contract: TABIInfo, inputs: Union[Sequence[ABIFunctionParams
         if decimals is None:
             decimals = 18
             logger.warning(f"Detected ERC20 transfer/approve but contract {contract['name']} ABI has no decimal property specified, using 18 decimals")
-        logger.debug(f"Got decimals {decimals} for token {contract['name']} at {contract['address']}")
+        logger.debug("Got decimals %s for token %s at %s", decimals, contract["name"], contract["address"])
     return decimals
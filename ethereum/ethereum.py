@@ -1,27 +1,42 @@
-from functools import reduce
-from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type, TypedDict, Union, cast, Sequence
+import threading
+import time
+from functools import reduce, wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Type, TypedDict, TypeVar, Union, cast, Sequence
 from hexbytes import HexBytes
-import requests
 
-from dlt.common import Wei, logger
+from dlt.common import Wei, json, logger, sleep
+from dlt.common.json import custom_pua_decode, json_typed_dumps
 from dlt.common.typing import DictStrAny, StrAny
 from dlt.common.schema import Schema
-from dlt.common.sources import TDeferred, TItem, defer_iterator, with_retry, with_table_name
+from dlt.common.schema.exceptions import CannotCoerceColumnException
+from dlt.common.sources import TDeferred, TItem, defer_iterator, get_table_name, with_retry, with_table_name
+from dlt.common.utils import digest128
 
 from dlt.pipeline import Pipeline
 from dlt.pipeline.exceptions import MissingDependencyException
 
+from . import metrics, profiling
+
 try:
     # import gracefully and produce nice exception that explains the user what to do
-    from web3 import Web3, HTTPProvider
+    from web3 import Web3
     from web3.middleware import geth_poa_middleware
     from eth_typing.evm import ChecksumAddress
     from web3._utils.method_formatters import get_result_formatters
     from web3._utils.rpc_abi import RPC
-    from web3.types import LogReceipt, EventData, ABIEvent
-
-    from .eth_source_utils import maybe_load_abis, TABIInfo, ABIFunction, DecodingError
-    from .eth_source_utils import decode_log, decode_tx, fetch_sig_and_decode_log, fetch_sig_and_decode_tx, maybe_update_abi, prettify_decoded, save_abis
+    from web3.exceptions import BlockNotFound
+    from web3._utils.abi import get_abi_input_types, get_indexed_event_inputs, exclude_indexed_event_inputs, normalize_event_input_types
+    from web3._utils.events import get_event_abi_types_for_decoding
+    from web3.types import LogReceipt, EventData, ABIElement, ABIEvent
+
+    from .eth_source_utils import TABIInfo, ABIFunction, DecodingError
+    from .abi_registry import ABIRegistry, get_registry
+    from .records import LogRecord, TransactionRecord
+    from .block_filter import BlockFilter
+    from .block_cache import BlockCache
+    from .loaded_blocks import LoadedBlocks
+    from .transport import FastHTTPProvider
+    from .eth_source_utils import LazyHex, decode_log, decode_logs_batch, decode_tx, fetch_sig_and_decode_log, fetch_sig_and_decode_tx, prettify_decoded, sample_abi_value, uint_to_bytes
 except ImportError:
     raise MissingDependencyException("Ethereum Source", ["web3"], "Web3 is a all purpose python library to interact with Ethereum-compatible blockchains.")
 
@@ -32,19 +47,98 @@ HTTP_PROVIDER_HEADERS = {
     }
 REQUESTS_TIMEOUT = (20, 12)
 ADD_OVERLOAD_TABLE_NAME_SUFFIX = False
+# decode all logs of the same event in a block at once
+BATCH_DECODE_LOGS = True
+# blocks in the first run when number of blocks is adapted to the throughput
+ADAPTIVE_INITIAL_BLOCKS = 10
+KNOWN_CONTRACT_FIELDS = ["address", "name", "type", "decimals", "token_name", "token_symbol"]
+# uint256 values stored in binary columns, see `x-binary_columns` in the schema
+BLOCK_UINT256_FIELDS = ["baseFeePerGas", "difficulty", "totalDifficulty"]
+TX_UINT256_FIELDS = ["value", "maxFeePerGas", "maxPriorityFeePerGas"]
+
+TFun = TypeVar("TFun", bound=Callable[..., Any])
 
+_WEB3: Dict[Tuple[str, bool], Web3] = {}
+_WEB3_LOCK = threading.Lock()
 
-def get_schema() -> Schema:
-    """Returns a basic Ethereum schema defining `blocks` and `known_contracts` tables and their child tables. Basic schema does not include any tables for decoded data.
+
+def get_schema(abi_dir: str = None, binary: bool = False) -> Schema:
+    """Returns a basic Ethereum schema defining `blocks` and `known_contracts` tables and their child tables. Basic schema does not include any tables for decoded data
+    unless `abi_dir` is passed.
+
+    Args:
+        abi_dir (str, optional): If set, tables of all calls and events of the decoded contracts in `abi_dir` are added to the schema. See `add_decoded_tables`. Defaults to None.
+        binary (bool, optional): If True, hashes, addresses and uint256 values are stored as fixed size bytes. See `to_binary_schema`. Defaults to False.
 
     Returns:
         Schema: basic Ethereum schema object
     """
-    return Pipeline.load_schema_from_file("ethereum/ethereum_schema.yml")
+    schema = Pipeline.load_schema_from_file("ethereum/ethereum_schema.yml")
+    if binary:
+        schema = to_binary_schema(schema)
+    if abi_dir:
+        add_decoded_tables(schema, abi_dir, binary=binary)
+    return schema
+
+
+def to_binary_schema(schema: Schema) -> Schema:
+    """Returns a copy of `schema` where hash, address and uint256 columns listed in `x-binary_columns` schema setting are binary. Hashes and addresses are converted
+    from hex by the normalizer. uint256 values are expected as 32 bytes big endian, as returned by `get_blocks` with `binary` flag. `HexBytes` in new columns are not detected as text.
+    Must be used with a new dataset: types of existing columns in the destination are not changed.
+
+    Args:
+        schema (Schema): Ethereum schema with `x-binary_columns` setting
+
+    Returns:
+        Schema: schema with binary columns
+    """
+    stored_schema = schema.to_dict()
+    settings = stored_schema["settings"]
+    for table_name, column_names in settings.get("x-binary_columns", {}).items():  # type: ignore
+        columns = stored_schema["tables"][table_name]["columns"]
+        for column_name in column_names:
+            columns[column_name]["data_type"] = "binary"
+    settings.setdefault("preferred_types", {}).update(settings.get("x-binary_preferred_types", {}))  # type: ignore
+    normalizers = stored_schema["normalizers"]
+    normalizers["detections"] = [d for d in normalizers.get("detections") or [] if d != "hexbytes_to_text"]
+    return Schema.from_dict(stored_schema)  # type: ignore
+
+
+def add_decoded_tables(schema: Schema, abi_dir: str, binary: bool = False) -> List[str]:
+    """Adds tables of all known calls and events of the decoded contracts in `abi_dir` to `schema` so they are not inferred when first decoded. A sample of each call
+    and event with all arguments set is decoded and normalized like extracted data, so column types, Wei columns and batch child tables are the same as at runtime.
+
+    Args:
+        schema (Schema): Schema to which tables are added
+        abi_dir (str): Directory with ABIs of known contracts
+        binary (bool, optional): If True, samples are decoded like by `get_blocks` with `binary` flag. Defaults to False.
+
+    Returns:
+        List[str]: Names of the added tables
+    """
+    # web3 without provider is used only for the codec
+    w3 = Web3()
+    registry = get_registry(abi_dir)
+    registry.refresh()
+    existing = set(schema.tables)
+    for abi_info in list(registry.decoded.values()):
+        for selector, abi in list(abi_info["selectors"].items()):
+            if abi.get("stateMutability") in ["view", "pure"] or abi.get("constant"):
+                # not called with transactions
+                continue
+            for item in _sample_decoded_items(w3, abi_info, selector, abi, binary):
+                try:
+                    _normalize_into_schema(schema, item)
+                except (CannotCoerceColumnException, ValueError) as ex:
+                    # table present in the schema has other column type than inferred or arguments have no names
+                    logger.warning("Sample of %s could not be added to the schema: %s", get_table_name(item), ex)
+    return [t for t in schema.tables if t not in existing]
 
 
 def get_blocks(
-    node_url: str, last_block: int = None, max_blocks: int = None, max_initial_blocks: int = None, abi_dir: str = None, lag: int = 2, is_poa: bool = False, supports_batching: bool = True, state: DictStrAny = None
+    node_url: str, last_block: int = None, max_blocks: int = None, max_initial_blocks: int = None, abi_dir: str = None, lag: int = 2, is_poa: bool = False, supports_batching: bool = True, state: DictStrAny = None,
+    profile_dir: str = None, address_filter: Sequence[str] = None, selector_filter: Sequence[str] = None, target_run_seconds: float = None,
+    block_cache_dir: str = None, loaded_blocks: LoadedBlocks = None, binary: bool = False
     ) -> Iterator[DictStrAny]:
     """Returns an iterator with Ethereum block data, transactions with receipts and associated logs. If requested, transaction calls and log data are decoded and returned
     as well. 
@@ -63,80 +157,244 @@ def get_blocks(
         is_poa (bool, optional): Must be True for Proof of Authority networks. Defaults to False.
         supports_batching (bool, optional): Tells if JSON RPC node supports batch requests. Defaults to True.
         state (DictStrAny, optional): If pipeline state is passed, it will be used to hold last returned block. On subsequent runs, yielding will restart from that block. Defaults to None.
+        profile_dir (str, optional): If set, the extract loop is profiled and per-run profiles are written to this directory. `ETHEREUM_PROFILE_DIR` environment variable is used if not set. Defaults to None.
+        address_filter (Sequence[str], optional): If set, only transactions sent from or to those addresses or emitting logs of those addresses are returned. Block headers are always returned. Defaults to None.
+        selector_filter (Sequence[str], optional): If set, only transactions calling those 4 bytes function selectors or emitting logs with those 32 bytes event selectors are returned.
+            Combined with `address_filter`, transactions matching any of the filters are returned. Only logs matching the filters are kept. Defaults to None.
+        target_run_seconds (float, optional): If set, the number of blocks in a run is adapted so the run takes about that many seconds, using blocks/s measured in previous runs and kept in `state`.
+            Blocks not fetched in a run are fetched in the next ones. `max_blocks` becomes a hard cap: older blocks are skipped only if more than `max_blocks` blocks are behind. Requires `state`. Defaults to None.
+        block_cache_dir (str, optional): If set, raw blocks and receipts are kept in this directory and taken from it instead of the node when the same blocks are extracted again.
+            Cached blocks may be decoded again with `redecode`. Defaults to None.
+        loaded_blocks (LoadedBlocks, optional): If set, blocks recorded in it are skipped when extracted again with the same hash, only the header of such block is requested to compare
+            the hash. Blocks returned by the fully consumed iterator are staged and recorded by `loaded_blocks.commit()`, which the caller runs after `pipeline.extract` returns. Defaults to None.
+        binary (bool, optional): If True, uint256 values (ie. transaction value, decoded token amounts) are returned as 32 bytes big endian, not scaled by token decimals,
+            and decoded addresses as 20 bytes. Use with the schema returned by `get_schema(binary=True)`. Defaults to False.
 
     Yields:
         Iterator[DictStrAny]: Blocks and decoded transactions.
     """
-    return _get_blocks(False, node_url, last_block, max_blocks, max_initial_blocks, abi_dir, lag, is_poa, supports_batching, state)  # type: ignore
+    return _get_blocks(False, node_url, last_block, max_blocks, max_initial_blocks, abi_dir, lag, is_poa, supports_batching, state, profile_dir, address_filter, selector_filter, target_run_seconds, block_cache_dir, loaded_blocks, binary)  # type: ignore
 
 
 def get_blocks_deferred(
-    node_url: str, last_block: int = None, max_blocks: int = None, max_initial_blocks: int = None, abi_dir: str = None, lag: int = 2, is_poa: bool = False, supports_batching: bool = True, state: DictStrAny = None
+    node_url: str, last_block: int = None, max_blocks: int = None, max_initial_blocks: int = None, abi_dir: str = None, lag: int = 2, is_poa: bool = False, supports_batching: bool = True, state: DictStrAny = None,
+    profile_dir: str = None, address_filter: Sequence[str] = None, selector_filter: Sequence[str] = None, target_run_seconds: float = None,
+    block_cache_dir: str = None, loaded_blocks: LoadedBlocks = None, binary: bool = False
     ) -> Iterator[TDeferred[DictStrAny]]:
-    return _get_blocks(True, node_url, last_block, max_blocks, max_initial_blocks, abi_dir, lag, is_poa, supports_batching, state)  # type: ignore
+    return _get_blocks(True, node_url, last_block, max_blocks, max_initial_blocks, abi_dir, lag, is_poa, supports_batching, state, profile_dir, address_filter, selector_filter, target_run_seconds, block_cache_dir, loaded_blocks, binary)  # type: ignore
+
+
+def follow_head(
+    node_url: str, max_batch_blocks: int = 10, max_initial_blocks: int = None, abi_dir: str = None, lag: int = 2, is_poa: bool = False, supports_batching: bool = True, state: DictStrAny = None,
+    address_filter: Sequence[str] = None, selector_filter: Sequence[str] = None, min_poll_interval: float = 0.5, max_poll_interval: float = 15.0, should_stop: Callable[[], bool] = None,
+    block_cache_dir: str = None, binary: bool = False
+    ) -> Iterator[Iterator[DictStrAny]]:
+    """Follows the chain head and yields micro batches of new blocks as they arrive. Each micro batch is a `get_blocks` iterator with at most `max_batch_blocks` blocks
+    and must be fully consumed (ie. by `pipeline.extract`) before the next one is requested. Web3 connection and ABIs are kept between the micro batches.
 
+    When behind the head, micro batches are yielded without waiting. When the head is reached, the node is polled again when the next block is expected, using block
+    time measured from the observed head changes, but not more often than `min_poll_interval` and not less often than `max_poll_interval`. If no new block was found, the poll interval is doubled.
 
-def get_known_contracts(abi_dir: str) -> Iterator[DictStrAny]:
+    Args:
+        node_url (str): An url to Ethereum node with JSON RPC interface.
+        max_batch_blocks (int, optional): Max number of blocks in a micro batch. Defaults to 10.
+        max_initial_blocks (int, optional): Number of past blocks to get if `state` does not hold the current block. Defaults to `max_batch_blocks`.
+        state (DictStrAny, optional): Pipeline state that holds the next block to get, updated when each micro batch is consumed. Defaults to None.
+        min_poll_interval (float, optional): Min seconds between head polls. Defaults to 0.5.
+        max_poll_interval (float, optional): Max seconds between head polls. Defaults to 15.0.
+        should_stop (Callable[[], bool], optional): Called before each head poll, following stops if it returns True. Follows until the process is signalled if not set.
+        Other arguments are passed to `get_blocks`.
+
+    Yields:
+        Iterator[Iterator[DictStrAny]]: Micro batches with blocks and decoded transactions.
+    """
+    w3 = _get_web3(node_url, is_poa)
+    if state is None:
+        state = {}
+    if max_initial_blocks is None:
+        max_initial_blocks = max_batch_blocks
+    # average block time measured from the head changes
+    block_time: float = None
+    head: int = None
+    head_seen_at: float = None
+    poll_interval = min_poll_interval
+
+    while not (should_stop and should_stop()):
+        new_head = w3.eth.get_block_number()
+        now = time.monotonic()
+        if head is None or new_head > head:
+            if head is not None:
+                observed = (now - head_seen_at) / (new_head - head)
+                block_time = observed if block_time is None else 0.8 * block_time + 0.2 * observed
+            head, head_seen_at = new_head, now
+            poll_interval = min_poll_interval
+
+        current_block: int = state.get("ethereum_current_block")
+        last_block = head - lag
+        if current_block is None or current_block <= last_block:
+            if current_block is not None:
+                last_block = min(last_block, current_block + max_batch_blocks - 1)
+            yield get_blocks(
+                node_url, last_block=last_block, max_initial_blocks=max_initial_blocks, abi_dir=abi_dir, lag=lag, is_poa=is_poa, supports_batching=supports_batching, state=state,
+                address_filter=address_filter, selector_filter=selector_filter, block_cache_dir=block_cache_dir, binary=binary
+            )
+            continue
+
+        # wait for the next block
+        wait = poll_interval
+        if block_time is not None:
+            wait = max(wait, head_seen_at + block_time - now)
+        wait = min(max(wait, min_poll_interval), max_poll_interval)
+        logger.debug("Head %s reached, polling again in %.2f s", head, wait)
+        sleep(wait)
+        poll_interval = min(poll_interval * 2, max_poll_interval)
+
+
+def get_known_contracts(abi_dir: str, state: DictStrAny = None) -> Iterator[DictStrAny]:
     """Returns iterator with information on known contracts
 
     Args:
         abi_dir (str): Directory with ABIs of known contracts
+        state (DictStrAny, optional): If pipeline state is passed, fingerprints of the returned contracts are kept in it and contracts are returned only if any
+            contract was added, removed or modified since the last run. Defaults to None.
 
     Yields:
         Iterator[DictStrAny]: All known contracts in `abi_dir`
     """
-    contracts = maybe_load_abis(abi_dir, only_for_decode=False)
-    for contract in contracts.values():
-        # fields to yield
-        yield {k: contract.get(k) for k in ["address", "name", "type", "decimals", "token_name", "token_symbol"]}
+    registry = get_registry(abi_dir)
+    # only modified abi files are read again
+    registry.refresh()
+    # fields to yield
+    contracts = [{k: contract.get(k) for k in KNOWN_CONTRACT_FIELDS} for contract in list(registry.contracts.values())]
+    if state is not None:
+        fingerprints = {c["address"]: digest128(json.dumps(c, sort_keys=True)) for c in contracts}
+        if fingerprints == state.get("ethereum_known_contracts"):
+            logger.info("Known contracts did not change")
+            return
+    # known_contracts table is replaced so all contracts are yielded
+    yield from contracts
+    if state is not None:
+        state["ethereum_known_contracts"] = fingerprints
 
 
-def _get_blocks(is_deferred: bool, node_url: str, last_block: int, max_blocks: int, max_initial_blocks: int, abi_dir: str, lag: int, is_poa: bool, supports_batching: bool, state: DictStrAny) -> Union[Iterator[TItem], Iterator[TDeferred[DictStrAny]]]:
-    # this code is run only once
-    w3 = Web3(Web3.HTTPProvider(node_url, request_kwargs={"headers": HTTP_PROVIDER_HEADERS, "timeout": REQUESTS_TIMEOUT}))
-    if is_poa:
-        w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+def get_decoded_addresses(abi_dir: str) -> List[str]:
+    """Returns addresses of all contracts in `abi_dir` that are decoded, ie. to be used as `address_filter` in `get_blocks`"""
+    registry = get_registry(abi_dir)
+    registry.refresh()
+    return list(registry.decoded.keys())
+
 
-    # load abis from abi_dir
-    contracts = maybe_load_abis(abi_dir)
+def redecode(block_cache_dir: str, first_block: int, last_block: int, abi_dir: str, binary: bool = False) -> Iterator[DictStrAny]:
+    """Decodes again the blocks from `first_block` to `last_block` (inclusive) taken from the block cache, ie. after ABIs were added to `abi_dir`. The node is not called.
+    Only the decoded transactions and logs are returned, blocks that are not in the cache are skipped with a warning.
+
+    Args:
+        block_cache_dir (str): Block cache directory, as passed to `get_blocks`
+        first_block (int): Lowest block number to decode
+        last_block (int): Highest block number to decode
+        abi_dir (str): Directory with ABIs of known contracts
+        binary (bool, optional): Decode like `get_blocks` with `binary` flag. Defaults to False.
+
+    Yields:
+        Iterator[DictStrAny]: Decoded transactions and logs
+    """
+    # web3 without provider is used only for the formatters and the codec
+    w3 = Web3()
+    registry = get_registry(abi_dir)
+    block_cache = BlockCache(block_cache_dir)
+    for block_number in range(first_block, last_block + 1):
+        cached = block_cache.get(block_number)
+        if cached is None:
+            logger.warning("Block %s is not in the block cache and will not be decoded", block_number)
+            continue
+        block = _format_block(w3, cached["block"], cached["chain_id"])
+        raw_receipts: StrAny = cached["receipts"]
+        # blocks extracted with filter hold receipts only of the matching transactions
+        block["transactions"] = [tx for tx in block["transactions"] if _tx_hash_hex(tx) in raw_receipts]
+        _add_receipts(w3, block["transactions"], raw_receipts, None)
+        yield from _decode_block(w3, block, registry, binary)  # type: ignore
+
+
+def _get_blocks(
+    is_deferred: bool, node_url: str, last_block: int, max_blocks: int, max_initial_blocks: int, abi_dir: str, lag: int, is_poa: bool, supports_batching: bool, state: DictStrAny,
+    profile_dir: str, address_filter: Sequence[str], selector_filter: Sequence[str], target_run_seconds: float, block_cache_dir: str, loaded_blocks: LoadedBlocks, binary: bool
+    ) -> Union[Iterator[TItem], Iterator[TDeferred[DictStrAny]]]:
+    # this code is run only once
+    profile_dir = profiling.resolve_profile_dir(profile_dir)
+    if is_deferred and profile_dir:
+        # deferred blocks are evaluated after the iterator finishes and the profile is saved
+        raise ValueError("Profiling is not supported for deferred blocks, use get_blocks instead")
+    if is_deferred and loaded_blocks:
+        # hashes of deferred blocks are not known when the iterator finishes
+        raise ValueError("Skipping loaded blocks is not supported for deferred blocks, use get_blocks instead")
+    if target_run_seconds and state is None:
+        raise ValueError("Adaptive number of blocks requires state to keep the measured throughput")
+    w3 = _get_web3(node_url, is_poa)
+
+    # abis from abi_dir are loaded once per process and reloaded when modified
+    registry = get_registry(abi_dir)
+    # keep only transactions and logs of allowed contracts and selectors
+    block_filter = BlockFilter(address_filter, selector_filter) if address_filter or selector_filter else None
+    block_cache = BlockCache(block_cache_dir) if block_cache_dir else None
+    if loaded_blocks:
+        # blocks of an extract that did not commit are extracted again
+        loaded_blocks.discard()
+    extracted_blocks: List[Tuple[int, bytes]] = []
 
     # get chain id
     chain_id = w3.eth.chain_id
 
     # get block range
-    current_block, last_block = _get_block_range(w3, state, last_block, max_blocks, max_initial_blocks, lag)
+    run_blocks = _get_run_blocks(state, target_run_seconds, max_blocks) if target_run_seconds else None
+    current_block, last_block = _get_block_range(w3, state, last_block, max_blocks, max_initial_blocks, lag, run_blocks)
     if current_block > last_block:
         logger.info("No new blocks. exiting")
         return
-
-    # code within the loop is executed on each yield from iterator
-    while current_block <= last_block:
-        logger.info(f"requesting block {current_block}")
-
-        @defer_iterator
-        @with_retry(max_retries=20)
-        def _get_block_deferred(c_b: int) -> List[DictStrAny]:
-            # get block
-            block_ = [_get_block(w3, c_b, chain_id, supports_batching)]
-            # decode all transactions in the block
-            block_.extend(_decode_block(w3, block_[0], abi_dir, contracts))  # type: ignore
-            # return all together
-            return block_
-
-        @with_retry(max_retries=20)
-        def _get_block_retry(c_b: int) -> DictStrAny:
-            return _get_block(w3, c_b, chain_id, supports_batching)
-
-        # yield deferred items or actual item values
-        if is_deferred:
-            yield _get_block_deferred(current_block)
-        else:
-            block = _get_block_retry(current_block)
-            # yield block
-            yield block
-            # yield decoded transactions one by one
-            yield from _decode_block(w3, block, abi_dir, contracts)
-        current_block += 1
+    first_block = current_block
+    run_started = time.perf_counter()
+
+    # profiling is enabled only if profile dir is set
+    with profiling.profile_run(profile_dir, f"blocks_{current_block}_{last_block}_{int(time.time())}"):
+        # code within the loop is executed on each yield from iterator
+        while current_block <= last_block:
+            if loaded_blocks and _is_block_loaded(w3, loaded_blocks, current_block):
+                logger.info(f"skipping block {current_block} that was already extracted")
+                current_block += 1
+                continue
+            logger.info(f"requesting block {current_block}")
+
+            @defer_iterator
+            @with_retry(max_retries=20)
+            @_count_retries
+            def _get_block_deferred(c_b: int) -> List[DictStrAny]:
+                with profiling.run("get_blocks"):
+                    # get block
+                    block_ = [_get_block(w3, c_b, chain_id, supports_batching, block_filter, block_cache, binary)]
+                    # decode all transactions in the block
+                    block_.extend(_decode_block(w3, block_[0], registry, binary))  # type: ignore
+                # return all together
+                return block_
+
+            @with_retry(max_retries=20)
+            @_count_retries
+            def _get_block_retry(c_b: int) -> DictStrAny:
+                with profiling.run("get_blocks"):
+                    return _get_block(w3, c_b, chain_id, supports_batching, block_filter, block_cache, binary)
+
+            # yield deferred items or actual item values
+            if is_deferred:
+                yield _get_block_deferred(current_block)
+            else:
+                block = _get_block_retry(current_block)
+                # decode the whole block before yielding so profiling does not measure the code consuming the items
+                with profiling.run("get_blocks"):
+                    decoded = list(_decode_block(w3, block, registry, binary))
+                extracted_blocks.append((current_block, block["blockHash"]))
+                # yield block
+                yield block
+                # yield decoded transactions one by one
+                yield from decoded
+            current_block += 1
 
     # this code is run after all items were yielded
 
@@ -146,9 +404,68 @@ def _get_blocks(is_deferred: bool, node_url: str, last_block: int, max_blocks: i
     if state is not None:
         logger.info(f"Saving pipeline state for next block {current_block}")
         state["ethereum_current_block"] = current_block
+        if target_run_seconds:
+            _update_throughput(state, current_block - first_block, time.perf_counter() - run_started, run_blocks)
+    if loaded_blocks:
+        # recorded when the caller commits, after the extracted data was stored
+        loaded_blocks.stage(extracted_blocks)
+
+
+def _count_retries(f: TFun) -> TFun:
+    # counts failed attempts that will be retried by `with_retry`
+    @wraps(f)
+    def _wrap(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return f(*args, **kwargs)
+        except Exception:
+            metrics.RETRIES_COUNTER.inc()
+            raise
+
+    return cast(TFun, _wrap)
+
+
+def _get_web3(node_url: str, is_poa: bool) -> Web3:
+    # Web3 with its middlewares and http session is created once per process
+    with _WEB3_LOCK:
+        w3 = _WEB3.get((node_url, is_poa))
+        if w3 is None:
+            w3 = Web3(FastHTTPProvider(node_url, request_kwargs={"headers": HTTP_PROVIDER_HEADERS, "timeout": REQUESTS_TIMEOUT}))
+            if is_poa:
+                w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+            _WEB3[(node_url, is_poa)] = w3
+    return w3
+
+
+def _get_run_blocks(state: StrAny, target_run_seconds: float, max_blocks: Optional[int]) -> int:
+    # number of blocks that should take `target_run_seconds` at measured throughput
+    blocks_per_second: float = state.get("ethereum_blocks_per_second")
+    prev_run_blocks: int = state.get("ethereum_run_blocks")
+    if not blocks_per_second or not prev_run_blocks:
+        run_blocks = ADAPTIVE_INITIAL_BLOCKS
+    else:
+        # grow gradually as throughput measured on small runs is not accurate
+        run_blocks = max(1, min(int(blocks_per_second * target_run_seconds), prev_run_blocks * 2))
+    if max_blocks:
+        run_blocks = min(run_blocks, max_blocks)
+    logger.info("Getting at most %s blocks in this run at %s blocks/s", run_blocks, blocks_per_second)
+    return run_blocks
 
 
-def _get_block_range(w3: Web3, state: DictStrAny, last_block: Optional[int], max_blocks: Optional[int], max_initial_blocks: Optional[int], lag: int) -> Tuple[int, int]:
+def _update_throughput(state: DictStrAny, blocks: int, elapsed: float, run_blocks: int) -> None:
+    if blocks <= 0 or elapsed <= 0:
+        return
+    blocks_per_second = blocks / elapsed
+    prev_blocks_per_second: float = state.get("ethereum_blocks_per_second")
+    if prev_blocks_per_second:
+        # smooth out the runs with slow node responses or signature lookups
+        blocks_per_second = 0.5 * prev_blocks_per_second + 0.5 * blocks_per_second
+    state["ethereum_blocks_per_second"] = blocks_per_second
+    state["ethereum_run_blocks"] = run_blocks
+
+
+def _get_block_range(
+    w3: Web3, state: DictStrAny, last_block: Optional[int], max_blocks: Optional[int], max_initial_blocks: Optional[int], lag: int, run_blocks: Optional[int] = None
+    ) -> Tuple[int, int]:
     # last block is not provided then take the highest block from the chain
     if last_block is None:
         last_block = w3.eth.get_block_number() - lag
@@ -179,88 +496,158 @@ def _get_block_range(w3: Web3, state: DictStrAny, last_block: Optional[int], max
         current_block = last_block - max_initial_blocks + 1
         logger.info(f"Getting blocks from {current_block} to {last_block}")
 
+    if run_blocks and last_block - current_block + 1 > run_blocks:
+        # remaining blocks are taken in the next runs
+        last_block = current_block + run_blocks - 1
+        logger.info(f"Getting blocks from {current_block} to {last_block} in this run")
+
     assert current_block >= 0
     return current_block, last_block
 
 
-def _get_block(w3: Web3, current_block: int, chain_id: int, supports_batching: bool) -> DictStrAny:
+def _is_block_loaded(w3: Web3, loaded_blocks: LoadedBlocks, block_number: int) -> bool:
+    if not loaded_blocks.contains_number(block_number):
+        return False
+    # compare hash of the block header, the block may have been replaced in a reorg
+    with profiling.phase("rpc"):
+        header = w3.manager.request_blocking(RPC.eth_getBlockByNumber, [hex(block_number), False])
+    return header is not None and loaded_blocks.contains(block_number, HexBytes(header["hash"]))
+
+
+def _get_block(
+    w3: Web3, current_block: int, chain_id: int, supports_batching: bool, block_filter: BlockFilter = None, block_cache: BlockCache = None, binary: bool = False
+    ) -> DictStrAny:
     logger.info(f"Requesting block {current_block} and transaction receipts")
 
-    # get block with all transaction
-    block = dict(w3.eth.get_block(current_block, full_transactions=True))
+    cached = block_cache.get(current_block) if block_cache else None
+    if cached:
+        raw_block: Any = cached["block"]
+        raw_receipts: DictStrAny = cached["receipts"]
+    else:
+        # get block with all transaction, formatters are applied separately so raw block may be cached
+        with metrics.BLOCK_FETCH_HISTOGRAM.time(), profiling.phase("rpc"):
+            raw_block = w3.manager.request_blocking(RPC.eth_getBlockByNumber, [hex(current_block), True])
+        if raw_block is None:
+            raise BlockNotFound(f"Block {current_block} not found")
+        raw_receipts = {}
+    block = _format_block(w3, raw_block, chain_id)
+    if block_filter:
+        # drop transactions before receipts are requested
+        block["transactions"] = _filter_transactions(w3, block, block["transactions"], block_filter)
+    transactions: Sequence[TransactionRecord] = block["transactions"]
+
+    missing_txs = [tx for tx in transactions if _tx_hash_hex(tx) not in raw_receipts]
+    if missing_txs:
+        with metrics.RECEIPTS_FETCH_HISTOGRAM.time(), profiling.phase("rpc"):
+            raw_receipts.update(_get_receipts(w3, missing_txs, supports_batching))
+    if block_cache and (not cached or missing_txs):
+        block_cache.put(current_block, block["blockHash"], chain_id, raw_block, raw_receipts)
+
+    _add_receipts(w3, transactions, raw_receipts, block_filter)
+    if binary:
+        _uint256_to_bytes(block)
+    return block
+
+
+def _uint256_to_bytes(block: DictStrAny) -> None:
+    # hashes and addresses are converted by the normalizer, uint256 values are not scaled and cannot be coerced
+    for key in BLOCK_UINT256_FIELDS:
+        if isinstance(block.get(key), int):
+            block[key] = uint_to_bytes(block[key])
+    for tx in block["transactions"]:
+        for key in TX_UINT256_FIELDS:
+            # value is read in wei by key
+            value = getattr(tx, key, None)
+            if isinstance(value, int):
+                tx[key] = uint_to_bytes(value)
+
+
+def _format_block(w3: Web3, raw_block: Any, chain_id: int) -> DictStrAny:
+    block_formatters: Callable[..., Any] = get_result_formatters(RPC.eth_getBlockByNumber, w3.eth)  # type: ignore
+    with profiling.phase("formatters"):
+        block = dict(block_formatters(raw_block))
+    if isinstance(block.get("proofOfAuthorityData"), str):
+        # set by poa middleware which is not applied to blocks from the block cache
+        block["proofOfAuthorityData"] = HexBytes(block["proofOfAuthorityData"])
     # set explicit chain id
     block["chain_id"] = chain_id
     # rename some columns
     block["blockTimestamp"] = block.pop("timestamp")
     block["blockNumber"] = block.pop("number")
     block["blockHash"] = block.pop("hash")
-    # get rid of AttributeDict (web3 didn't adopt TypedDict)
-    attr_txs = cast(Sequence[Any], block["transactions"])
-    transactions: Sequence[DictStrAny] = [dict(tx) for tx in attr_txs]
-    # maybe_unknown_inputs: List[str] = []
-    for tx in transactions:
-        if "accessList" in tx and len(tx["accessList"]) > 0:
-            tx["accessList"] = [dict(al) for al in tx["accessList"]]
-        # propagate sorting and clustering info
-        tx["blockTimestamp"] = block["blockTimestamp"]
-        # rename columns
-        tx["transactionHash"] = tx.pop("hash")
-        # set value as wei
-        tx["value"] = Wei.from_int256(tx["value"], 18)
-        # overwrite chain_id which is not provided in all cases
-        tx["chainId"] = chain_id
+    with profiling.phase("formatters"):
+        # get rid of AttributeDict (web3 didn't adopt TypedDict), keep transactions in compact records
+        attr_txs = cast(Sequence[Any], block["transactions"])
+        transactions: Sequence[TransactionRecord] = [TransactionRecord(tx, block) for tx in attr_txs]
+        # maybe_unknown_inputs: List[str] = []
+        for tx in transactions:
+            if "accessList" in tx and len(tx["accessList"]) > 0:
+                tx["accessList"] = [dict(al) for al in tx["accessList"]]
+            # propagate sorting and clustering info
+            tx.blockTimestamp = cast(int, block["blockTimestamp"])
+            # overwrite chain_id which is not provided in all cases
+            tx.chainId = chain_id
 
-    block["transactions"] = transactions
     block["logsBloom"] = bytes(cast(HexBytes, block["logsBloom"]))  # serialize as bytes
+    block["transactions"] = transactions
+    return block
 
-    receipts = []
-    log_formatters: Callable[..., Any] = get_result_formatters(RPC.eth_getLogs, w3.eth)  # type: ignore
-    receipt_formatters: Callable[..., Any] = get_result_formatters(RPC.eth_getTransactionReceipt, w3.eth)  # type: ignore
-    provider = cast(HTTPProvider, w3.provider)
-    rpc_endpoint_url = provider.endpoint_uri
+
+def _tx_hash_hex(tx: TransactionRecord) -> str:
+    # raw receipts are kept by hex transaction hash
+    return "0x" + tx.transactionHash.hex()
+
+
+def _get_receipts(w3: Web3, transactions: Sequence[TransactionRecord], supports_batching: bool) -> DictStrAny:
+    provider = cast(FastHTTPProvider, w3.provider)
+    requests_ = [{
+            "jsonrpc": "2.0",
+            "method": "eth_getTransactionReceipt",
+            "params": [_tx_hash_hex(tx)],
+            "id": idx
+        } for idx, tx in enumerate(transactions)]
     if supports_batching:
         # get transaction receipts using batching. web3 does not support batching so we must
         # call node directly and then convert hex numbers to ints
-        batch = []
-        for idx, tx in enumerate(transactions):
-            batch.append({
-                "jsonrpc": "2.0",
-                "method": "eth_getTransactionReceipt",
-                "params": [tx["transactionHash"]],
-                "id": idx
-            })
-
-        r = requests.post(rpc_endpoint_url, json=batch, timeout=REQUESTS_TIMEOUT, headers=HTTP_PROVIDER_HEADERS)
-        r.raise_for_status()
-        receipts = r.json()
+        responses = provider.make_batch_request(requests_)
     else:
-        for idx, tx in enumerate(transactions):
-            r = requests.post(rpc_endpoint_url, json={
-                "jsonrpc": "2.0",
-                "method": "eth_getTransactionReceipt",
-                "params": [tx["transactionHash"]],
-                "id": idx
-            }, timeout=REQUESTS_TIMEOUT, headers=HTTP_PROVIDER_HEADERS)
-            r.raise_for_status()
-            receipts.append(r.json())
-    for tx_receipt, tx in zip(receipts, transactions):
-        tx_hash = tx["transactionHash"]
-        if tx_receipt.get("result") is None:
-            raise ValueError(f"Receipt for tx {tx_hash.hex()} is empty")
-        old_tx_r = tx_receipt
-        tx_receipt = receipt_formatters(tx_receipt["result"])
-        if tx_receipt is None:
-            print(old_tx_r)
-        assert tx_receipt["transactionHash"] == tx_hash
-        tx["transactionIndex"] = tx_receipt["transactionIndex"]
-        tx["status"] = tx_receipt["status"]
-        tx["logs"] = [dict(log) for log in log_formatters(tx_receipt["logs"])]
-        log: LogReceipt = None
-        for log in tx["logs"]:
-            log["topic"] = log["topics"][0]
-            # log["blockHash"] = block["hash"]
-
-    return block
+        responses = [provider.make_batch_request(request) for request in requests_]
+    raw_receipts: DictStrAny = {}
+    # batch responses may come in any order
+    for response in responses:
+        tx_hash = requests_[response["id"]]["params"][0]
+        if response.get("result") is None:
+            raise ValueError(f"Receipt for tx {tx_hash} is empty")
+        raw_receipts[tx_hash] = response["result"]
+    return raw_receipts
+
+
+def _add_receipts(w3: Web3, transactions: Sequence[TransactionRecord], raw_receipts: StrAny, block_filter: Optional[BlockFilter]) -> None:
+    log_formatters: Callable[..., Any] = get_result_formatters(RPC.eth_getLogs, w3.eth)  # type: ignore
+    receipt_formatters: Callable[..., Any] = get_result_formatters(RPC.eth_getTransactionReceipt, w3.eth)  # type: ignore
+    with profiling.phase("formatters"):
+        for tx in transactions:
+            tx_receipt = receipt_formatters(raw_receipts[_tx_hash_hex(tx)])
+            assert tx_receipt["transactionHash"] == tx.transactionHash
+            tx.transactionIndex = tx_receipt["transactionIndex"]
+            tx.status = tx_receipt["status"]
+            # first topic of each log is available as `topic`
+            tx.add_logs(log_formatters(tx_receipt["logs"]))
+            if block_filter:
+                tx.logs = [log for log in tx.logs if block_filter.matches_log(log)]
+
+
+def _filter_transactions(w3: Web3, block: StrAny, transactions: Sequence[TransactionRecord], block_filter: BlockFilter) -> List[TransactionRecord]:
+    # find transactions that emit logs of allowed contracts, bloom tells if there may be any in the block
+    tx_hashes: Set[bytes] = set()
+    if block_filter.bloom_may_match(block["logsBloom"]):
+        for logs_filter in block_filter.get_logs_filters(block["blockHash"]):
+            with profiling.phase("rpc"):
+                logs = w3.eth.get_logs(logs_filter)  # type: ignore
+            tx_hashes.update(bytes(log["transactionHash"]) for log in logs)
+    filtered = [tx for tx in transactions if tx.transactionHash in tx_hashes or block_filter.matches_tx(tx)]
+    logger.debug("Block %s: %s of %s transactions match the filter", block["blockNumber"], len(filtered), len(transactions))
+    return filtered
 
 
 def _decoded_table_name(contract_name: str, typ_: str, abi_name: str, selector: HexBytes) -> str:
@@ -273,85 +660,205 @@ def _decoded_table_name(contract_name: str, typ_: str, abi_name: str, selector:
     return f"{contract_name}_{typ_}_{abi_name}{overload_suffix}"
 
 
-def _decode_block(w3: Web3, block: StrAny, abi_dir: str, contracts: Dict[ChecksumAddress, TABIInfo]) -> Iterator[StrAny]:
-    logger.info(f"Decoding {block['blockNumber']}")
-    transactions: Sequence[Any] = block["transactions"]
+def _sample_decoded_items(w3: Web3, abi_info: TABIInfo, selector: HexBytes, abi: ABIElement, binary: bool) -> Iterator[DictStrAny]:
+    # decoded call or event with all arguments set, as yielded from `_decode_block`
+    inputs: Sequence[Any] = abi.get("inputs", [])
+    array_inputs = [input_["name"] for input_ in inputs if input_["type"].endswith("]")]
+    variants: List[Dict[str, int]] = [{}]
+    if len(array_inputs) > 1:
+        # lists of different length are not flattened into batch but normalized into separate child tables
+        variants.append({array_inputs[0]: 2})
+    for array_lens in variants:
+        if len(selector) == 4:
+            types = get_abi_input_types(cast(ABIFunction, abi))
+            values = [sample_abi_value(t, array_lens.get(input_["name"], 1)) for input_, t in zip(inputs, types)]
+            decoded = decode_tx(w3.codec, cast(ABIFunction, abi), w3.codec.encode(types, values))
+            if not decoded:
+                # calls without arguments are not yielded
+                return
+            typ_ = "call"
+        else:
+            event_abi = cast(ABIEvent, abi)
+            # indexed dynamic arguments are hashed into topics
+            topic_types = get_event_abi_types_for_decoding(normalize_event_input_types(get_indexed_event_inputs(event_abi)))
+            data_inputs = exclude_indexed_event_inputs(event_abi)
+            data_types = get_event_abi_types_for_decoding(normalize_event_input_types(data_inputs))
+            data_values = [sample_abi_value(t, array_lens.get(input_["name"], 1)) for input_, t in zip(data_inputs, data_types)]
+            log: Any = {
+                "topics": [selector] + [HexBytes(w3.codec.encode([t], [sample_abi_value(t)])) for t in topic_types],
+                "data": w3.codec.encode(data_types, data_values),
+                "logIndex": 0,
+                "transactionIndex": 0,
+                "transactionHash": HexBytes(b"\x01" * 32),
+                "address": abi_info["address"],
+                "blockHash": HexBytes(b"\x01" * 32),
+                "blockNumber": 1
+            }
+            decoded = dict(decode_log(w3.codec, event_abi, log)["args"])
+            decoded["logIndex"] = 0
+            typ_ = "logs"
+        item = with_table_name(decoded, _decoded_table_name(abi_info["name"], typ_, abi["name"], selector))
+        item.update({
+            "blockNumber": 1,
+            "blockTimestamp": int(time.time()),
+            "transactionHash": HexBytes(b"\x01" * 32),
+            "transactionIndex": 0,
+            "_tx_address": abi_info["address"],
+            "_tx_status": 1
+        })
+        yield prettify_decoded(abi_info, item, abi, selector, binary)
+
+
+def _normalize_into_schema(schema: Schema, item: DictStrAny) -> None:
+    # same steps as in the normalizer, items are stored as typed JSON by the extractor
+    event = json.loads(json_typed_dumps(item))
+    for (table_name, parent_table), row in schema.normalize_data_item(schema, event, "schema_gen"):
+        row = schema.filter_row(table_name, row)
+        if row:
+            row = {k: custom_pua_decode(v) for k, v in row.items()}
+            _, partial_table = schema.coerce_row(table_name, parent_table, row)
+            if partial_table:
+                schema.update_schema(partial_table)
+
+
+def _decode_block(w3: Web3, block: StrAny, registry: ABIRegistry, binary: bool = False) -> Iterator[StrAny]:
+    logger.info("Decoding %s", block["blockNumber"])
+    # pick up abi files modified and selectors resolved by other processes
+    registry.refresh()
+    contracts = registry.decoded
+    transactions: Sequence[TransactionRecord] = block["transactions"]
+    batch_decoded: Dict[int, EventData] = {}
+    # time of batch decoding spread over the logs decoded in batch
+    batch_item_time = 0.0
+    if BATCH_DECODE_LOGS:
+        batch_started = time.perf_counter()
+        with profiling.phase("decode_logs_batch"):
+            batch_decoded = _decode_block_logs_batch(transactions, contracts)
+        if batch_decoded:
+            batch_item_time = (time.perf_counter() - batch_started) / len(batch_decoded)
     for tx in transactions:
-        tx_info = {
-            "blockNumber": tx["blockNumber"],
-            "blockTimestamp": tx["blockTimestamp"],
-            "transactionHash": tx["transactionHash"],
-            "transactionIndex": tx["transactionIndex"],
-            "_tx_address": tx["to"],
-            "_tx_status": tx["status"]
-        }
+        # hex is produced only if message is logged
+        tx_hash = LazyHex(tx.transactionHash)
         # decode transaction
-        if tx["to"] in contracts:
-            abi_info = contracts[tx["to"]]
-            tx_input = HexBytes(tx["input"])
-            selector = tx_input[:4]
-            tx_abi = cast(ABIFunction, abi_info["selectors"].get(selector))
+        if tx.to in contracts:
+            abi_info = contracts[tx.to]
+            tx_input = tx.input
+            selector = HexBytes(tx_input[:4])
+            tx_abi = cast(ABIFunction, registry.get_abi(abi_info, selector))
             tx_args: DictStrAny = None
             fn_name: str = None
+            decode_started = time.perf_counter()
 
             # note that fallback functions are not decoded
             if tx_abi:
                 try:
-                    tx_args = decode_tx(w3.codec, tx_abi, tx_input[4:])
+                    with profiling.phase("decode_tx"):
+                        # decode params in place, skipping the selector
+                        tx_args = decode_tx(w3.codec, tx_abi, tx_input, offset=4)
                     fn_name = tx_abi["name"]
                 except DecodingError as dec_ex:
-                    if tx["status"] == 1:
+                    if tx.status == 1:
                         # correctly processed transaction must decode
-                        logger.error(f"Tx {tx['transactionHash'].hex()} on {abi_info['name']} could not be decoded")
+                        logger.error("Tx %s on %s could not be decoded", tx_hash, abi_info["name"])
                         raise
                     else:
                         # reverted transactions may not decode
-                        logger.warning(f"Reverted tx {tx['transactionHash'].hex()} on {abi_info['name']} did not decode: {str(dec_ex)}")
+                        logger.warning("Reverted tx %s on %s did not decode: %s", tx_hash, abi_info["name"], dec_ex)
             else:
+                metrics.UNKNOWN_SELECTORS_COUNTER.labels(abi_info["name"], "call").inc()
                 if abi_info["unknown_selectors"].get(selector.hex()) is None:
-                    if tx["status"] == 0:
-                        logger.warning(f"Reverted tx {tx['transactionHash'].hex()} on {abi_info['name']} has unknown signature and will not be decoded")
+                    if tx.status == 0:
+                        logger.warning("Reverted tx %s on %s has unknown signature and will not be decoded", tx_hash, abi_info["name"])
                     else:
                         # try to decode with an api
-                        _, fn_name, tx_args, tx_abi = fetch_sig_and_decode_tx(w3.codec, tx_input)
-                        maybe_update_abi(abi_info, selector, tx_abi, block["blockNumber"])
+                        with metrics.SIGNATURE_LOOKUP_HISTOGRAM.labels("call").time(), profiling.phase("signature_lookup"):
+                            _, fn_name, tx_args, tx_abi = fetch_sig_and_decode_tx(w3.codec, tx_input)
+                        registry.update_abi(abi_info, selector, tx_abi, block["blockNumber"])
+                        # signature lookup is measured separately
+                        decode_started = time.perf_counter()
 
             if tx_args:
                 table_name = _decoded_table_name(abi_info["name"], "call", fn_name, selector)
                 tx_args = with_table_name(tx_args, table_name)
                 # yield arguments with reference to transaction
-                tx_args.update(tx_info)
-                logger.debug(f"Decoded tx {tx['transactionHash'].hex()} to {tx['to']} into {table_name}")
-                yield prettify_decoded(abi_info, tx_args, tx_abi, selector)
+                tx_args.update(_get_tx_info(tx))
+                logger.debug("Decoded tx %s to %s into %s", tx_hash, tx.to, table_name)
+                with profiling.phase("prettify_decoded"):
+                    tx_args = prettify_decoded(abi_info, tx_args, tx_abi, selector, binary)
+                metrics.DECODE_HISTOGRAM.labels("call").observe(time.perf_counter() - decode_started)
+                metrics.DECODED_ITEMS_COUNTER.labels(table_name).inc()
+                yield tx_args
 
         # decode logs
-        log: LogReceipt
-        for log in tx["logs"]:
-            if log["address"] in contracts:
-                abi_info = contracts[log["address"]]
-                selector = log["topic"]
-                event_abi = cast(ABIEvent, abi_info["selectors"].get(selector))
+        for log in tx.logs:
+            if log.address in contracts:
+                abi_info = contracts[log.address]
+                selector = log.topic
+                event_abi = cast(ABIEvent, registry.get_abi(abi_info, selector))
                 event_data: EventData = None
+                decode_started = time.perf_counter()
                 if event_abi:
-                    event_data = decode_log(w3.codec, event_abi, log)
+                    event_data = batch_decoded.get(log.logIndex)
+                    if event_data is not None:
+                        # include the share of batch decoding in the decode time of the log
+                        decode_started -= batch_item_time
+                    else:
+                        with profiling.phase("decode_log"):
+                            event_data = decode_log(w3.codec, event_abi, cast(LogReceipt, log))
                 else:
+                    metrics.UNKNOWN_SELECTORS_COUNTER.labels(abi_info["name"], "logs").inc()
                     if abi_info["unknown_selectors"].get(selector.hex()) is None:
                         # try to decode with an api
-                        _, event_data, event_abi = fetch_sig_and_decode_log(w3.codec, log)
-                        maybe_update_abi(abi_info, selector, event_abi, block["blockNumber"])
+                        with metrics.SIGNATURE_LOOKUP_HISTOGRAM.labels("logs").time(), profiling.phase("signature_lookup"):
+                            _, event_data, event_abi = fetch_sig_and_decode_log(w3.codec, cast(LogReceipt, log))
+                        registry.update_abi(abi_info, selector, event_abi, block["blockNumber"])
+                        # signature lookup is measured separately
+                        decode_started = time.perf_counter()
 
                 if event_data:
                     table_name = _decoded_table_name(abi_info["name"], "logs", event_data["event"], selector)
                     ev_args = with_table_name(dict(event_data["args"]), table_name)
                     # yield arguments with reference to transaction and log
-                    ev_args.update(tx_info)
+                    ev_args.update(_get_tx_info(tx))
                     ev_args.update({
                         "logIndex": event_data["logIndex"]
                     })
-                    logger.debug(f"Decoded log {event_data['logIndex']} in tx {tx['transactionHash'].hex()} to {tx['to']} into {table_name}")
-                    yield prettify_decoded(abi_info, ev_args, event_abi, selector)
+                    logger.debug("Decoded log %s in tx %s to %s into %s", event_data["logIndex"], tx_hash, tx.to, table_name)
+                    with profiling.phase("prettify_decoded"):
+                        ev_args = prettify_decoded(abi_info, ev_args, event_abi, selector, binary)
+                    metrics.DECODE_HISTOGRAM.labels("logs").observe(time.perf_counter() - decode_started)
+                    metrics.DECODED_ITEMS_COUNTER.labels(table_name).inc()
+                    yield ev_args
+
+    logger.info("Block %s decoded, saving abi changes", block["blockNumber"])
+    # save abi changes after every decoded block to allow multi-threading or awaitable support
+    with metrics.SAVE_ABIS_HISTOGRAM.time(), profiling.phase("save_abis"):
+        registry.save()
+
+
+def _get_tx_info(tx: TransactionRecord) -> DictStrAny:
+    # transaction info is added to decoded items only
+    return {
+        "blockNumber": tx.blockNumber,
+        "blockTimestamp": tx.blockTimestamp,
+        "transactionHash": tx["transactionHash"],
+        "transactionIndex": tx.transactionIndex,
+        "_tx_address": tx.to,
+        "_tx_status": tx.status
+    }
 
-    logger.info(f"Block {block['blockNumber']} decoded, saving abi changes")
-    if abi_dir:
-        # save abi dir after every decoded block to allow multi-threading or awaitable support
-        save_abis(abi_dir, contracts.values())
+
+def _decode_block_logs_batch(transactions: Sequence[TransactionRecord], contracts: Dict[ChecksumAddress, TABIInfo]) -> Dict[int, EventData]:
+    # group logs of known events by contract and selector and decode each group at once
+    groups: Dict[Tuple[ChecksumAddress, HexBytes], List[LogRecord]] = {}
+    for tx in transactions:
+        for log in tx.logs:
+            if log.address in contracts and log.topic in contracts[log.address]["selectors"]:
+                groups.setdefault((log.address, log.topic), []).append(log)
+    batch_decoded: Dict[int, EventData] = {}
+    for (address, selector), logs in groups.items():
+        event_abi = cast(ABIEvent, contracts[address]["selectors"][selector])
+        for log, event_data in zip(logs, decode_logs_batch(event_abi, cast(List[LogReceipt], logs))):
+            if event_data is not None:
+                batch_decoded[log.logIndex] = event_data
+    return batch_decoded
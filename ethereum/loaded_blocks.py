@@ -0,0 +1,113 @@
+"""Local record of blocks already extracted by the pipeline, used to skip them when the same block range is extracted again
+
+Block numbers are kept as an exact set of intervals, so a block that was never extracted is never skipped. A bloom filter keyed on block number and block hash tells
+if the block with the same number was extracted with the same hash. The block header is requested to verify the hash, so blocks replaced by a reorg are extracted again.
+A false positive of the bloom filter skips such a block, the filter is sized for `capacity` blocks with `error_rate` false positives.
+
+Blocks returned by an extract iterator are staged in memory and recorded only when the caller commits them after `pipeline.extract` succeeded, so blocks
+of a failed extract are extracted again.
+
+Intervals are written atomically into `loaded_blocks_dir` when blocks are marked. The bloom filter is a memory mapped file updated in place: bits are only ever set
+so a partial write may only cause a block to be extracted again.
+"""
+
+import hashlib
+import math
+import mmap
+import os
+import sys
+import threading
+from bisect import bisect_right
+from typing import Iterable, List, Tuple
+
+from dlt.common import json
+from dlt.common.utils import uniq_id
+
+
+INTERVALS_FILE_NAME = "intervals.json"
+BLOOM_FILE_NAME = "bloom.bin"
+DEFAULT_CAPACITY = 4_000_000
+DEFAULT_ERROR_RATE = 0.001
+
+
+class LoadedBlocks:
+    def __init__(self, loaded_blocks_dir: str, capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE) -> None:
+        self.loaded_blocks_dir = loaded_blocks_dir
+        os.makedirs(loaded_blocks_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._staged: List[Tuple[int, bytes]] = []
+        # sorted, disjoint and not adjacent (first, last) block numbers
+        self.intervals: List[Tuple[int, int]] = []
+        intervals_path = os.path.join(loaded_blocks_dir, INTERVALS_FILE_NAME)
+        if os.path.isfile(intervals_path):
+            with open(intervals_path, "r", encoding="utf-8") as f:
+                self.intervals = [(first, last) for first, last in json.load(f)]
+        bloom_path = os.path.join(loaded_blocks_dir, BLOOM_FILE_NAME)
+        if not os.path.isfile(bloom_path):
+            bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+            hashes = max(1, round(bits / capacity * math.log(2)))
+            # first byte holds the number of hash functions
+            _write_atomic(bloom_path, bytes([hashes]) + bytes((bits + 7) // 8))
+        with open(bloom_path, "r+b") as f:
+            self._bloom = mmap.mmap(f.fileno(), 0)
+        self._hashes = self._bloom[0]
+        self._bits = (len(self._bloom) - 1) * 8
+
+    def contains_number(self, block_number: int) -> bool:
+        """Tells if block with `block_number` was extracted, with any hash"""
+        i = bisect_right(self.intervals, (block_number, sys.maxsize)) - 1
+        return i >= 0 and self.intervals[i][0] <= block_number <= self.intervals[i][1]
+
+    def contains(self, block_number: int, block_hash: bytes) -> bool:
+        """Tells if block with `block_number` and `block_hash` was extracted"""
+        return self.contains_number(block_number) and all(self._bloom[1 + (b >> 3)] & (1 << (b & 7)) for b in self._bit_indexes(block_number, block_hash))
+
+    def mark(self, blocks: Iterable[Tuple[int, bytes]]) -> None:
+        """Records extracted `blocks` given as (block number, block hash) and writes the record to disk"""
+        with self._lock:
+            for block_number, block_hash in blocks:
+                for b in self._bit_indexes(block_number, block_hash):
+                    self._bloom[1 + (b >> 3)] |= 1 << (b & 7)
+                self._add_number(block_number)
+            self._bloom.flush()
+            _write_atomic(os.path.join(self.loaded_blocks_dir, INTERVALS_FILE_NAME), json.dumps(self.intervals).encode("utf-8"))
+
+    def stage(self, blocks: Iterable[Tuple[int, bytes]]) -> None:
+        """Keeps extracted `blocks` in memory until `commit`, replaces blocks staged before"""
+        self._staged = list(blocks)
+
+    def commit(self) -> None:
+        """Records the staged blocks, call when the data extracted with them was stored"""
+        staged, self._staged = self._staged, []
+        if staged:
+            self.mark(staged)
+
+    def discard(self) -> None:
+        """Drops the staged blocks"""
+        self._staged = []
+
+    def _add_number(self, block_number: int) -> None:
+        i = bisect_right(self.intervals, (block_number, sys.maxsize))
+        first, last = block_number, block_number
+        # merge with the preceding and following intervals if they overlap or are adjacent
+        if i > 0 and self.intervals[i - 1][1] >= block_number - 1:
+            i -= 1
+            first, last = self.intervals[i][0], max(self.intervals[i][1], block_number)
+            del self.intervals[i]
+        if i < len(self.intervals) and self.intervals[i][0] <= last + 1:
+            last = max(last, self.intervals[i][1])
+            del self.intervals[i]
+        self.intervals.insert(i, (first, last))
+
+    def _bit_indexes(self, block_number: int, block_hash: bytes) -> Iterable[int]:
+        # double hashing, both hashes taken from one digest
+        digest = hashlib.blake2b(block_number.to_bytes(8, "big") + bytes(block_hash), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return ((h1 + i * h2) % self._bits for i in range(self._hashes))
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    temp_path = f"{path}.{uniq_id()}"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
@@ -0,0 +1,36 @@
+"""Prometheus metrics of the Ethereum source
+
+Metrics are registered in the default registry and exposed by the pipeline runner on `PROMETHEUS_PORT` together with the dlt metrics.
+"""
+
+from prometheus_client import Counter, Histogram, CollectorRegistry, REGISTRY
+
+
+# decoding a single item takes from tens of microseconds to milliseconds
+DECODE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, float("inf"))
+
+BLOCK_FETCH_HISTOGRAM: Histogram = None
+RECEIPTS_FETCH_HISTOGRAM: Histogram = None
+DECODE_HISTOGRAM: Histogram = None
+SIGNATURE_LOOKUP_HISTOGRAM: Histogram = None
+SAVE_ABIS_HISTOGRAM: Histogram = None
+RETRIES_COUNTER: Counter = None
+UNKNOWN_SELECTORS_COUNTER: Counter = None
+DECODED_ITEMS_COUNTER: Counter = None
+
+
+def create_gauges(registry: CollectorRegistry) -> None:
+    global BLOCK_FETCH_HISTOGRAM, RECEIPTS_FETCH_HISTOGRAM, DECODE_HISTOGRAM, SIGNATURE_LOOKUP_HISTOGRAM, SAVE_ABIS_HISTOGRAM
+    global RETRIES_COUNTER, UNKNOWN_SELECTORS_COUNTER, DECODED_ITEMS_COUNTER
+
+    BLOCK_FETCH_HISTOGRAM = Histogram("ethereum_block_fetch_seconds", "Time to get a block with full transactions from the node", registry=registry)
+    RECEIPTS_FETCH_HISTOGRAM = Histogram("ethereum_receipts_fetch_seconds", "Time to get all transaction receipts of a block from the node", registry=registry)
+    DECODE_HISTOGRAM = Histogram("ethereum_decode_item_seconds", "Time to decode and prettify a single transaction call or log", ["type"], buckets=DECODE_BUCKETS, registry=registry)
+    SIGNATURE_LOOKUP_HISTOGRAM = Histogram("ethereum_signature_lookup_seconds", "Time to resolve an unknown selector with the signature database and decode it", ["type"], registry=registry)
+    SAVE_ABIS_HISTOGRAM = Histogram("ethereum_save_abis_seconds", "Time to write ABI files with new selectors after a block is decoded", registry=registry)
+    RETRIES_COUNTER = Counter("ethereum_block_retries", "Failed attempts to get and decode a block, each one is retried until max retries is reached", registry=registry)
+    UNKNOWN_SELECTORS_COUNTER = Counter("ethereum_unknown_selectors", "Calls and logs of decoded contracts with selectors not present in ABI", ["contract", "type"], registry=registry)
+    DECODED_ITEMS_COUNTER = Counter("ethereum_decoded_items", "Decoded calls and logs per table", ["table"], registry=registry)
+
+
+create_gauges(REGISTRY)
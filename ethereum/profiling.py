@@ -0,0 +1,126 @@
+"""Opt-in profiling of the extract loop
+
+When profiling is enabled, the time spent in each phase of the extraction (RPC calls, formatters, decoding, prettifying and saving ABIs) is recorded as
+folded stacks, ready to be rendered with `flamegraph.pl` or speedscope. A cProfile of the same work is recorded as well and may be opened with snakeviz or
+converted with flameprof. Only the work enclosed in `run` is measured, so the code that consumes the extracted items is not included. Phase stacks and cProfiles
+are kept per thread. When profiling is disabled `phase` and `run` return a shared no-op context manager.
+"""
+
+import os
+import cProfile
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+
+from dlt.common import logger
+
+
+# environment variable with the profile output dir, enables profiling when set
+PROFILE_DIR_ENV = "ETHEREUM_PROFILE_DIR"
+
+_NO_PHASE = nullcontext()
+_ACTIVE_PROFILER: Optional["PhaseProfiler"] = None
+
+
+class PhaseProfiler:
+    def __init__(self) -> None:
+        # self time in microseconds per stack of phases
+        self.folded: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._cprofiles: List[cProfile.Profile] = []
+
+    @contextmanager
+    def run(self, root_phase: str) -> Iterator[None]:
+        """Profiles the work enclosed in the context in the current thread as `root_phase`"""
+        cprofile: cProfile.Profile = getattr(self._local, "cprofile", None)
+        if cprofile is None:
+            cprofile = self._local.cprofile = cProfile.Profile()
+            with self._lock:
+                self._cprofiles.append(cprofile)
+        self._enter(root_phase)
+        cprofile.enable()
+        try:
+            yield
+        finally:
+            cprofile.disable()
+            self._exit()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def save(self, profile_dir: str, file_name: str) -> str:
+        os.makedirs(profile_dir, exist_ok=True)
+        base_path = os.path.join(profile_dir, file_name)
+        with self._lock:
+            with open(base_path + ".folded", "w", encoding="utf-8") as f:
+                for stack, us in sorted(self.folded.items()):
+                    f.write(f"{stack} {us}\n")
+            if self._cprofiles:
+                # merge profiles of all threads
+                pstats.Stats(*self._cprofiles).dump_stats(base_path + ".prof")
+        return base_path
+
+    def _get_stack(self) -> List[List[Any]]:
+        stack: List[List[Any]] = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self, name: str) -> None:
+        stack = self._get_stack()
+        path = f"{stack[-1][0]};{name}" if stack else name
+        # path, start time, time spent in child phases
+        stack.append([path, time.perf_counter(), 0.0])
+
+    def _exit(self) -> None:
+        stack = self._get_stack()
+        path, started, child_elapsed = stack.pop()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.folded[path] = self.folded.get(path, 0) + int((elapsed - child_elapsed) * 1e6)
+        if stack:
+            stack[-1][2] += elapsed
+
+
+def phase(name: str) -> ContextManager[None]:
+    """Measures the enclosed code as `name` phase if profiling is active"""
+    if _ACTIVE_PROFILER is None:
+        return _NO_PHASE
+    return _ACTIVE_PROFILER.phase(name)
+
+
+def run(root_phase: str) -> ContextManager[None]:
+    """Profiles the enclosed work as `root_phase` if profiling is active"""
+    if _ACTIVE_PROFILER is None:
+        return _NO_PHASE
+    return _ACTIVE_PROFILER.run(root_phase)
+
+
+def resolve_profile_dir(profile_dir: Optional[str]) -> Optional[str]:
+    return profile_dir or os.environ.get(PROFILE_DIR_ENV) or None
+
+
+@contextmanager
+def profile_run(profile_dir: Optional[str], file_name: str) -> Iterator[None]:
+    """Activates profiling and writes the profiles of all work enclosed in `run` to `profile_dir` on exit. Does nothing if `profile_dir` is None"""
+    global _ACTIVE_PROFILER
+
+    if profile_dir is None:
+        yield
+        return
+    profiler = PhaseProfiler()
+    _ACTIVE_PROFILER = profiler
+    try:
+        yield
+    finally:
+        _ACTIVE_PROFILER = None
+        base_path = profiler.save(profile_dir, file_name)
+        logger.info(f"Extract loop profile saved to {base_path}.folded and {base_path}.prof")
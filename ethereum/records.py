@@ -0,0 +1,217 @@
+"""Compact records of transactions and logs
+
+Blocks keep hundreds of transactions and logs in memory until the whole extract iterator is consumed. Records keep values in slots in their compact form: hex strings
+and hashes as bytes, transaction value as int, log topics in a single buffer. Block and transaction level values are shared and addresses are interned.
+
+Attributes return the compact values and are used by the decoders. Records are read like dicts with the same values that web3 returns and are converted into dicts only
+when serialized by the pipeline: `simplejson` encodes any object with `_asdict` method as JSON object.
+"""
+
+import sys
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, MutableMapping, Optional, Tuple, Union
+from hexbytes import HexBytes
+from eth_typing import ChecksumAddress
+
+from dlt.common import Wei
+from dlt.common.typing import DictStrAny, StrAny
+
+
+def _intern(v: Any) -> Any:
+    return sys.intern(v) if isinstance(v, str) else v
+
+
+def _hex_to_bytes(v: Any) -> Any:
+    if isinstance(v, str):
+        return bytes.fromhex(v[2:] if v.startswith("0x") else v)
+    return v
+
+
+def _bytes_to_hex(v: Any) -> Any:
+    return "0x" + v.hex() if isinstance(v, bytes) else v
+
+
+def _to_bytes(v: Any) -> Any:
+    # plain bytes take less memory than HexBytes
+    return bytes(v) if isinstance(v, HexBytes) else v
+
+
+def _to_hexbytes(v: Any) -> Any:
+    return HexBytes(v) if type(v) is bytes else v
+
+
+def _to_wei(v: Any) -> Any:
+    return Wei.from_int256(v, 18) if isinstance(v, int) else v
+
+
+class _Record(MutableMapping[str, Any]):
+    __slots__ = ("_extra",)
+
+    _extra: Optional[DictStrAny]
+
+    # keys stored in slots, in serialization order
+    _KEYS: Tuple[str, ...] = ()
+    _KEYS_SET: FrozenSet[str] = frozenset()
+    # converters of values into compact form when stored and back when read by key
+    _STORE: Dict[str, Callable[[Any], Any]] = {}
+    _LOAD: Dict[str, Callable[[Any], Any]] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._KEYS_SET:
+            try:
+                value = getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+            load = self._LOAD.get(key)
+            return value if load is None else load(value)
+        extra = self._get_extra()
+        if extra is not None and key in extra:
+            return extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in self._KEYS_SET:
+            store = self._STORE.get(key)
+            setattr(self, key, value if store is None else store(value))
+        else:
+            extra = self._get_extra()
+            if extra is None:
+                extra = {}
+                self._extra = extra
+            extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in self._KEYS_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        else:
+            extra = self._get_extra()
+            if extra is None:
+                raise KeyError(key)
+            del extra[key]
+            if not extra:
+                self._extra = None
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self._KEYS:
+            if hasattr(self, key):
+                yield key
+        extra = self._get_extra()
+        if extra:
+            yield from extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._asdict()!r})"
+
+    def _asdict(self) -> DictStrAny:
+        return {key: self[key] for key in self}
+
+    def _get_extra(self) -> Optional[DictStrAny]:
+        extra: Optional[DictStrAny] = getattr(self, "_extra", None)
+        return extra
+
+    def _share(self, key: str, source: Any) -> None:
+        # reference the value from the block or transaction instead of keeping an equal copy
+        value = getattr(source, key, None) if isinstance(source, _Record) else source.get(key)
+        if value is not None and getattr(self, key, None) == value:
+            setattr(self, key, value)
+
+
+class LogRecord(_Record):
+    __slots__ = ("address", "topics", "data", "blockNumber", "transactionHash", "transactionIndex", "blockHash", "logIndex", "removed")
+
+    address: ChecksumAddress
+    topics: Union[bytes, List[HexBytes]]
+    data: bytes
+    blockNumber: int
+    transactionHash: bytes
+    transactionIndex: int
+    blockHash: HexBytes
+    logIndex: int
+    removed: bool
+
+    _KEYS = __slots__
+    _KEYS_SET = frozenset(_KEYS)
+    _STORE = {"address": _intern, "data": _hex_to_bytes, "transactionHash": _to_bytes}
+    _LOAD = {"data": _bytes_to_hex, "transactionHash": _to_hexbytes}
+
+    def __init__(self, log: StrAny, tx: "TransactionRecord" = None) -> None:
+        for k, v in log.items():
+            self[k] = v
+        if tx is not None:
+            for key in ["blockNumber", "transactionHash", "transactionIndex", "blockHash"]:
+                self._share(key, tx)
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "topics":
+            return self.get_topics()
+        if key == "topic":
+            return self.topic
+        return super().__getitem__(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == "topic":
+            # first topic is always derived from topics
+            return
+        if key == "topics" and all(len(topic) == 32 for topic in value):
+            # keep all topics in single buffer
+            value = b"".join(HexBytes(topic) for topic in value)
+        super().__setitem__(key, value)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from super().__iter__()
+        if hasattr(self, "topics"):
+            yield "topic"
+
+    @property
+    def topic(self) -> HexBytes:
+        topics = self.topics
+        if isinstance(topics, bytes):
+            return HexBytes(topics[:32])
+        return topics[0]
+
+    def get_topics(self) -> List[HexBytes]:
+        topics = self.topics
+        if isinstance(topics, bytes):
+            return [HexBytes(topics[i:i + 32]) for i in range(0, len(topics), 32)]
+        return topics
+
+
+class TransactionRecord(_Record):
+    __slots__ = (
+        "blockHash", "blockNumber", "from", "gas", "gasPrice", "maxFeePerGas", "maxPriorityFeePerGas", "input", "nonce", "to", "transactionIndex", "value", "type",
+        "accessList", "chainId", "v", "r", "s", "blockTimestamp", "transactionHash", "status", "logs"
+    )
+
+    blockHash: HexBytes
+    blockNumber: int
+    input: bytes
+    to: Optional[ChecksumAddress]
+    transactionIndex: int
+    value: int
+    chainId: int
+    blockTimestamp: int
+    transactionHash: bytes
+    status: int
+    logs: List[LogRecord]
+
+    _KEYS = __slots__
+    _KEYS_SET = frozenset(_KEYS)
+    _STORE = {"from": _intern, "to": _intern, "input": _hex_to_bytes, "transactionHash": _to_bytes, "r": _to_bytes, "s": _to_bytes}
+    # value is kept in wei
+    _LOAD = {"input": _bytes_to_hex, "transactionHash": _to_hexbytes, "r": _to_hexbytes, "s": _to_hexbytes, "value": _to_wei}
+
+    def __init__(self, tx: StrAny, block: StrAny = None) -> None:
+        for k, v in tx.items():
+            # hash is renamed so it does not clash with block hash in the normalized tables
+            self["transactionHash" if k == "hash" else k] = v
+        if block is not None:
+            for key in ["blockHash", "blockNumber", "blockTimestamp", "chainId"]:
+                self._share(key, block)
+
+    def add_logs(self, logs: List[StrAny]) -> None:
+        self.logs = [LogRecord(log, self) for log in logs]
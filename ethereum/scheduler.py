@@ -0,0 +1,281 @@
+"""Scheduling of block extraction in a single long running process
+
+`follow_chains` follows many EVM chains. Each chain is followed like with `follow_head`. The next micro batch goes to the chain with new blocks that got the least
+blocks relative to its `weight`, so when all chains are behind the head they get blocks in proportion to their weights. Blocks of a micro batch are fetched and
+decoded on a worker pool shared by all chains. Web3 instances with their http sessions are shared per node url and ABIs per `abi_dir`.
+
+`follow_head_with_backfill` follows one chain with two queues: new blocks at the head are always scheduled first and block ranges queued for backfill get the RPC
+capacity left by the head, under one rate limit of blocks per second.
+"""
+
+import math
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, cast
+
+from dlt.common import logger, sleep
+from dlt.common.sources import TDeferred
+from dlt.common.typing import DictStrAny
+
+from .ethereum import _get_web3, get_blocks_deferred
+
+
+# pipeline state key under which the state of each chain is kept by chain name
+STATE_KEY = "ethereum_chains"
+# pipeline state key with the list of [first block, last block] ranges queued for backfill
+BACKFILL_STATE_KEY = "ethereum_backfill"
+
+
+class ChainSource(NamedTuple):
+    name: str
+    node_url: str
+    abi_dir: str = None
+    is_poa: bool = False
+    supports_batching: bool = True
+    # share of blocks relative to other chains when all of them are behind the head
+    weight: float = 1.0
+    lag: int = 2
+    # number of past blocks to get if the chain state does not hold the current block
+    max_initial_blocks: int = 10
+    address_filter: Sequence[str] = None
+    selector_filter: Sequence[str] = None
+
+
+class RateLimiter:
+    """Token bucket of blocks per second. Blocks taken over the limit are paid for by waiting. No limit if `rate` is None"""
+    def __init__(self, rate: float = None, burst: float = None) -> None:
+        self.rate = rate
+        self.burst = burst or rate or 0.0
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def available(self) -> float:
+        if self.rate is None:
+            return math.inf
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def wait_time(self, blocks: float) -> float:
+        """Seconds until `blocks` can be taken without waiting"""
+        return max(blocks - self.available(), 0.0) / self.rate if self.rate else 0.0
+
+    def acquire(self, blocks: float) -> None:
+        """Takes `blocks`, waiting if the limit was exceeded"""
+        if self.rate is None:
+            return
+        self.tokens = self.available() - blocks
+        if self.tokens < 0:
+            sleep(-self.tokens / self.rate)
+
+
+class _ChainHead:
+    def __init__(self, poll_interval: float) -> None:
+        self.head: int = None
+        self.next_poll = 0.0
+        self.poll_interval = poll_interval
+        # blocks yielded in micro batches
+        self.served = 0
+
+    def update(self, head: int, now: float, min_poll_interval: float, max_poll_interval: float) -> None:
+        if self.head is None or head > self.head:
+            self.poll_interval = min_poll_interval
+        else:
+            self.poll_interval = min(self.poll_interval * 2, max_poll_interval)
+        self.head = head
+        self.next_poll = now + self.poll_interval
+
+
+def follow_chains(
+    chains: Sequence[ChainSource], state: DictStrAny = None, max_batch_blocks: int = 10, max_workers: int = 8, min_poll_interval: float = 0.5,
+    max_poll_interval: float = 15.0, should_stop: Callable[[], bool] = None
+    ) -> Iterator[Tuple[ChainSource, Iterator[DictStrAny]]]:
+    """Follows the heads of many chains and yields micro batches of new blocks of one chain at a time. Each micro batch is an iterator with at most `max_batch_blocks`
+    blocks and decoded transactions and must be fully consumed (ie. by `pipeline.extract`) before the next one is requested. Blocks of the micro batch are fetched and
+    decoded ahead on the shared worker pool.
+
+    When behind the head, micro batches of the chains are interleaved by their weights. The head of a chain is polled when its blocks are exhausted, not more often
+    than `min_poll_interval`. If no new block was found, the poll interval of the chain is doubled up to `max_poll_interval`.
+
+    Args:
+        chains (Sequence[ChainSource]): Chains to follow, with unique names
+        state (DictStrAny, optional): Pipeline state where the next block of each chain is kept under `ethereum_chains` and chain name. Defaults to None.
+        max_batch_blocks (int, optional): Max number of blocks in a micro batch. Defaults to 10.
+        max_workers (int, optional): Number of threads fetching and decoding blocks of all chains. Defaults to 8.
+        min_poll_interval (float, optional): Min seconds between head polls of a chain. Defaults to 0.5.
+        max_poll_interval (float, optional): Max seconds between head polls of a chain. Defaults to 15.0.
+        should_stop (Callable[[], bool], optional): Called before scheduling each micro batch, following stops if it returns True. Follows until the process is signalled if not set.
+
+    Yields:
+        Iterator[Tuple[ChainSource, Iterator[DictStrAny]]]: Chain and its micro batch with blocks and decoded transactions
+    """
+    if len({c.name for c in chains}) != len(chains):
+        raise ValueError("Chain names must be unique")
+    if state is None:
+        state = {}
+    heads = {c.name: _ChainHead(min_poll_interval) for c in chains}
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chains")
+    try:
+        while not (should_stop and should_stop()):
+            # pipeline replaces nested dicts when state is restored after failed extract
+            chains_state: Dict[str, DictStrAny] = state.setdefault(STATE_KEY, {})
+            now = time.monotonic()
+            ready: List[Tuple[ChainSource, Optional[int]]] = []
+            for chain in chains:
+                head = heads[chain.name]
+                current_block: int = chains_state.get(chain.name, {}).get("ethereum_current_block")
+                if (head.head is None or current_block is not None and current_block > head.head - chain.lag) and now >= head.next_poll:
+                    head.update(_get_web3(chain.node_url, chain.is_poa).eth.get_block_number(), now, min_poll_interval, max_poll_interval)
+                if head.head is not None and (current_block is None or current_block <= head.head - chain.lag):
+                    ready.append((chain, current_block))
+
+            if ready:
+                chain, current_block = min(ready, key=lambda r: heads[r[0].name].served / r[0].weight)
+                head = heads[chain.name]
+                last_block = head.head - chain.lag
+                if current_block is None:
+                    head.served += chain.max_initial_blocks
+                else:
+                    last_block = min(last_block, current_block + max_batch_blocks - 1)
+                    head.served += last_block - current_block + 1
+                logger.debug("Scheduling blocks of %s up to %s", chain.name, last_block)
+                deferred = get_blocks_deferred(
+                    chain.node_url, last_block=last_block, max_initial_blocks=chain.max_initial_blocks, abi_dir=chain.abi_dir, lag=chain.lag, is_poa=chain.is_poa,
+                    supports_batching=chain.supports_batching, state=chains_state.setdefault(chain.name, {}), address_filter=chain.address_filter,
+                    selector_filter=chain.selector_filter
+                )
+                yield chain, _prefetch(executor, cast(Iterator[TDeferred[List[DictStrAny]]], deferred))
+                continue
+
+            # wait for the next head poll
+            wait = min(h.next_poll for h in heads.values()) - now
+            logger.debug("Heads of all chains reached, polling again in %.2f s", wait)
+            sleep(max(wait, 0.0))
+    finally:
+        executor.shutdown(wait=True)
+
+
+def add_backfill(state: DictStrAny, first_block: int, last_block: int) -> None:
+    """Queues blocks from `first_block` to `last_block` (inclusive) for backfill by `follow_head_with_backfill` with pipeline `state`"""
+    if first_block > last_block:
+        raise ValueError(f"First block {first_block} is after last block {last_block}")
+    state.setdefault(BACKFILL_STATE_KEY, []).append([first_block, last_block])
+
+
+def follow_head_with_backfill(
+    node_url: str, max_batch_blocks: int = 10, max_initial_blocks: int = None, abi_dir: str = None, lag: int = 2, is_poa: bool = False, supports_batching: bool = True,
+    state: DictStrAny = None, address_filter: Sequence[str] = None, selector_filter: Sequence[str] = None, max_head_lag: int = None, max_blocks_per_second: float = None,
+    max_workers: int = 8, min_poll_interval: float = 0.5, max_poll_interval: float = 15.0, should_stop: Callable[[], bool] = None, block_cache_dir: str = None,
+    binary: bool = False
+    ) -> Iterator[Iterator[DictStrAny]]:
+    """Follows the chain head like `follow_head` and fills in the block ranges queued for backfill with `add_backfill` with RPC capacity left by the head. Each micro batch
+    must be fully consumed (ie. by `pipeline.extract`) before the next one is requested.
+
+    New blocks at the head are always scheduled first. A backfill micro batch is scheduled only when the head is reached and `max_batch_blocks` blocks fit in
+    `max_blocks_per_second`. The head is polled between backfill micro batches as when following the head. Backfill ranges are processed in the order they were queued, from the oldest block.
+    If more than `max_head_lag` blocks are behind the head, the older blocks are queued for backfill instead of being skipped, so the freshness of the head does not suffer
+    from a backlog.
+
+    Args:
+        node_url (str): An url to Ethereum node with JSON RPC interface.
+        max_batch_blocks (int, optional): Max number of blocks in a micro batch. Defaults to 10.
+        max_initial_blocks (int, optional): Number of past blocks to get if `state` does not hold the current block. Defaults to `max_batch_blocks`.
+        state (DictStrAny, optional): Pipeline state that holds the next block to get and the backfill queue, updated when each micro batch is consumed. Defaults to None.
+        max_head_lag (int, optional): Max number of blocks behind the head extracted at the head, older blocks are queued for backfill. No limit if not set.
+        max_blocks_per_second (float, optional): Rate limit of blocks of the head and backfill. Head blocks wait for the limit, backfill gets what is left. No limit if not set.
+        max_workers (int, optional): Number of threads fetching and decoding blocks. Defaults to 8.
+        min_poll_interval (float, optional): Min seconds between head polls. Defaults to 0.5.
+        max_poll_interval (float, optional): Max seconds between head polls. Defaults to 15.0.
+        should_stop (Callable[[], bool], optional): Called before scheduling each micro batch, following stops if it returns True. Follows until the process is signalled if not set.
+        Other arguments are passed to `get_blocks`.
+
+    Yields:
+        Iterator[Iterator[DictStrAny]]: Micro batches with blocks and decoded transactions.
+    """
+    if state is None:
+        state = {}
+    if max_initial_blocks is None:
+        max_initial_blocks = max_batch_blocks
+    w3 = _get_web3(node_url, is_poa)
+    head = _ChainHead(min_poll_interval)
+    limiter = RateLimiter(max_blocks_per_second, max(max_blocks_per_second or 0, max_batch_blocks))
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="backfill")
+
+    def _deferred(last_block: int, head_state: DictStrAny = None, first_block: int = None) -> Iterator[DictStrAny]:
+        # backfill batches are extracted without state so their range is set with the initial blocks
+        initial_blocks = max_initial_blocks if first_block is None else last_block - first_block + 1
+        deferred = get_blocks_deferred(
+            node_url, last_block=last_block, max_initial_blocks=initial_blocks, abi_dir=abi_dir, lag=lag, is_poa=is_poa,
+            supports_batching=supports_batching, state=head_state, address_filter=address_filter, selector_filter=selector_filter, block_cache_dir=block_cache_dir,
+            binary=binary
+        )
+        return _prefetch(executor, cast(Iterator[TDeferred[List[DictStrAny]]], deferred))
+
+    try:
+        while not (should_stop and should_stop()):
+            now = time.monotonic()
+            current_block: int = state.get("ethereum_current_block")
+            if (head.head is None or current_block is not None and current_block > head.head - lag) and now >= head.next_poll:
+                head.update(w3.eth.get_block_number(), now, min_poll_interval, max_poll_interval)
+
+            last_block = head.head - lag
+            if current_block is None or current_block <= last_block:
+                if current_block is not None and max_head_lag and last_block - current_block + 1 > max_head_lag:
+                    # move the backlog to backfill, both changes are committed with the next micro batch
+                    logger.info(f"Queuing blocks from {current_block} to {last_block - max_head_lag} for backfill because max head lag {max_head_lag} was exceeded")
+                    add_backfill(state, current_block, last_block - max_head_lag)
+                    current_block = state["ethereum_current_block"] = last_block - max_head_lag + 1
+                if current_block is None:
+                    blocks = max_initial_blocks
+                else:
+                    last_block = min(last_block, current_block + max_batch_blocks - 1)
+                    blocks = last_block - current_block + 1
+                limiter.acquire(blocks)
+                logger.debug("Scheduling head blocks up to %s", last_block)
+                yield _deferred(last_block, head_state=state)
+                continue
+
+            # backfill only when the head is reached
+            backfill: List[List[int]] = state.get(BACKFILL_STATE_KEY)
+            wait = head.next_poll - now
+            if backfill:
+                first_block, range_last_block = backfill[0]
+                last_block = min(range_last_block, first_block + max_batch_blocks - 1)
+                blocks = last_block - first_block + 1
+                backfill_wait = limiter.wait_time(blocks)
+                if backfill_wait == 0.0:
+                    limiter.acquire(blocks)
+                    logger.debug("Scheduling backfill blocks from %s to %s", first_block, last_block)
+                    yield _backfilled(_deferred(last_block, first_block=first_block), state, first_block, last_block)
+                    continue
+                wait = min(wait, backfill_wait)
+
+            logger.debug("Head %s reached, scheduling again in %.2f s", head.head, wait)
+            sleep(max(wait, 0.0))
+    finally:
+        executor.shutdown(wait=True)
+
+
+def _backfilled(items: Iterator[DictStrAny], state: DictStrAny, first_block: int, last_block: int) -> Iterator[DictStrAny]:
+    yield from items
+    # remove backfilled blocks from the queue within the consumer, like the head state. the queue is taken again as pipeline may have restored the state
+    backfill: List[List[int]] = state[BACKFILL_STATE_KEY]
+    for idx, block_range in enumerate(backfill):
+        if block_range[0] == first_block:
+            if last_block >= block_range[1]:
+                del backfill[idx]
+            else:
+                block_range[0] = last_block + 1
+            break
+
+
+def _prefetch(executor: ThreadPoolExecutor, deferred: Iterator[TDeferred[List[DictStrAny]]]) -> Iterator[DictStrAny]:
+    # chain state is updated when deferred iterator is exhausted, that happens within the consumer ie. `pipeline.extract` so state stays atomic with the data
+    futures: List["Future[List[DictStrAny]]"] = [executor.submit(d) for d in deferred]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
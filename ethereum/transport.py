@@ -0,0 +1,36 @@
+"""JSON RPC transport of the Ethereum source
+
+Responses are parsed from the response bytes without decoding them into text first, with orjson if installed and with the JSON library of dlt otherwise,
+so large hex strings of blocks and receipts are copied once, into the parsed values. Requests are encoded by web3. Batch requests go through the same per-thread
+http sessions as web3 requests so connections are kept alive.
+"""
+
+from typing import Any, Callable, cast
+
+from web3 import HTTPProvider
+from web3._utils.encoding import FriendlyJsonSerde
+from web3._utils.request import make_post_request
+from web3.types import RPCResponse
+
+from dlt.common import json
+
+from . import profiling
+
+try:
+    import orjson
+    loads: Callable[[bytes], Any] = orjson.loads
+except ImportError:
+    loads = json.loads
+
+
+class FastHTTPProvider(HTTPProvider):
+    def decode_rpc_response(self, raw_response: bytes) -> RPCResponse:
+        with profiling.phase("json"):
+            return cast(RPCResponse, loads(raw_response))
+
+    def make_batch_request(self, requests: Any) -> Any:
+        """Posts a JSON RPC request or a batch of requests and returns the parsed response(s) without web3 middlewares and formatters"""
+        # encoded like web3 requests
+        raw_response = make_post_request(self.endpoint_uri, FriendlyJsonSerde().json_encode(requests).encode("utf-8"), **self.get_request_kwargs())
+        with profiling.phase("json"):
+            return loads(raw_response)
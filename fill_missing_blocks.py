@@ -1,8 +1,11 @@
+import os
+
 from dlt.common import logger
 
 from dlt.pipeline import Schema, Pipeline, CannotRestorePipelineException
 
 from ethereum import get_blocks
+from ethereum.loaded_blocks import LoadedBlocks
 from helpers import config, secrets, get_credentials
 
 # get the configuration from config and secret files or environment variables 
@@ -16,6 +19,8 @@ import_schema_path = config.get("import_schema_path")
 export_schema_path = config.get("export_schema_path")
 # that's Ronin Network JSON RPC node
 rpc_url = "https://api.roninchain.com/rpc"
+# blocks already extracted are skipped, shared with axies.py
+loaded_blocks = LoadedBlocks(os.path.join(config["working_dir"], "loaded_blocks")) if config["ethereum"].get("skip_loaded_blocks", False) else None
 
 
 pipeline = Pipeline("axies")
@@ -38,9 +43,12 @@ def extract(from_block, to_block) -> None:
     pipeline.load()
 
     # get iterator with blocks, transactions and decoded transactions and logs
-    i = get_blocks(rpc_url, last_block=to_block, max_blocks=to_block-from_block+1, abi_dir=abi_dir, is_poa=True, supports_batching=False)
+    i = get_blocks(rpc_url, last_block=to_block, max_blocks=to_block-from_block+1, abi_dir=abi_dir, is_poa=True, supports_batching=False, loaded_blocks=loaded_blocks)
     # read the data from iterator
     pipeline.extract(i, table_name="blocks")
+    # record the extracted blocks only when extract stored them
+    if loaded_blocks:
+        loaded_blocks.commit()
 
 missing_blocks = """
 WITH block_pairs AS (
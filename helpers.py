@@ -1,14 +1,19 @@
+"""Config and Secret Helpers
+
+Before we have Pipeline v2 available this glue code is needed to handle credentials and configs via toml files.
+"""
+
+import multiprocessing
 import os
+import signal
 import tomlkit
+from concurrent.futures import Future, ProcessPoolExecutor
 
 from dlt.common.typing import StrAny
 
+from dlt.pipeline import Pipeline
 from dlt.pipeline.typing import PipelineCredentials, TLoaderType, credentials_from_dict
 
-"""Config and Secret Helpers
-
-Before we have Pipeline v2 available this glue code is needed to handle credentials and configs via toml files.
-"""
 
 def _read_toml(file_name: str) -> StrAny:
     config_file_path = os.path.abspath(os.path.join(".", ".dlt", file_name))
@@ -31,3 +36,56 @@ def get_credentials(destination: TLoaderType, dataset: str, credentials: StrAny)
     full_credentials["CLIENT_TYPE"] = os.environ.get("CLIENT_TYPE", destination)
     full_credentials["DEFAULT_DATASET"] = dataset
     return credentials_from_dict(full_credentials)
+
+
+class OverlappedNormalize:
+    """Normalizes extracted data in a separate process so the next block range is extracted in the meantime.
+
+    Each `normalize` call waits for the previous one to finish and normalizes all data extracted since then into a new load package, so a load package is
+    created per extracted range and the loader may start on it right away. Exceptions of background normalize are raised by the next `normalize` or `wait` call.
+
+    The dlt runner keeps the metrics and the exception of the last step in module globals, which are written by extract and normalize. Normalize runs in a
+    forked process, so it never shares them with the extract in this process. The normalize metrics are not exposed by this process.
+    """
+
+    def __init__(self, pipeline: Pipeline) -> None:
+        self.pipeline = pipeline
+        # dlt process pools require fork as well
+        self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork"), initializer=_init_normalize_process, initargs=(pipeline,))
+        # fork the worker now, before extract starts its threads
+        self._executor.submit(int).result()
+        self._pending: "Future[int]" = None
+
+    def normalize(self) -> None:
+        self.wait()
+        self._pending = self._executor.submit(_normalize_in_process)
+
+    def wait(self) -> None:
+        pending, self._pending = self._pending, None
+        if pending:
+            pending.result()
+
+    def close(self) -> None:
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown()
+
+
+_NORMALIZE_PIPELINE: Pipeline = None
+
+
+def _init_normalize_process(pipeline: Pipeline) -> None:
+    global _NORMALIZE_PIPELINE
+
+    # the parent process waits for the pending normalize when signalled
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _NORMALIZE_PIPELINE = pipeline
+
+
+def _normalize_in_process() -> int:
+    try:
+        return _NORMALIZE_PIPELINE.normalize()
+    except Exception as ex:
+        # pipeline exceptions cannot be unpickled in the parent process
+        raise RuntimeError(f"Background normalize failed: {ex}") from None
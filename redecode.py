@@ -0,0 +1,31 @@
+import os
+import sys
+
+from dlt.common import logger
+
+from dlt.pipeline import Pipeline
+
+from ethereum import redecode
+from helpers import config, secrets, get_credentials
+
+# decodes blocks kept in the block cache again (ie. after new ABIs were added) and loads the decoded data
+# usage: python redecode.py <first block> <last block>
+first_block, last_block = int(sys.argv[1]), int(sys.argv[2])
+
+credentials = get_credentials(config.get("client_type"), config.get("default_dataset"), secrets.get("credentials", {}))
+# here we keep the ABIs of the contracts to decode
+abi_dir = "abi/abis"
+# blocks cached by axies.py with `block_cache` option
+block_cache_dir = os.path.join(config["working_dir"], "block_cache")
+
+pipeline = Pipeline("axies")
+pipeline.restore_pipeline(credentials, config["working_dir"], export_schema_path=config.get("export_schema_path"))
+logger.info(f"Decoding again blocks {first_block} to {last_block} from {block_cache_dir}")
+
+# decoded items have table names set so the table name is used only for the blocks
+pipeline.extract(redecode(block_cache_dir, first_block, last_block, abi_dir), table_name="blocks")
+# normalize the JSON data into tables and prepare load packages
+pipeline.normalize()
+
+# if you want to run the whole pipeline in single script just uncomment this line
+# pipeline.load()
@@ -0,0 +1,116 @@
+"""Local Dune API stand-in
+
+Executes queries registered with `add_query` by returning their rows after the configured execution time, so the Dune source may be tested without a Dune account.
+Results are paged with `limit` and `offset` like in the Dune API.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Counter, Dict, List, NamedTuple, Optional, Tuple, Type
+from urllib.parse import parse_qs, urlsplit
+
+from dlt.common import json
+from dlt.common.typing import DictStrAny, StrAny
+from dlt.common.utils import uniq_id
+
+
+class TFakeQuery(NamedTuple):
+    rows: List[DictStrAny]
+    execution_time: float
+    # state reported when execution ends
+    final_state: str
+
+
+class FakeDuneAPI:
+    def __init__(self) -> None:
+        self.queries: Dict[int, TFakeQuery] = {}
+        # query id and parameters of each execution
+        self.executions: Dict[str, Tuple[int, StrAny, float]] = {}
+        # counts requests per endpoint: execute, status and results
+        self.calls: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/api/v1"
+
+    def add_query(self, query_id: int, rows: List[DictStrAny], execution_time: float = 0.0, final_state: str = "QUERY_STATE_COMPLETED") -> None:
+        self.queries[query_id] = TFakeQuery(rows, execution_time, final_state)
+
+    def start(self) -> "FakeDuneAPI":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeDuneAPI":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def dispatch(self, method: str, path: str, body: Optional[StrAny]) -> Tuple[int, Any]:
+        url = urlsplit(path)
+        parts = url.path.strip("/").split("/")[2:]
+        query_string = parse_qs(url.query)
+        with self._lock:
+            if method == "POST" and len(parts) == 3 and parts[0] == "query" and parts[2] == "execute":
+                self.calls["execute"] += 1
+                query_id = int(parts[1])
+                if query_id not in self.queries:
+                    return 400, {"error": "Query not found"}
+                execution_id = uniq_id()
+                self.executions[execution_id] = (query_id, (body or {}).get("query_parameters") or {}, time.monotonic())
+                return 200, {"execution_id": execution_id, "state": "QUERY_STATE_PENDING"}
+            if method == "GET" and len(parts) == 3 and parts[0] == "execution" and parts[1] in self.executions:
+                query_id, _, started_at = self.executions[parts[1]]
+                query = self.queries[query_id]
+                done = time.monotonic() - started_at >= query.execution_time
+                state = query.final_state if done else "QUERY_STATE_EXECUTING"
+                if parts[2] == "status":
+                    self.calls["status"] += 1
+                    return 200, {"execution_id": parts[1], "query_id": query_id, "state": state}
+                if parts[2] == "results":
+                    self.calls["results"] += 1
+                    if state != "QUERY_STATE_COMPLETED":
+                        return 400, {"error": "Execution is not completed"}
+                    offset = int(query_string.get("offset", ["0"])[0])
+                    limit = int(query_string.get("limit", [str(len(query.rows))])[0])
+                    response = {"execution_id": parts[1], "query_id": query_id, "state": state, "result": {"rows": query.rows[offset:offset + limit]}}
+                    if offset + limit < len(query.rows):
+                        response["next_offset"] = offset + limit
+                    return 200, response
+        return 404, {"error": "Not found"}
+
+    def _handler_class(self) -> Type[BaseHTTPRequestHandler]:
+        fake = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def _respond(self, body: Optional[StrAny]) -> None:
+                status, response = fake.dispatch(self.command, self.path, body)
+                payload = json.dumps(response).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self) -> None:
+                self._respond(None)
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self._respond(json.loads(body) if body else None)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return _Handler
@@ -0,0 +1,213 @@
+"""Local JSON RPC node stand-in
+
+Serves blocks, transaction receipts and logs recorded with `record_fixture` so the Ethereum source may be tested and benchmarked without a live node.
+Latency, jitter and error rates may be configured to mimic a real node. All random behavior is seeded so runs are repeatable. Responses are gzipped if the client accepts it.
+"""
+
+import os
+import gzip
+import random
+import threading
+from copy import deepcopy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Counter, List, Optional, Sequence, Type, Union
+
+import requests
+
+from dlt.common import json, sleep
+from dlt.common.typing import DictStrAny, StrAny
+
+
+DEFAULT_FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "rpc", "ronin_blocks.json")
+
+
+def load_fixture(fixture_path: str = DEFAULT_FIXTURE_PATH) -> DictStrAny:
+    with open(fixture_path, "r", encoding="utf-8") as f:
+        fixture: DictStrAny = json.load(f)
+    return fixture
+
+
+def record_fixture(node_url: str, block_numbers: Sequence[int], fixture_path: str) -> None:
+    """Records blocks with full transactions and all transaction receipts from a live node into `fixture_path`"""
+
+    def _call(method: str, params: List[Any]) -> Any:
+        r = requests.post(node_url, json={"jsonrpc": "2.0", "method": method, "params": params, "id": 1}, timeout=(20, 12))
+        r.raise_for_status()
+        return r.json()["result"]
+
+    blocks: DictStrAny = {}
+    receipts: DictStrAny = {}
+    for block_number in block_numbers:
+        block = _call("eth_getBlockByNumber", [hex(block_number), True])
+        blocks[str(block_number)] = block
+        for tx in block["transactions"]:
+            receipts[tx["hash"]] = _call("eth_getTransactionReceipt", [tx["hash"]])
+    fixture = {
+        "chain_id": int(_call("eth_chainId", []), 16),
+        "blocks": blocks,
+        "receipts": receipts
+    }
+    with open(fixture_path, "w", encoding="utf-8") as f:
+        json.dump(fixture, f, indent=1)
+
+
+class RPCReplayServer:
+    """Replays recorded JSON RPC responses over HTTP, supports batch requests.
+
+    Block numbers outside of the recorded range are served by cycling over recorded blocks (with block number rewritten) so any number of blocks may be requested.
+    The highest recorded block is reported as chain head unless `head` is set.
+    """
+
+    def __init__(
+        self,
+        fixture: Union[str, StrAny] = DEFAULT_FIXTURE_PATH,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        head: Optional[int] = None,
+        seed: int = 2020,
+        compress: bool = True
+    ) -> None:
+        if isinstance(fixture, str):
+            fixture = load_fixture(fixture)
+        self.chain_id: int = fixture["chain_id"]
+        self.blocks: DictStrAny = fixture["blocks"]
+        self.receipts: DictStrAny = fixture["receipts"]
+        self.recorded_numbers = sorted(int(n) for n in self.blocks)
+        self.head = head if head is not None else self.recorded_numbers[-1]
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        # gzip responses if client accepts them
+        self.compress = compress
+        # counts JSON RPC calls per method, batch elements are counted separately
+        self.calls: Counter[str] = Counter()
+        # counts responses per content encoding
+        self.encodings: Counter[str] = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer = None
+        self._thread: threading.Thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/rpc"
+
+    def start(self) -> "RPCReplayServer":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "RPCReplayServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def get_block(self, block_number: int, full_transactions: bool) -> DictStrAny:
+        n = len(self.recorded_numbers)
+        first = self.recorded_numbers[0]
+        recorded = self.recorded_numbers[(block_number - first) % n]
+        block: DictStrAny = self.blocks[str(recorded)]
+        if recorded != block_number or not full_transactions:
+            block = deepcopy(block)
+            block["number"] = hex(block_number)
+            for tx in block["transactions"]:
+                tx["blockNumber"] = hex(block_number)
+            if not full_transactions:
+                block["transactions"] = [tx["hash"] for tx in block["transactions"]]
+        return block
+
+    def get_logs(self, logs_filter: StrAny) -> List[DictStrAny]:
+        """Returns logs of the block with `blockHash` matching `address` and first position of `topics` in the filter"""
+        addresses = logs_filter.get("address") or []
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {a.lower() for a in addresses}
+        topics = logs_filter.get("topics") or []
+        first_topics = {t.lower() for t in topics[0]} if topics and topics[0] else set()
+        logs: List[DictStrAny] = []
+        for receipt in self.receipts.values():
+            if receipt["blockHash"] != logs_filter["blockHash"]:
+                continue
+            for log in receipt["logs"]:
+                if addresses and log["address"].lower() not in addresses:
+                    continue
+                if first_topics and (not log["topics"] or log["topics"][0].lower() not in first_topics):
+                    continue
+                logs.append(log)
+        return logs
+
+    def dispatch(self, request: StrAny) -> StrAny:
+        method: str = request["method"]
+        params: List[Any] = request.get("params") or []
+        with self._lock:
+            self.calls[method] += 1
+        result: Any = None
+        if method == "eth_chainId":
+            result = hex(self.chain_id)
+        elif method == "net_version":
+            result = str(self.chain_id)
+        elif method == "eth_blockNumber":
+            result = hex(self.head)
+        elif method == "eth_getBlockByNumber":
+            block_id = params[0]
+            block_number = self.head if block_id == "latest" else int(block_id, 16)
+            result = self.get_block(block_number, bool(params[1]))
+        elif method == "eth_getTransactionReceipt":
+            result = self.receipts.get(params[0])
+        elif method == "eth_getLogs":
+            result = self.get_logs(params[0])
+        else:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32601, "message": f"method {method} not found"}}
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+
+    def _delay_and_fail(self) -> bool:
+        with self._lock:
+            delay = self.latency + self._random.uniform(-self.jitter, self.jitter) if self.jitter else self.latency
+            should_fail = self.error_rate > 0 and self._random.random() < self.error_rate
+        if delay > 0:
+            sleep(delay)
+        return should_fail
+
+    def _handler_class(self) -> Type[BaseHTTPRequestHandler]:
+        replay = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if replay._delay_and_fail():
+                    self.send_error(503, "Injected error")
+                    return
+                request = json.loads(body)
+                if isinstance(request, list):
+                    response: Any = [replay.dispatch(r) for r in request]
+                else:
+                    response = replay.dispatch(request)
+                payload = json.dumps(response).encode("utf-8")
+                encoding = "identity"
+                if replay.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    payload = gzip.compress(payload, compresslevel=1)
+                    encoding = "gzip"
+                with replay._lock:
+                    replay.encodings[encoding] += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                if encoding != "identity":
+                    self.send_header("Content-Encoding", encoding)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return _Handler
@@ -0,0 +1,108 @@
+import os
+import shutil
+from pathlib import Path
+import pytest
+from copy import deepcopy
+from typing import Any
+
+from dlt.common import json
+from dlt.common.typing import DictStrAny
+
+from ethereum import get_known_contracts
+from ethereum.abi_registry import ABIRegistry, get_registry
+from ethereum.eth_source_utils import abi_to_selector
+
+
+AXIE_ADDRESS: Any = "0x32950db2a7164aE833121501C797D79E7B79d74C"
+NEW_ABI: Any = {"type": "function", "name": "breedAxiesTwice", "inputs": [{"name": "_sireId", "type": "uint256"}], "outputs": [], "stateMutability": "nonpayable"}
+
+
+@pytest.fixture
+def abi_dir(tmp_path: Path) -> str:
+    return str(shutil.copytree("abi/abis", str(tmp_path / "abis")))
+
+
+def test_registry_shares_selectors(abi_dir: str) -> None:
+    # registries with separate store connections stand for extractors in separate processes
+    registry = ABIRegistry(abi_dir)
+    other = ABIRegistry(abi_dir)
+    assert registry.contracts.keys() == other.contracts.keys()
+    assert set(registry.decoded) < set(registry.contracts)
+    selector = abi_to_selector(NEW_ABI)
+    unknown_abi: Any = dict(NEW_ABI, name="notThere")
+    unknown = abi_to_selector(unknown_abi)
+    assert other.get_abi(other.decoded[AXIE_ADDRESS], selector) is None
+
+    registry.update_abi(registry.decoded[AXIE_ADDRESS], selector, deepcopy(NEW_ABI), 100)
+    registry.update_abi(registry.decoded[AXIE_ADDRESS], unknown, None, 101)
+    # resolved selector is found without lookup
+    assert other.get_abi(other.decoded[AXIE_ADDRESS], selector)["name"] == "breedAxiesTwice"
+    assert unknown.hex() in other.decoded[AXIE_ADDRESS]["unknown_selectors"]
+
+    # only changed abi file is written
+    mtimes = {e.name: e.stat().st_mtime_ns for e in os.scandir(abi_dir)}
+    registry.save()
+    changed = [e.name for e in os.scandir(abi_dir) if e.is_file() and mtimes.get(e.name) != e.stat().st_mtime_ns and not e.name.startswith(".")]
+    assert changed == [f"{AXIE_ADDRESS}.json"]
+    # own writes are not reloaded
+    assert registry.refresh(force=True) is False
+
+    # new process loads the selectors from file and store
+    assert ABIRegistry(abi_dir).decoded[AXIE_ADDRESS]["selectors"][selector]["name"] == "breedAxiesTwice"
+
+
+def test_registry_reloads_modified_files(abi_dir: str) -> None:
+    registry = ABIRegistry(abi_dir, poll_interval=60)
+    contracts = registry.decoded
+    selector = abi_to_selector(NEW_ABI)
+    registry.update_abi(contracts[AXIE_ADDRESS], selector, deepcopy(NEW_ABI), 100)
+
+    abi_path = os.path.join(abi_dir, f"{AXIE_ADDRESS}.json")
+    with open(abi_path, "r", encoding="utf-8") as f:
+        content = json.load(f)
+    content["should_decode"] = False
+    with open(abi_path, "w", encoding="utf-8") as f:
+        json.dump(content, f)
+    os.utime(abi_path, ns=(0, 0))
+    # not polled before interval elapses
+    assert registry.refresh() is False
+    assert registry.refresh(force=True) is True
+    # dicts are updated in place
+    assert AXIE_ADDRESS not in contracts
+    # selectors resolved before are kept
+    assert registry.contracts[AXIE_ADDRESS]["selectors"][selector]["name"] == "breedAxiesTwice"
+
+    os.remove(abi_path)
+    assert registry.refresh(force=True) is True
+    assert AXIE_ADDRESS not in registry.contracts
+
+
+def test_get_registry(abi_dir: str) -> None:
+    assert get_registry(abi_dir) is get_registry(abi_dir + "/")
+    assert get_registry(None).contracts == {}
+
+
+def test_known_contracts_only_when_changed(abi_dir: str) -> None:
+    state: DictStrAny = {}
+    contracts = list(get_known_contracts(abi_dir, state=state))
+    assert len(contracts) == len(get_registry(abi_dir).contracts)
+    assert list(get_known_contracts(abi_dir, state=state)) == []
+    # resolved selectors do not change the known contracts
+    registry = get_registry(abi_dir)
+    registry.update_abi(registry.decoded[AXIE_ADDRESS], abi_to_selector(NEW_ABI), deepcopy(NEW_ABI), 100)
+    registry.save()
+    registry.refresh(force=True)
+    assert list(get_known_contracts(abi_dir, state=state)) == []
+
+    abi_path = os.path.join(abi_dir, f"{AXIE_ADDRESS}.json")
+    with open(abi_path, "r", encoding="utf-8") as f:
+        content = json.load(f)
+    content["name"] = "Axie Core"
+    with open(abi_path, "w", encoding="utf-8") as f:
+        json.dump(content, f)
+    os.utime(abi_path, ns=(0, 0))
+    registry.refresh(force=True)
+    changed = list(get_known_contracts(abi_dir, state=state))
+    assert {c["address"]: c["name"] for c in changed}[AXIE_ADDRESS] == "Axie Core"
+    # without state all contracts are always returned
+    assert len(list(get_known_contracts(abi_dir))) == len(contracts)
@@ -0,0 +1,52 @@
+import os
+import time
+from pathlib import Path
+
+from ethereum.block_cache import BUCKET_SIZE, BlockCache
+from ethereum.loaded_blocks import LoadedBlocks
+
+
+def test_block_cache_round_trip(tmp_path: Path) -> None:
+    cache_dir = str(tmp_path / "block_cache")
+    cache = BlockCache(cache_dir)
+    block = {"number": hex(1500), "transactions": [{"hash": "0x01"}]}
+    assert cache.get(1500) is None
+    cache.put(1500, b"\x01" * 32, 2020, block, {"0x01": {"status": "0x1"}})
+    assert cache.get(1500) == {"chain_id": 2020, "block": block, "receipts": {"0x01": {"status": "0x1"}}}
+    assert os.listdir(os.path.join(cache_dir, str(1500 // BUCKET_SIZE))) == [f"1500_{'01' * 32}.json.z"]
+
+    # block replaced after reorg is found by a new cache instance
+    time.sleep(0.01)
+    reorged = dict(block, extraData="0x02")
+    cache.put(1500, b"\x02" * 32, 2020, reorged, {})
+    assert BlockCache(cache_dir).get(1500)["block"] == reorged
+    assert BlockCache(cache_dir).get(1501) is None
+
+
+def test_loaded_blocks(tmp_path: Path) -> None:
+    loaded_dir = str(tmp_path / "loaded_blocks")
+    loaded = LoadedBlocks(loaded_dir, capacity=1000)
+    loaded.mark([(10, b"\x01" * 32), (12, b"\x01" * 32), (5, b"\x01" * 32)])
+    assert loaded.intervals == [(5, 5), (10, 10), (12, 12)]
+    loaded.mark([(11, b"\x01" * 32), (4, b"\x01" * 32)])
+    assert loaded.intervals == [(4, 5), (10, 12)]
+    assert loaded.contains(11, b"\x01" * 32)
+    # block replaced in a reorg is not found
+    assert not loaded.contains(11, b"\x02" * 32)
+    assert not loaded.contains(13, b"\x01" * 32)
+
+    # record is kept on disk
+    reopened = LoadedBlocks(loaded_dir)
+    assert reopened.intervals == [(4, 5), (10, 12)]
+    assert reopened.contains(4, b"\x01" * 32)
+    assert not reopened.contains_number(9)
+
+    # staged blocks are recorded on commit
+    reopened.stage([(20, b"\x01" * 32)])
+    assert not reopened.contains_number(20)
+    reopened.commit()
+    assert reopened.contains(20, b"\x01" * 32)
+    reopened.stage([(30, b"\x01" * 32)])
+    reopened.discard()
+    reopened.commit()
+    assert not reopened.contains_number(30)
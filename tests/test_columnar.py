@@ -0,0 +1,97 @@
+import shutil
+import pytest
+from pathlib import Path
+from collections import defaultdict
+from typing import Counter, Dict, Set
+
+from dlt.common import Wei, json
+from dlt.common.normalizers.json.relational import normalize_data_item
+from dlt.common.schema.utils import new_table
+from dlt.common.sources import get_table_name, with_table_name
+
+from ethereum import get_blocks, get_schema
+
+from tests.rpc_replay import RPCReplayServer
+from benchmarks import bench_columnar
+
+# columnar output is an optional extra
+pq = pytest.importorskip("pyarrow.parquet")
+from ethereum.columnar import ArrowBatchBuilder, get_blocks_columnar, write_parquet  # noqa: E402
+
+
+def test_columnar_matches_normalizer(tmp_path: Path) -> None:
+    abi_dir = shutil.copytree("abi/abis", str(tmp_path / "abis"))
+    schema = get_schema()
+
+    with RPCReplayServer() as replay:
+        items = list(get_blocks(replay.url, last_block=replay.head, max_blocks=4, abi_dir=abi_dir, is_poa=True))
+        batches = list(get_blocks_columnar(replay.url, last_block=replay.head, max_blocks=4, abi_dir=abi_dir, is_poa=True, batch_blocks=3, load_id="load"))
+
+    # rows generated by the relational normalizer
+    expected_rows: Counter[str] = Counter()
+    expected_ids: Dict[str, Set[str]] = defaultdict(set)
+    for item in items:
+        # pipeline sets the table name of blocks on extract and passes serialized items to normalizer
+        item = with_table_name(json.loads(json.dumps(item)), get_table_name(item) or "blocks")
+        for (table_name, _), row in normalize_data_item(schema, item, "load"):
+            expected_rows[table_name] += 1
+            expected_ids[table_name].add(row["_dlt_id"])
+
+    rows: Counter[str] = Counter()
+    ids: Dict[str, Set[str]] = defaultdict(set)
+    for table_name, batch in batches:
+        rows[table_name] += batch.num_rows
+        ids[table_name].update(batch.column("_dlt_id").to_pylist())
+    assert rows == expected_rows
+    # two batches for tables in blocks
+    assert len([t for t, _ in batches if t == "blocks"]) == 2
+    # row ids are deterministic for tables with primary keys and child tables
+    for table_name in ["blocks", "blocks__transactions", "blocks__transactions__logs", "blocks__transactions__logs__topics"]:
+        assert ids[table_name] == expected_ids[table_name]
+
+    blocks = [b for t, b in batches if t == "blocks"][0]
+    assert str(blocks.schema.field("block_timestamp").type) == "timestamp[s, tz=UTC]"
+    assert str(blocks.schema.field("difficulty").type) == "decimal256(76, 18)"
+    assert blocks.column("_dlt_load_id").to_pylist() == ["load"] * blocks.num_rows
+    # root values propagated to child tables
+    topics = [b for t, b in batches if t == "blocks__transactions__logs__topics"][0]
+    assert set(topics.column("block_number").to_pylist()) <= set(blocks.column("block_number").to_pylist())
+    assert topics.column("_dlt_parent_id").null_count == 0
+
+    # write parquet files per table
+    paths = write_parquet(batches, str(tmp_path / "parquet"))
+    assert len(paths) == len(batches)
+    logs = pq.read_table(str(tmp_path / "parquet" / "blocks__transactions__logs"))
+    assert logs.num_rows == expected_rows["blocks__transactions__logs"]
+
+
+def test_columnar_variants() -> None:
+    schema = get_schema()
+    # wei column as created when decoded token amounts are loaded
+    schema.update_schema(new_table("decoded", columns=[{"name": "amount", "data_type": "wei", "nullable": True}]))
+    builder = ArrowBatchBuilder(schema, "load")
+    builder.add_item(with_table_name({"amount": Wei.from_int256(2**255), "nested": {"x": 1}, "extra": 1}, "Decoded"))
+    builder.add_item(with_table_name({"amount": Wei.from_int256(1000, 2), "nested": {"x": "a"}, "extra": "x"}, "Decoded"))
+    assert builder.row_count == 2
+    (table_name, batch), = list(builder.flush())
+    assert builder.row_count == 0
+    assert table_name == "decoded"
+    data = batch.to_pydict()
+    # too large for the wei column
+    assert data["amount"][0] is None
+    assert data["amount__v_str"] == [str(2**255), None]
+    assert str(data["amount"][1]) == "10.000000000000000000"
+    # types drift into variant columns like in the normalizer
+    assert data["nested__x"] == [1, None]
+    assert data["nested__x__v_text"] == [None, "a"]
+    assert data["extra"] == [1, None]
+    assert data["extra__v_text"] == [None, "x"]
+    # passed schema is not modified
+    assert "extra" not in schema.get_table_columns("decoded")
+
+
+def test_columnar_benchmark_smoke() -> None:
+    pipeline, columnar = bench_columnar.run_benchmark(blocks=3)
+    assert pipeline["mode"] == "extract_normalize"
+    assert columnar["mode"] == "columnar_parquet"
+    assert pipeline["items"] == columnar["items"] > 3
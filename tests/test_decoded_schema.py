@@ -0,0 +1,58 @@
+import shutil
+from pathlib import Path
+import pytest
+
+from dlt.common import json
+from dlt.common.json import custom_pua_decode, json_typed_dumps
+from dlt.common.sources import get_table_name, with_table_name
+from dlt.pipeline import Pipeline
+
+from ethereum import get_blocks, get_schema
+from ethereum.ethereum import add_decoded_tables
+from tests.rpc_replay import RPCReplayServer
+
+
+@pytest.fixture
+def abi_dir(tmp_path: Path) -> str:
+    return str(shutil.copytree("abi/abis", str(tmp_path / "abis")))
+
+
+def test_decoded_items_fit_compiled_schema(abi_dir: str) -> None:
+    assert "axie_contract_logs_axiegg_spawned" in add_decoded_tables(get_schema(), abi_dir)
+    schema = Pipeline.load_schema_from_file("axies_schema.yaml")
+    # axies schema is compiled with compile_schema.py
+    assert add_decoded_tables(schema, abi_dir) == []
+
+    with RPCReplayServer() as replay:
+        items = list(get_blocks(replay.url, last_block=replay.head, max_blocks=8, abi_dir=abi_dir, is_poa=True))
+    decoded = [i for i in items if get_table_name(i) is not None]
+    assert decoded
+    # decoded items are normalized without schema changes
+    for item in decoded:
+        event = json.loads(json_typed_dumps(item))
+        for (table_name, parent_table), row in schema.normalize_data_item(schema, event, "load_id"):
+            row = {k: custom_pua_decode(v) for k, v in schema.filter_row(table_name, row).items()}
+            _, partial_table = schema.coerce_row(table_name, parent_table, row)
+            assert partial_table is None, table_name
+
+
+def test_binary_blocks_fit_binary_schema(abi_dir: str) -> None:
+    schema = get_schema(abi_dir, binary=True)
+    assert schema.get_table_columns("blocks__transactions")["value"]["data_type"] == "binary"
+    assert schema.get_table_columns("axie_contract_logs_axiegg_spawned")["_tx_address"]["data_type"] == "binary"
+
+    with RPCReplayServer() as replay:
+        items = list(get_blocks(replay.url, last_block=replay.head, max_blocks=8, abi_dir=abi_dir, is_poa=True, binary=True))
+    tx = next(tx for i in items if get_table_name(i) is None for tx in i["transactions"])
+    assert len(tx["value"]) == 32
+    # blocks and decoded items are normalized into binary columns without variants
+    for item in items:
+        # blocks are extracted into `blocks` table
+        event = json.loads(json_typed_dumps(item if get_table_name(item) else with_table_name(item, "blocks")))
+        for (table_name, parent_table), row in schema.normalize_data_item(schema, event, "load_id"):
+            row = {k: custom_pua_decode(v) for k, v in schema.filter_row(table_name, row).items()}
+            coerced_row, partial_table = schema.coerce_row(table_name, parent_table, row)
+            assert partial_table is None or not any("__v_" in c for c in partial_table["columns"]), table_name
+            for column_name in ["transaction_hash", "address", "from"]:
+                if coerced_row.get(column_name) is not None:
+                    assert isinstance(coerced_row[column_name], bytes), (table_name, column_name)
@@ -0,0 +1,108 @@
+import time
+import pytest
+
+from dlt.common.typing import DictStrAny
+
+from dune_source import DuneExecutionError, DuneQuery, chunk_rows, get_schema, query_dune
+from tests.dune_fake import FakeDuneAPI
+
+
+def test_query_dune_concurrently() -> None:
+    with FakeDuneAPI() as dune:
+        dune.add_query(1, [{"n": 1}], execution_time=0.6)
+        dune.add_query(2, [{"n": 2}, {"n": 3}], execution_time=0.1)
+        dune.add_query(3, [], execution_time=0.3)
+        queries = [DuneQuery("slow", 1), DuneQuery("fast", 2, {"since": 100}), DuneQuery("empty", 3)]
+        started = time.perf_counter()
+        results = [(q.name, list(rows)) for q, rows in query_dune("key", queries, min_poll_interval=0.05, max_poll_interval=0.2, base_url=dune.url)]
+        elapsed = time.perf_counter() - started
+        # results come in order of completion
+        assert results == [("fast", [{"n": 2}, {"n": 3}]), ("empty", []), ("slow", [{"n": 1}])]
+        # wall time of the slowest query, not the sum of all
+        assert elapsed < 0.6 + 0.2 + 0.5
+        assert dune.calls["execute"] == 3
+        # backoff limits status checks
+        assert dune.calls["status"] < 3 * 0.6 / 0.05
+        assert sorted((q, p) for q, p, _ in dune.executions.values()) == [(1, {}), (2, {"since": 100}), (3, {})]
+
+
+def test_query_dune_failed() -> None:
+    with FakeDuneAPI() as dune:
+        dune.add_query(1, [], execution_time=0.1, final_state="QUERY_STATE_FAILED")
+        with pytest.raises(DuneExecutionError) as exc:
+            list(query_dune("key", [DuneQuery("failing", 1)], min_poll_interval=0.05, base_url=dune.url))
+        assert exc.value.state == "QUERY_STATE_FAILED"
+
+
+def test_query_dune_pages() -> None:
+    rows = [{"n": n} for n in range(10)]
+    with FakeDuneAPI() as dune:
+        dune.add_query(1, rows)
+        dune.add_query(2, rows[:3], execution_time=0.1)
+        results = query_dune("key", [DuneQuery("paged", 1), DuneQuery("other", 2)], min_poll_interval=0.05, base_url=dune.url, page_size=2, max_buffered_pages=1)
+        query, query_rows = next(results)
+        assert query.name == "paged"
+        assert next(query_rows) == {"n": 0}
+        time.sleep(0.3)
+        # fetching stops when the buffer is full: one page consumed, one buffered and one waiting for each query
+        assert dune.calls["results"] == 3 + 2
+        assert list(query_rows) == rows[1:]
+        query, query_rows = next(results)
+        assert list(query_rows) == rows[:3]
+        assert dune.calls["results"] == 5 + 2
+        assert next(results, None) is None
+
+
+def test_query_dune_polls_while_readers_blocked() -> None:
+    rows = [{"n": n} for n in range(10)]
+    with FakeDuneAPI() as dune:
+        dune.add_query(1, rows)
+        dune.add_query(2, rows[:3], execution_time=0.1)
+        results = query_dune("key", [DuneQuery("paged", 1), DuneQuery("other", 2)], min_poll_interval=0.05, base_url=dune.url, max_workers=1, page_size=2, max_buffered_pages=1)
+        query, query_rows = next(results)
+        assert next(query_rows) == {"n": 0}
+        time.sleep(0.3)
+        # the only page reader is blocked on a full buffer, the other query is still polled until it completes
+        assert dune.calls["status"] > 2
+        assert list(query_rows) == rows[1:]
+        query, query_rows = next(results)
+        assert query.name == "other"
+        assert list(query_rows) == rows[:3]
+
+
+def test_query_dune_incremental() -> None:
+    incremental = DuneQuery("evolved", 1, {"chain": "ronin"}, write_disposition="append", watermark_column="block_number", watermark_param="min_block")
+    full = DuneQuery("bridge", 2)
+    state: DictStrAny = {}
+    with FakeDuneAPI() as dune:
+        dune.add_query(1, [{"block_number": 5}, {"block_number": 9}, {"block_number": 7}])
+        dune.add_query(2, [{"n": 1}])
+        for query, rows in query_dune("key", [incremental, full], min_poll_interval=0.05, base_url=dune.url, state=state):
+            for chunk in chunk_rows(query, rows, state):
+                list(chunk)
+        assert state["dune_watermarks"] == {"evolved": 9}
+        # watermark is passed as a parameter on the next run
+        dune.executions.clear()
+        for query, rows in query_dune("key", [incremental, full], min_poll_interval=0.05, base_url=dune.url, state=state):
+            for chunk in chunk_rows(query, rows, state):
+                list(chunk)
+        assert sorted((q, p) for q, p, _ in dune.executions.values()) == [(1, {"chain": "ronin", "min_block": 9}), (2, {})]
+
+    with pytest.raises(ValueError):
+        list(query_dune("key", [incremental]))
+    with pytest.raises(ValueError):
+        list(query_dune("key", [incremental._replace(write_disposition="replace")], state=state))
+
+    # watermark is advanced when a chunk is consumed
+    chunks = chunk_rows(incremental, iter([{"block_number": 10}, {"block_number": 12}, {"block_number": 11}]), state, chunk_size=2)
+    assert list(next(chunks)) == [{"block_number": 10}, {"block_number": 12}]
+    assert state["dune_watermarks"] == {"evolved": 12}
+    chunk = next(chunks)
+    assert next(chunk) == {"block_number": 11}
+    assert state["dune_watermarks"] == {"evolved": 12}
+    assert next(chunks, None) is None
+    assert [list(c) for c in chunk_rows(full, iter([{"n": 1}] * 5), chunk_size=2)] == [[{"n": 1}] * 2, [{"n": 1}] * 2, [{"n": 1}]]
+
+    schema = get_schema([incremental, full])
+    assert schema.get_write_disposition("evolved") == "append"
+    assert schema.get_write_disposition("bridge") == "replace"
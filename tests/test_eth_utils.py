@@ -1,14 +1,22 @@
 from copy import deepcopy
+from decimal import Decimal
 import pytest
 from web3 import Web3
 from eth_typing.evm import ChecksumAddress
 from hexbytes import HexBytes
-from typing import cast, List
+from typing import cast, List, Sequence
 
 from dlt.common import Wei
 from dlt.common.typing import StrAny
 
+from web3._utils.method_formatters import get_result_formatters
+from web3._utils.rpc_abi import RPC
+from web3.types import ABIEvent, LogReceipt
+
 from ethereum.eth_source_utils import uint_to_wei, _infer_decimals, maybe_load_abis, decode_tx, ABIFunction, ABIElement, DecodingError, TABIInfo, flatten_batches
+from ethereum.eth_source_utils import abi_to_selector, decode_log, decode_logs_batch, values_to_bytes
+
+from tests.rpc_replay import load_fixture
 
 
 def test_uint_to_wei_tuples() -> None:
@@ -90,6 +98,29 @@ def test_uint_to_wei_bigint_fitting() -> None:
         assert isinstance(v, exp_t)
 
 
+def test_fixed_point_values() -> None:
+    w3 = Web3()
+    types = ["ufixed128x18", "fixed168x10[]", "ufixed32x2", "uint256"]
+    values = [Decimal("340282366920938463463.374607431768211455"), [Decimal("-2.25")], Decimal("1.5"), 2**200]
+    inputs = [{"name": f"v_{idx}", "type": t} for idx, t in enumerate(types)]
+    decoded = dict(zip([i["name"] for i in inputs], w3.codec.decode(types, w3.codec.encode(types, values))))
+    decoded["v_1"] = list(decoded["v_1"])
+    as_bytes = deepcopy(decoded)
+    values_to_bytes(as_bytes, inputs)  # type: ignore
+    # raw integer value of the fixed point type
+    assert as_bytes["v_0"] == (2**128 - 1).to_bytes(32, "big")
+    assert as_bytes["v_1"] == [(-225 * 10**8).to_bytes(32, "big", signed=True)]
+    # fits in bigint
+    assert as_bytes["v_2"] == Decimal("1.5")
+    assert as_bytes["v_3"] == (2**200).to_bytes(32, "big")
+
+    uint_to_wei({}, decoded, inputs, HexBytes("0x00"))  # type: ignore
+    assert isinstance(decoded["v_0"], Wei)
+    assert decoded["v_0"] == values[0]
+    assert isinstance(decoded["v_1"][0], Wei)
+    assert decoded["v_2"] == Decimal("1.5")
+
+
 def test_infer_decimals() -> None:
     erc20: List[ABIElement] = [{
       "inputs": [
@@ -269,4 +300,80 @@ def test_flatten_batches() -> None:
   batch_decoded = deepcopy(decoded)
   batch_decoded["param_2"] = "abc"
   flatten_batches(batch_decoded, abi)
-  assert "batch" not in batch_decoded
\ No newline at end of file
+  assert "batch" not in batch_decoded
+
+
+def _make_log(selector: HexBytes, topics: Sequence[HexBytes], data: bytes, log_index: int) -> LogReceipt:
+  return cast(LogReceipt, {
+    "address": "0x0B7007c13325C48911F73A2daD5FA5dCBf808aDc", "topics": [selector, *topics], "topic": selector, "data": HexBytes(data).hex(), "blockNumber": 1,
+    "transactionHash": HexBytes(b"\x01" * 32), "transactionIndex": 0, "blockHash": HexBytes(b"\x02" * 32), "logIndex": log_index, "removed": False
+  })
+
+
+def test_decode_logs_batch_matches_decode_log() -> None:
+  w3 = Web3()
+  abi = cast(ABIEvent, {
+    "anonymous": False, "name": "Mixed", "type": "event", "inputs": [
+      {"indexed": True, "name": "from", "type": "address"},
+      {"indexed": True, "name": "delta", "type": "int8"},
+      {"indexed": False, "name": "amount", "type": "uint256"},
+      {"indexed": False, "name": "small", "type": "uint32"},
+      {"indexed": False, "name": "signed", "type": "int128"},
+      {"indexed": False, "name": "flag", "type": "bool"},
+      {"indexed": False, "name": "tag", "type": "bytes4"},
+      {"indexed": False, "name": "position", "type": "int64"}
+    ]
+  })
+  selector = abi_to_selector(abi)
+  logs: List[LogReceipt] = []
+  for i, (delta, signed, position) in enumerate([(-1, -2**127, -5), (127, 2**127 - 1, 2**63 - 1), (-128, 0, -2**63)]):
+    topics = [HexBytes(w3.codec.encode(["address"], ["0x6db3e66c6d4f0bd3b7c8d5e0a8aec4c0e2ec3bcd"])), HexBytes(w3.codec.encode(["int8"], [delta]))]
+    data = w3.codec.encode(["uint256", "uint32", "int128", "bool", "bytes4", "int64"], [2**256 - 1 - i, i, signed, i % 2 == 0, b"\x01\x02\x03\x04", position])
+    logs.append(_make_log(selector, topics, data, i))
+  valid_logs = len(logs)
+  # invalid padding of address, int8 sign extension, bool value and data length
+  bad_address = bytearray(logs[0]["topics"][1])
+  bad_address[0] = 1
+  logs.append(_make_log(selector, [HexBytes(bad_address), logs[0]["topics"][2]], HexBytes(logs[0]["data"]), 3))
+  logs.append(_make_log(selector, [logs[0]["topics"][1], HexBytes(b"\x00" * 31 + b"\xff")], HexBytes(logs[0]["data"]), 4))
+  bad_bool = bytearray(HexBytes(logs[0]["data"]))
+  bad_bool[32 * 3 + 31] = 2
+  logs.append(_make_log(selector, logs[0]["topics"][1:], bad_bool, 5))
+  logs.append(_make_log(selector, logs[0]["topics"][1:], HexBytes(logs[0]["data"])[:-1], 6))
+
+  decoded = decode_logs_batch(abi, logs)
+  assert all(d is not None for d in decoded[:valid_logs])
+  assert all(d is None for d in decoded[valid_logs:])
+  for log, event_data in zip(logs[:valid_logs], decoded):
+    expected = decode_log(w3.codec, abi, log)
+    assert event_data == expected
+    assert [type(v) for v in event_data["args"].values()] == [type(v) for v in expected["args"].values()]
+  for log in logs[valid_logs:]:
+    with pytest.raises(DecodingError):
+      decode_log(w3.codec, abi, log)
+
+  # dynamic types and incorrect index information are not decoded in batch
+  dynamic_abi = deepcopy(abi)
+  dynamic_abi["inputs"][6]["type"] = "bytes"
+  assert decode_logs_batch(dynamic_abi, logs[:1]) == [None]
+  index_abi = deepcopy(abi)
+  index_abi["inputs"][1]["indexed"] = False
+  assert decode_logs_batch(index_abi, logs[:valid_logs]) == [None] * valid_logs
+
+
+def test_decode_logs_batch_replay() -> None:
+  w3 = Web3()
+  contracts = maybe_load_abis("abi/abis", only_for_decode=True)
+  fixture = load_fixture()
+  batched = 0
+  for receipt in fixture["receipts"].values():
+    logs = [dict(log) for log in get_result_formatters(RPC.eth_getLogs, w3.eth)(receipt["logs"])]  # type: ignore
+    for log in logs:
+      log["topic"] = log["topics"][0]
+      if log["address"] in contracts and log["topic"] in contracts[log["address"]]["selectors"]:
+        abi = cast(ABIEvent, contracts[log["address"]]["selectors"][log["topic"]])
+        event_data = decode_logs_batch(abi, [cast(LogReceipt, log)])[0]
+        if event_data is not None:
+          batched += 1
+          assert event_data == decode_log(w3.codec, abi, cast(LogReceipt, log))
+  assert batched > 0
@@ -1,25 +1,135 @@
+import os
+import pstats
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict
+import pytest
+from prometheus_client import REGISTRY
 from web3 import Web3
 
+from dlt.common.sources import get_table_name
+
+from ethereum import get_blocks, get_blocks_deferred, profiling
+from ethereum import ethereum as ethereum_module
 from ethereum.ethereum import HTTP_PROVIDER_HEADERS, REQUESTS_TIMEOUT, _get_block_range
 
+from tests.rpc_replay import RPCReplayServer
+
+
 def test_get_block_range() -> None:
-    w3 = Web3(Web3.HTTPProvider("https://api.roninchain.com/rpc", request_kwargs={"headers": HTTP_PROVIDER_HEADERS, "timeout": REQUESTS_TIMEOUT}))
-
-    # lag is ignored when specific block range is used range
-    assert _get_block_range(w3, None, 1200000, None, 100, 10) == (1200000 - 100 + 1, 1200000)
-    # max_blocks none -> takes all
-    assert _get_block_range(w3, {}, 1200000, None, None, 10) == (0, 1200000)
-    # same if state is saved
-    assert _get_block_range(w3, {"ethereum_current_block": 100000}, 1200000, None, None, 10) == (100000, 1200000)
-    # max initial blocks are ignored when we have state
-    assert _get_block_range(w3, {"ethereum_current_block": 100000}, 1200000, None, 999, 10) == (100000, 1200000)
-    assert _get_block_range(w3, {"ethereum_current_block": 100000}, 1200000, 999998, None, 10) == (1200000 - 999998 + 1, 1200000)
-    # get last block from chain
-    on_chain_r = _get_block_range(w3, {"ethereum_current_block": 100000}, None, 999998, None, 10)
-    assert on_chain_r[1] > 16382237
-    assert on_chain_r[0] == on_chain_r[1] - 999998 + 1
-    # max blocks is used if initial blocks not provided
-    assert _get_block_range(w3, None, 1200000, 100, None, 10) == (1200000 - 100 + 1, 1200000)
-    # but initial blocks have precedence - 999 if taken as maximum blocks would provide a wrong range below
-    assert _get_block_range(w3, None, 1200000, 999, 100, 10) == (1200000 - 100 + 1, 1200000)
+    with RPCReplayServer() as replay:
+        w3 = Web3(Web3.HTTPProvider(replay.url, request_kwargs={"headers": HTTP_PROVIDER_HEADERS, "timeout": REQUESTS_TIMEOUT}))
+
+        # lag is ignored when specific block range is used range
+        assert _get_block_range(w3, None, 1200000, None, 100, 10) == (1200000 - 100 + 1, 1200000)
+        # max_blocks none -> takes all
+        assert _get_block_range(w3, {}, 1200000, None, None, 10) == (0, 1200000)
+        # same if state is saved
+        assert _get_block_range(w3, {"ethereum_current_block": 100000}, 1200000, None, None, 10) == (100000, 1200000)
+        # max initial blocks are ignored when we have state
+        assert _get_block_range(w3, {"ethereum_current_block": 100000}, 1200000, None, 999, 10) == (100000, 1200000)
+        assert _get_block_range(w3, {"ethereum_current_block": 100000}, 1200000, 999998, None, 10) == (1200000 - 999998 + 1, 1200000)
+        # get last block from chain
+        on_chain_r = _get_block_range(w3, {"ethereum_current_block": 100000}, None, 999998, None, 10)
+        assert on_chain_r[1] > 16382237
+        assert on_chain_r[1] == replay.head - 10
+        assert on_chain_r[0] == on_chain_r[1] - 999998 + 1
+        # max blocks is used if initial blocks not provided
+        assert _get_block_range(w3, None, 1200000, 100, None, 10) == (1200000 - 100 + 1, 1200000)
+        # but initial blocks have precedence - 999 if taken as maximum blocks would provide a wrong range below
+        assert _get_block_range(w3, None, 1200000, 999, 100, 10) == (1200000 - 100 + 1, 1200000)
+
+
+def test_extractor_metrics(tmp_path: Path) -> None:
+    abi_dir = shutil.copytree("abi/abis", str(tmp_path / "abis"))
+
+    def _sample(name: str, labels: Dict[str, str] = None) -> float:
+        return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+    fetches = _sample("ethereum_block_fetch_seconds_count")
+    receipts = _sample("ethereum_receipts_fetch_seconds_count")
+    spawned = _sample("ethereum_decoded_items_total", {"table": "Axie Contract_logs_AxieggSpawned"})
+    decoded_logs = _sample("ethereum_decode_item_seconds_count", {"type": "logs"})
+    retries = _sample("ethereum_block_retries_total")
+
+    with RPCReplayServer() as replay:
+        items = list(get_blocks(replay.url, max_blocks=4, abi_dir=abi_dir, is_poa=True))
+    spawned_items = [i for i in items if get_table_name(i) == "Axie Contract_logs_AxieggSpawned"]
+    log_items = [i for i in items if "_logs_" in (get_table_name(i) or "")]
+
+    assert _sample("ethereum_block_fetch_seconds_count") == fetches + 4
+    assert _sample("ethereum_receipts_fetch_seconds_count") == receipts + 4
+    assert _sample("ethereum_decoded_items_total", {"table": "Axie Contract_logs_AxieggSpawned"}) == spawned + len(spawned_items)
+    assert _sample("ethereum_decode_item_seconds_count", {"type": "logs"}) == decoded_logs + len(log_items)
+    assert _sample("ethereum_block_retries_total") == retries
+
+
+def test_batch_decode_time_in_metrics(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    abi_dir = shutil.copytree("abi/abis", str(tmp_path / "abis"))
+    decode_logs_batch = ethereum_module.decode_logs_batch
+    batch_time = 0.0
+
+    def _slow_decode_logs_batch(*args: Any) -> Any:
+        nonlocal batch_time
+        batch_time += 0.01
+        time.sleep(0.01)
+        return decode_logs_batch(*args)
+
+    monkeypatch.setattr(ethereum_module, "decode_logs_batch", _slow_decode_logs_batch)
+    decode_time = REGISTRY.get_sample_value("ethereum_decode_item_seconds_sum", {"type": "logs"}) or 0.0
+    with RPCReplayServer() as replay:
+        list(get_blocks(replay.url, max_blocks=4, abi_dir=abi_dir, is_poa=True))
+    assert batch_time > 0
+    # time of batch decoding is included in the decode time of the logs
+    assert REGISTRY.get_sample_value("ethereum_decode_item_seconds_sum", {"type": "logs"}) - decode_time >= batch_time
+
+
+def test_extractor_profiling(tmp_path: Path) -> None:
+    abi_dir = shutil.copytree("abi/abis", str(tmp_path / "abis"))
+    profile_dir = str(tmp_path / "profiles")
+
+    with RPCReplayServer() as replay:
+        items = 0
+        started = time.perf_counter()
+        for _ in get_blocks(replay.url, max_blocks=2, abi_dir=abi_dir, is_poa=True, profile_dir=profile_dir):
+            # slow consumer is not profiled
+            time.sleep(0.01)
+            items += 1
+        elapsed = time.perf_counter() - started
+        # deferred blocks are evaluated after the profile is saved
+        with pytest.raises(ValueError):
+            next(get_blocks_deferred(replay.url, max_blocks=2, abi_dir=abi_dir, is_poa=True, profile_dir=profile_dir))
+    # profiling is off after the run
+    assert profiling.phase("rpc") is profiling.phase("decode_log")
+
+    files = sorted(os.listdir(profile_dir))
+    assert len(files) == 2
+    assert files[0].endswith(".folded") and files[1].endswith(".prof")
+    pstats.Stats(os.path.join(profile_dir, files[1]))
+    with open(os.path.join(profile_dir, files[0]), "r", encoding="utf-8") as f:
+        folded = dict(line.rsplit(" ", 1) for line in f.read().splitlines())
+    for phase in ["rpc", "formatters", "decode_tx", "decode_log", "decode_logs_batch", "prettify_decoded", "save_abis"]:
+        assert f"get_blocks;{phase}" in folded
+    assert all(int(us) >= 0 for us in folded.values())
+    assert sum(int(us) for us in folded.values()) < (elapsed - items * 0.01) * 1000000
+
+
+def test_profiler_threads(tmp_path: Path) -> None:
+    profiler = profiling.PhaseProfiler()
+
+    def _work() -> None:
+        for _ in range(20):
+            with profiler.run("get_blocks"), profiler.phase("rpc"):
+                time.sleep(0.001)
 
+    threads = [threading.Thread(target=_work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # stacks are kept per thread so the paths are not mixed
+    assert set(profiler.folded) == {"get_blocks", "get_blocks;rpc"}
+    base_path = profiler.save(str(tmp_path), "threads")
+    pstats.Stats(base_path + ".prof")
@@ -0,0 +1,57 @@
+import os
+import pytest
+from pathlib import Path
+from typing import List
+
+from dlt.common.runners import pool_runner as runner
+from dlt.common.typing import TSecretValue
+from dlt.pipeline import Pipeline, PostgresPipelineCredentials
+
+from helpers import OverlappedNormalize
+
+
+def _create_pipeline(working_dir: str) -> Pipeline:
+    # placeholder credentials, the pipeline never loads
+    pipeline = Pipeline("overlapped")
+    pipeline.create_pipeline(PostgresPipelineCredentials("redshift", "db", "overlapped", "user", "localhost", TSecretValue("password")), working_dir=working_dir)
+    return pipeline
+
+
+def _extracted_files(working_dir: str) -> List[str]:
+    extracted_dir = os.path.join(working_dir, "normalize", "extracted")
+    return [os.path.join(extracted_dir, f) for f in os.listdir(extracted_dir)]
+
+
+def test_overlapped_normalize(tmp_path: Path) -> None:
+    pipeline = _create_pipeline(str(tmp_path))
+    overlapped = OverlappedNormalize(pipeline)
+    try:
+        pipeline.extract(iter([{"block_number": 1}]), table_name="blocks")
+        overlapped.normalize()
+        overlapped.wait()
+        pipeline.extract(iter([{"block_number": 2}]), table_name="blocks")
+        overlapped.normalize()
+    finally:
+        overlapped.close()
+    # a load package per extracted range
+    assert len(pipeline.list_normalized_loads()) == 2
+    assert _extracted_files(str(tmp_path)) == []
+
+
+def test_overlapped_normalize_error(tmp_path: Path) -> None:
+    pipeline = _create_pipeline(str(tmp_path))
+    overlapped = OverlappedNormalize(pipeline)
+    try:
+        pipeline.extract(iter([{"block_number": 1}]), table_name="blocks")
+        for extracted_file in _extracted_files(str(tmp_path)):
+            with open(extracted_file, "w", encoding="utf-8") as f:
+                f.write("not json")
+        overlapped.normalize()
+        # failed normalize does not affect extract running at the same time
+        pipeline.extract(iter([{"block_number": 2}]), table_name="blocks")
+        assert runner.LAST_RUN_METRICS.has_failed is False
+        with pytest.raises(RuntimeError):
+            overlapped.wait()
+    finally:
+        overlapped.close()
+    assert pipeline.list_normalized_loads() == []
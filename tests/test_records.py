@@ -0,0 +1,58 @@
+import pytest
+from copy import deepcopy
+from hexbytes import HexBytes
+from typing import Any
+
+from dlt.common import Wei, json
+
+from ethereum.records import TransactionRecord
+
+
+BLOCK: Any = {"blockHash": HexBytes(b"\x02" * 32), "blockNumber": 16553617, "blockTimestamp": 1660942919, "chainId": 2020}
+TX: Any = {
+    "blockHash": HexBytes(b"\x02" * 32), "blockNumber": 16553617, "from": "0xD2919efDE964a36D16B728f8929ebD45D23bEf1d", "gas": 21000, "gasPrice": 1000000000,
+    "hash": HexBytes(b"\x01" * 32), "input": "0xa9059cbb0000", "nonce": 7, "to": "0x97a9107C1793BC407d6F527b77e7fff4D812bece", "transactionIndex": 0,
+    "value": 10**18, "type": "0x0", "v": 27, "r": HexBytes(b"\x03" * 32), "s": HexBytes(b"\x04" * 32), "yParity": "0x1"
+}
+LOG: Any = {
+    "address": "0x97a9107C1793BC407d6F527b77e7fff4D812bece", "topics": [HexBytes(b"\x05" * 32), HexBytes(b"\x06" * 32)], "data": "0x" + "00" * 31 + "01",
+    "blockNumber": 16553617, "transactionHash": HexBytes(b"\x01" * 32), "transactionIndex": 0, "blockHash": HexBytes(b"\x02" * 32), "logIndex": 3, "removed": False
+}
+
+
+def test_transaction_record() -> None:
+    tx = TransactionRecord(TX, BLOCK)
+    tx.blockTimestamp = BLOCK["blockTimestamp"]
+    tx.add_logs([LOG])
+    # compact values in attributes
+    assert tx.input == bytes.fromhex("a9059cbb0000")
+    assert type(tx.transactionHash) is bytes
+    assert tx.value == 10**18
+    assert tx.blockHash is BLOCK["blockHash"]
+    # web3 values when read as dict
+    assert tx["input"] == "0xa9059cbb0000"
+    assert tx["transactionHash"] == HexBytes(b"\x01" * 32) and isinstance(tx["transactionHash"], HexBytes)
+    assert tx["value"] == Wei.from_int256(10**18, 18) and isinstance(tx["value"], Wei)
+    assert "hash" not in tx
+    assert "maxFeePerGas" not in tx
+    with pytest.raises(KeyError):
+        tx["maxFeePerGas"]
+    # unknown keys are kept
+    assert tx["yParity"] == "0x1"
+    del tx["yParity"]
+    assert "yParity" not in tx
+    tx["yParity"] = "0x1"
+
+    log = tx.logs[0]
+    assert log.transactionHash is tx.transactionHash
+    assert log.topic == HexBytes(b"\x05" * 32)
+    assert log["topics"] == LOG["topics"]
+    assert log["data"] == LOG["data"]
+    assert dict(log) == dict(LOG, topic=LOG["topics"][0])
+
+    # serialized like dicts
+    expected = dict(TX, transactionHash=TX["hash"], value=Wei.from_int256(10**18, 18), blockTimestamp=BLOCK["blockTimestamp"], logs=[dict(LOG, topic=LOG["topics"][0])])
+    del expected["hash"]
+    assert json.loads(json.dumps(tx)) == json.loads(json.dumps(expected))
+    assert deepcopy(tx) == tx
+    assert not hasattr(tx, "__dict__")
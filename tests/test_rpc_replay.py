@@ -0,0 +1,342 @@
+import shutil
+import time
+from pathlib import Path
+import pytest
+import requests
+from collections import Counter
+from typing import List, Tuple
+
+from eth_utils.abi import event_abi_to_log_topic
+
+from dlt.common import json
+from dlt.common.sources import get_table_name
+from dlt.common.typing import DictStrAny
+
+import ethereum.ethereum
+from ethereum.loaded_blocks import LoadedBlocks
+from ethereum.scheduler import RateLimiter
+from ethereum import ChainSource, add_backfill, get_blocks, get_blocks_deferred, follow_chains, follow_head, follow_head_with_backfill, redecode
+from tests.rpc_replay import RPCReplayServer, load_fixture
+
+from benchmarks.bench_extractor import BENCH_MODES, run_benchmark
+from benchmarks import bench_decoding, bench_startup
+
+
+@pytest.fixture
+def abi_dir(tmp_path: Path) -> str:
+    # extractor writes abi changes back so work on a copy
+    return str(shutil.copytree("abi/abis", str(tmp_path / "abis")))
+
+
+@pytest.mark.parametrize("supports_batching", [True, False])
+def test_get_blocks_replay(abi_dir: str, supports_batching: bool) -> None:
+    fixture = load_fixture()
+    with RPCReplayServer(fixture) as replay:
+        state: DictStrAny = {}
+        items = list(get_blocks(replay.url, max_blocks=6, abi_dir=abi_dir, is_poa=True, supports_batching=supports_batching, state=state))
+        # lag of 2 blocks from the recorded head
+        assert state["ethereum_current_block"] == replay.head - 1
+        blocks = [i for i in items if get_table_name(i) is None]
+        assert [b["blockNumber"] for b in blocks] == list(range(replay.head - 7, replay.head - 1))
+        tx_count = sum(len(b["transactions"]) for b in blocks)
+        assert replay.calls["eth_getTransactionReceipt"] == tx_count
+        tables = Counter(get_table_name(i) for i in items if get_table_name(i) is not None)
+        assert tables["Axie Contract_logs_AxieggSpawned"] > 0
+        assert tables["Axie Infinity Shard Contract_logs_Transfer"] > 0
+
+        # deferred iterator yields the same data
+        replay.calls.clear()
+        deferred_items = [i for d in get_blocks_deferred(replay.url, max_blocks=6, abi_dir=abi_dir, is_poa=True, supports_batching=supports_batching) for i in d()]
+        assert len(deferred_items) == len(items)
+
+
+def test_adaptive_max_blocks(abi_dir: str) -> None:
+    with RPCReplayServer() as replay:
+        last_block = replay.head - 2
+        # no throughput measured yet
+        state: DictStrAny = {"ethereum_current_block": last_block - 40}
+        blocks = [i for i in get_blocks(replay.url, abi_dir=abi_dir, is_poa=True, state=state, target_run_seconds=1.0) if get_table_name(i) is None]
+        assert len(blocks) == ethereum.ethereum.ADAPTIVE_INITIAL_BLOCKS
+        assert state["ethereum_current_block"] == last_block - 40 + len(blocks)
+        assert state["ethereum_blocks_per_second"] > 0 and state["ethereum_run_blocks"] == len(blocks)
+
+        # grows at most twice per run and nothing is skipped
+        state.update(ethereum_blocks_per_second=1000.0, ethereum_run_blocks=4)
+        current_block = state["ethereum_current_block"]
+        blocks = [i for i in get_blocks(replay.url, abi_dir=abi_dir, is_poa=True, state=state, target_run_seconds=1.0) if get_table_name(i) is None]
+        assert [b["blockNumber"] for b in blocks] == list(range(current_block, current_block + 8))
+
+        # shrinks toward the target duration
+        state.update(ethereum_blocks_per_second=3.0, ethereum_run_blocks=8)
+        current_block = state["ethereum_current_block"]
+        blocks = [i for i in get_blocks(replay.url, abi_dir=abi_dir, is_poa=True, state=state, target_run_seconds=1.0) if get_table_name(i) is None]
+        assert [b["blockNumber"] for b in blocks] == list(range(current_block, current_block + 3))
+
+        # older blocks skipped only past the hard cap
+        state.update(ethereum_blocks_per_second=1000.0, ethereum_run_blocks=4)
+        blocks = [i for i in get_blocks(replay.url, max_blocks=5, abi_dir=abi_dir, is_poa=True, state=state, target_run_seconds=1.0) if get_table_name(i) is None]
+        assert [b["blockNumber"] for b in blocks] == list(range(last_block - 4, last_block + 1))
+
+        with pytest.raises(ValueError):
+            list(get_blocks(replay.url, abi_dir=abi_dir, is_poa=True, target_run_seconds=1.0))
+
+
+def test_follow_head(abi_dir: str) -> None:
+    with RPCReplayServer() as replay:
+        state: DictStrAny = {"ethereum_current_block": replay.head - 6}
+        start_head = replay.head
+        polls = 0
+
+        def _should_stop() -> bool:
+            nonlocal polls
+            polls += 1
+            # new block arrives every other poll after head is reached
+            if state["ethereum_current_block"] > replay.head - 2 and polls % 2 == 0:
+                replay.head += 1
+            return replay.head >= start_head + 3
+
+        batches = []
+        for batch in follow_head(replay.url, max_batch_blocks=2, abi_dir=abi_dir, is_poa=True, state=state, min_poll_interval=0.01, max_poll_interval=0.05, should_stop=_should_stop):
+            batches.append([i["blockNumber"] for i in batch if get_table_name(i) is None])
+        # backlog in micro batches, then block by block
+        assert batches == [
+            [start_head - 6, start_head - 5], [start_head - 4, start_head - 3], [start_head - 2], [start_head - 1], [start_head]
+        ]
+        assert state["ethereum_current_block"] == start_head + 1
+        # chain id is requested once per batch and head once per poll
+        assert replay.calls["eth_chainId"] == len(batches)
+        assert replay.calls["eth_blockNumber"] == polls - 1
+
+
+def test_replay_cycles_recorded_blocks() -> None:
+    with RPCReplayServer() as replay:
+        first = replay.recorded_numbers[0]
+        block = replay.get_block(first - 1, full_transactions=True)
+        assert block["number"] == hex(first - 1)
+        assert block["hash"] == replay.blocks[str(replay.recorded_numbers[-1])]["hash"]
+        assert all(tx["blockNumber"] == hex(first - 1) for tx in block["transactions"])
+        # recorded data is not modified
+        assert replay.blocks[str(replay.recorded_numbers[-1])]["number"] == hex(replay.recorded_numbers[-1])
+        # only hashes when not full transactions
+        block = replay.get_block(first, full_transactions=False)
+        assert all(isinstance(tx, str) for tx in block["transactions"])
+
+
+def test_replay_errors() -> None:
+    with RPCReplayServer(error_rate=1.0) as replay:
+        r = requests.post(replay.url, json={"jsonrpc": "2.0", "method": "eth_blockNumber", "params": [], "id": 1})
+        assert r.status_code == 503
+    with RPCReplayServer() as replay:
+        r = requests.post(replay.url, json=[{"jsonrpc": "2.0", "method": "eth_chainId", "params": [], "id": 1}, {"jsonrpc": "2.0", "method": "eth_call", "params": [], "id": 2}])
+        chain_id, unknown = r.json()
+        assert int(chain_id["result"], 16) == replay.chain_id
+        assert unknown["error"]["code"] == -32601
+
+
+def test_benchmark_smoke() -> None:
+    results = run_benchmark(BENCH_MODES[:1], blocks=3)
+    assert results[0]["blocks"] == 3
+    assert results[0]["txs"] > 0
+    assert results[0]["decoded_s"] > 0
+    assert results[0]["peak_rss_mb"] > 0
+
+
+def test_startup_benchmark_smoke() -> None:
+    extractor, loader = bench_startup.run_benchmark(runs=1)
+    # the extractor imports web3 when it gets blocks, the loader never does
+    assert extractor["web3_on_import"] is False
+    assert extractor["first_block_s"] > 0
+    assert loader["web3_on_import"] is False
+    assert loader["total_s"] > loader["import_s"] > 0
+
+
+def test_decoding_benchmark_smoke(tmp_path: Path) -> None:
+    results = bench_decoding.run_benchmark(repeats=1, min_seconds=0.0)
+    assert [r["case"] for r in results] == bench_decoding.BENCH_CASES
+    # all cases have recorded inputs
+    assert all(r["inputs"] > 0 and r["us_per_call"] > 0 for r in results)
+    baseline_path = str(tmp_path / "baseline.json")
+    bench_decoding.save_baseline(results, baseline_path)
+    assert "0.0%" in bench_decoding.format_results(results, bench_decoding.load_baseline(baseline_path))
+    assert bench_decoding.load_baseline(str(tmp_path / "missing.json")) is None
+
+
+def test_web3_once_per_process(abi_dir: str) -> None:
+    with RPCReplayServer() as replay:
+        list(get_blocks(replay.url, max_blocks=1, abi_dir=abi_dir, is_poa=True))
+        w3 = ethereum.ethereum._get_web3(replay.url, True)
+        list(get_blocks(replay.url, max_blocks=1, abi_dir=abi_dir, is_poa=True))
+        assert ethereum.ethereum._get_web3(replay.url, True) is w3
+        assert ethereum.ethereum._get_web3(replay.url, False) is not w3
+
+
+def test_batch_decode_logs_same_items(abi_dir: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    with RPCReplayServer() as replay:
+        items = list(get_blocks(replay.url, last_block=replay.head, max_blocks=8, abi_dir=abi_dir, is_poa=True))
+        monkeypatch.setattr(ethereum.ethereum, "BATCH_DECODE_LOGS", False)
+        assert list(get_blocks(replay.url, last_block=replay.head, max_blocks=8, abi_dir=abi_dir, is_poa=True)) == items
+
+
+def test_get_blocks_filtered(abi_dir: str) -> None:
+    axie_address = "0x32950db2a7164aE833121501C797D79E7B79d74C"
+    with RPCReplayServer() as replay:
+        all_items = list(get_blocks(replay.url, last_block=replay.head, max_blocks=6, abi_dir=abi_dir, is_poa=True))
+        all_receipts = replay.calls["eth_getTransactionReceipt"]
+        replay.calls.clear()
+        items = list(get_blocks(replay.url, last_block=replay.head, max_blocks=6, abi_dir=abi_dir, is_poa=True, address_filter=[axie_address.lower()]))
+        # receipts requested only for matching transactions
+        assert 0 < replay.calls["eth_getTransactionReceipt"] < all_receipts
+        assert replay.calls["eth_getLogs"] > 0
+        # block headers are always kept
+        blocks = [i for i in items if get_table_name(i) is None]
+        assert [b["blockNumber"] for b in blocks] == [b["blockNumber"] for b in all_items if get_table_name(b) is None]
+        for block in blocks:
+            for tx in block["transactions"]:
+                assert tx["to"] == axie_address or any(log["address"] == axie_address for log in tx["logs"])
+                assert all(log["address"] == axie_address for log in tx["logs"])
+        tables = Counter(get_table_name(i) for i in items if get_table_name(i) is not None)
+        assert tables["Axie Contract_logs_AxieggSpawned"] > 0
+        assert tables["Axie Infinity Shard Contract_logs_Transfer"] == 0
+
+        # event selector allowlist finds the same logs
+        spawned = [i for i in items if get_table_name(i) == "Axie Contract_logs_AxieggSpawned"]
+        with open(f"abi/abis/{axie_address}.json", "r", encoding="utf-8") as f:
+            event_abi = next(e for e in json.load(f)["abi"] if e.get("name") == "AxieggSpawned")
+        selector = event_abi_to_log_topic(event_abi).hex()
+        items = list(get_blocks(replay.url, last_block=replay.head, max_blocks=6, abi_dir=abi_dir, is_poa=True, selector_filter=[selector]))
+        assert [i for i in items if get_table_name(i) == "Axie Contract_logs_AxieggSpawned"] == spawned
+
+        with pytest.raises(ValueError):
+            list(get_blocks(replay.url, abi_dir=abi_dir, selector_filter=["0x1234"]))
+
+
+def test_get_blocks_block_cache(abi_dir: str, tmp_path: Path) -> None:
+    cache_dir = str(tmp_path / "block_cache")
+    with RPCReplayServer() as replay:
+        items = list(get_blocks(replay.url, last_block=replay.head, max_blocks=4, abi_dir=abi_dir, is_poa=True, block_cache_dir=cache_dir))
+        assert replay.calls["eth_getTransactionReceipt"] > 0
+        replay.calls.clear()
+        # blocks and receipts are taken from the cache
+        assert list(get_blocks(replay.url, last_block=replay.head, max_blocks=4, abi_dir=abi_dir, is_poa=True, block_cache_dir=cache_dir)) == items
+        assert replay.calls["eth_getBlockByNumber"] == 0
+        assert replay.calls["eth_getTransactionReceipt"] == 0
+
+    # decoded again without the node
+    decoded = [i for i in items if get_table_name(i) is not None]
+    assert list(redecode(cache_dir, replay.head - 3, replay.head + 1, abi_dir)) == decoded
+
+
+def test_get_blocks_skips_loaded_blocks(abi_dir: str, tmp_path: Path) -> None:
+    loaded_blocks = LoadedBlocks(str(tmp_path / "loaded_blocks"))
+    with RPCReplayServer() as replay:
+        assert len(list(get_blocks(replay.url, last_block=replay.head - 2, max_blocks=3, abi_dir=abi_dir, is_poa=True, loaded_blocks=loaded_blocks))) > 0
+        # blocks are not recorded until committed, ie. when extract failed
+        items = list(get_blocks(replay.url, last_block=replay.head, max_blocks=5, abi_dir=abi_dir, is_poa=True, loaded_blocks=loaded_blocks))
+        assert len([i for i in items if get_table_name(i) is None]) == 5
+        loaded_blocks.discard()
+        assert len(list(get_blocks(replay.url, last_block=replay.head - 2, max_blocks=3, abi_dir=abi_dir, is_poa=True, loaded_blocks=loaded_blocks))) > 0
+        loaded_blocks.commit()
+        replay.calls.clear()
+        # overlapping range returns only the blocks not extracted before, only headers of the others are requested
+        items = list(get_blocks(replay.url, last_block=replay.head, max_blocks=5, abi_dir=abi_dir, is_poa=True, loaded_blocks=loaded_blocks))
+        assert [i["blockNumber"] for i in items if get_table_name(i) is None] == [replay.head - 1, replay.head]
+        assert replay.calls["eth_getBlockByNumber"] == 5
+    with pytest.raises(ValueError):
+        list(get_blocks_deferred("http://localhost", loaded_blocks=loaded_blocks))
+
+
+@pytest.mark.parametrize("supports_batching", [True, False])
+def test_get_blocks_compressed_responses(abi_dir: str, supports_batching: bool) -> None:
+    with RPCReplayServer(compress=False) as replay:
+        expected = list(get_blocks(replay.url, last_block=replay.head, max_blocks=3, abi_dir=abi_dir, is_poa=True, supports_batching=supports_batching))
+        assert replay.encodings["gzip"] == 0
+    with RPCReplayServer() as replay:
+        items = list(get_blocks(replay.url, last_block=replay.head, max_blocks=3, abi_dir=abi_dir, is_poa=True, supports_batching=supports_batching))
+        # requests asks for gzip by default, blocks and receipts are received gzipped
+        assert replay.encodings["identity"] == 0
+        assert replay.encodings["gzip"] >= replay.calls["eth_getBlockByNumber"]
+    assert items == expected
+
+
+def test_rpc_requests_encoded_by_web3() -> None:
+    from web3.types import RPCEndpoint
+    from ethereum.transport import FastHTTPProvider
+
+    provider = FastHTTPProvider("http://localhost")
+    request = json.loads(provider.encode_rpc_request(RPCEndpoint("eth_getCode"), ["0x01ff", "latest"]))
+    assert request["params"] == ["0x01ff", "latest"]
+    # bytes are not sent base64 encoded like by the dlt json encoder
+    with pytest.raises(TypeError):
+        provider.encode_rpc_request(RPCEndpoint("eth_getCode"), [b"\x01\xff", "latest"])
+
+
+def test_follow_chains_fair_share(abi_dir: str) -> None:
+    with RPCReplayServer() as ronin, RPCReplayServer() as other:
+        # both chains are far behind the head
+        state: DictStrAny = {"ethereum_chains": {"ronin": {"ethereum_current_block": ronin.head - 40}, "other": {"ethereum_current_block": other.head - 40}}}
+        chains = [ChainSource("ronin", ronin.url, abi_dir=abi_dir, is_poa=True, weight=2.0), ChainSource("other", other.url, is_poa=True)]
+        batches: List[Tuple[str, List[DictStrAny]]] = []
+        for chain, batch in follow_chains(chains, state, max_batch_blocks=2, max_workers=4, should_stop=lambda: len(batches) == 6):
+            batches.append((chain.name, list(batch)))
+    assert Counter(name for name, _ in batches) == {"ronin": 4, "other": 2}
+    # blocks come in order and state of each chain is advanced separately
+    ronin_blocks = [i["blockNumber"] for name, items in batches if name == "ronin" for i in items if get_table_name(i) is None]
+    assert ronin_blocks == list(range(ronin.head - 40, ronin.head - 32))
+    assert state["ethereum_chains"]["ronin"]["ethereum_current_block"] == ronin.head - 32
+    assert state["ethereum_chains"]["other"]["ethereum_current_block"] == other.head - 36
+    # only the chain with abi dir is decoded
+    assert all(get_table_name(i) is None for name, items in batches if name == "other" for i in items)
+
+
+def test_follow_head_with_backfill(abi_dir: str) -> None:
+    first = RPCReplayServer().recorded_numbers[0]
+    with RPCReplayServer(head=first + 5) as replay:
+        # 4 blocks behind the head, 2 of them over the max head lag
+        state: DictStrAny = {"ethereum_current_block": first}
+        batches: List[Tuple[str, List[int]]] = []
+
+        def _should_stop() -> bool:
+            # new block arrives after the first backfill micro batch
+            if len(batches) == 3 and replay.head == first + 5:
+                replay.head += 1
+            return not state.get("ethereum_backfill") and state["ethereum_current_block"] > replay.head - 2
+
+        for batch in follow_head_with_backfill(
+            replay.url, max_batch_blocks=1, abi_dir=abi_dir, is_poa=True, state=state, max_head_lag=2, max_blocks_per_second=1000, min_poll_interval=0.0,
+            should_stop=_should_stop
+        ):
+            numbers = [i["blockNumber"] for i in batch if get_table_name(i) is None]
+            batches.append(("head" if numbers[0] >= first + 2 else "backfill", numbers))
+    # head blocks go first, new head block is scheduled before the rest of backfill
+    assert batches == [
+        ("head", [first + 2]), ("head", [first + 3]), ("backfill", [first]), ("head", [first + 4]), ("backfill", [first + 1])
+    ]
+    assert state == {"ethereum_current_block": first + 5, "ethereum_backfill": []}
+
+
+def test_backfill_range_shorter_than_batch(abi_dir: str) -> None:
+    first = RPCReplayServer().recorded_numbers[0]
+    with RPCReplayServer(head=first + 7) as replay:
+        # head is reached, queued range is shorter than a micro batch
+        state: DictStrAny = {"ethereum_current_block": first + 6}
+        add_backfill(state, first + 2, first + 3)
+        batches = [
+            [i["blockNumber"] for i in batch if get_table_name(i) is None]
+            for batch in follow_head_with_backfill(
+                replay.url, max_batch_blocks=4, abi_dir=abi_dir, is_poa=True, state=state, min_poll_interval=0.0, should_stop=lambda: not state["ethereum_backfill"]
+            )
+        ]
+    assert batches == [[first + 2, first + 3]]
+    assert state == {"ethereum_current_block": first + 6, "ethereum_backfill": []}
+
+
+def test_rate_limiter() -> None:
+    limiter = RateLimiter(100.0, burst=10)
+    assert limiter.available() == pytest.approx(10, abs=0.5)
+    limiter.acquire(10)
+    assert limiter.wait_time(5) == pytest.approx(0.05, abs=0.01)
+    # blocks over the limit are paid for by waiting
+    started = time.monotonic()
+    limiter.acquire(5)
+    assert time.monotonic() - started >= 0.04
+    assert RateLimiter().wait_time(1000) == 0.0